@@ -0,0 +1,212 @@
+"""
+Benchmark konkurensi /chat: handler yang memblokir vs `agenerate_response` (async).
+
+Semua upstream (OpenAI embedding, OpenAI chat, Qdrant) diganti stub dengan
+latensi tetap, sehingga yang diukur murni perilaku event loop:
+
+- "blocking": handler async menjalankan `asyncio.run(agenerate_response(...))`
+  di thread lain lalu menunggu `.result()` — event loop tertahan selama
+  pipeline berjalan. Ini BUKAN `generate_response` sync yang lama: API sync
+  itu sudah dihapus (commit 6569218), jadi mode ini hanya meniru pola
+  handler yang memblokir dengan pipeline yang sama.
+- "async"   : handler async memanggil `agenerate_response`.
+
+Selama chat berjalan, thread probe (mensimulasikan /health) menjadwalkan
+callback ke event loop tiap 10 ms dan mencatat berapa lama callback itu
+menunggu dijalankan. Probe tetap dikirim saat loop tertahan, sehingga kedua
+mode menghasilkan sampel sepanjang run.
+
+Jalankan: python scripts/bench_chat_concurrency.py --chats 20
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+for _key in ("QDRANT_URL", "QDRANT_API_KEY", "OPENAI_API_KEY"):
+    os.environ.setdefault(_key, "http://stub" if _key == "QDRANT_URL" else "stub")
+# Query benchmark identik — matikan cache hasil retrieval agar stub Qdrant tetap terukur
+os.environ.setdefault("RETRIEVAL_CACHE_SIZE", "0")
+
+from src.qdrant_store import QdrantStore  # noqa: E402
+from src.rag_service import RAGService  # noqa: E402
+
+logging.basicConfig(level=logging.WARNING, format="%(levelname)s | %(message)s")
+logger = logging.getLogger(__name__)
+
+EMBED_LATENCY = 0.08
+QDRANT_LATENCY = 0.04
+LLM_LATENCY = 0.6
+
+_PAYLOAD = {
+    "nama_tempat": "Bakso Stub",
+    "kategori_makanan": "Bakso",
+    "range_harga": "15 - 25 K",
+    "lokasi": "Samarinda",
+    "jam_buka": "08:00",
+    "jam_tutup": "21:00",
+    "hari_operasional": ["Setiap Hari"],
+    "menu_andalan": ["Bakso Urat"],
+    "fasilitas": ["Parkir"],
+    "ringkasan": "Bakso kuah bening.",
+}
+
+
+class _StubEmbeddings:
+    async def aembed_query(self, text):
+        await asyncio.sleep(EMBED_LATENCY)
+        return [0.1] * 8
+
+
+class _StubLLM:
+    async def ainvoke(self, messages):
+        await asyncio.sleep(LLM_LATENCY)
+        return SimpleNamespace(content="Rekomendasi stub", usage_metadata=None)
+
+
+def _points():
+    return SimpleNamespace(points=[
+        SimpleNamespace(id=i, score=0.9 - i * 0.01, payload={**_PAYLOAD, "nama_tempat": f"Bakso {i}"})
+        for i in range(40)
+    ])
+
+
+class _StubQdrant:
+    def get_collections(self):
+        return SimpleNamespace(collections=[])
+
+    def get_collection(self, name):
+        time.sleep(QDRANT_LATENCY)
+        return SimpleNamespace(points_count=709)
+
+    def scroll(self, **kwargs):
+        return _points().points, None
+
+    def close(self):
+        pass
+
+
+class _StubAsyncQdrant:
+    async def get_collections(self):
+        return SimpleNamespace(collections=[])
+
+    async def get_collection(self, name):
+        await asyncio.sleep(QDRANT_LATENCY)
+        return SimpleNamespace(points_count=709)
+
+    async def query_points(self, **kwargs):
+        await asyncio.sleep(QDRANT_LATENCY)
+        return _points()
+
+    async def query_batch_points(self, requests, **kwargs):
+        await asyncio.sleep(QDRANT_LATENCY)
+        return [_points() for _ in requests]
+
+    async def close(self):
+        pass
+
+
+class StubRAGService(RAGService):
+    """RAGService dengan semua koneksi eksternal diganti stub."""
+
+    @staticmethod
+    def _init_embeddings():
+        return _StubEmbeddings()
+
+    @staticmethod
+    def _init_llm():
+        return _StubLLM()
+
+    @staticmethod
+    def _init_compact_llm():
+        return _StubLLM()
+
+    @staticmethod
+    def _init_compression_llm():
+        return _StubLLM()
+
+    @staticmethod
+    def _init_store():
+        return QdrantStore("stub", _StubQdrant(), _StubAsyncQdrant())
+
+
+def _probe(loop: asyncio.AbstractEventLoop, stop: threading.Event, delays: list[float]) -> None:
+    """
+    Ukur keterlambatan event loop — proxy latensi /health. Berjalan di thread
+    sendiri: probe yang datang saat loop tertahan mengantre dan masing-masing
+    mencatat waktu tunggunya.
+    """
+    while not stop.is_set():
+        scheduled = time.perf_counter()
+        loop.call_soon_threadsafe(
+            lambda scheduled=scheduled: delays.append(time.perf_counter() - scheduled)
+        )
+        time.sleep(0.01)
+
+
+async def _run(service: RAGService, mode: str, chats: int) -> dict:
+    blocking_pool = ThreadPoolExecutor(max_workers=1)
+
+    async def one_chat() -> None:
+        if mode == "blocking":
+            blocking_pool.submit(
+                asyncio.run, service.agenerate_response("rekomendasi bakso enak", [])
+            ).result()
+        else:
+            await service.agenerate_response("rekomendasi bakso enak", [])
+
+    stop = threading.Event()
+    delays: list[float] = []
+    probe = threading.Thread(
+        target=_probe, args=(asyncio.get_running_loop(), stop, delays), daemon=True
+    )
+    probe.start()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_chat() for _ in range(chats)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    probe.join()
+    # Jalankan probe yang masih mengantre
+    await asyncio.sleep(0)
+    blocking_pool.shutdown()
+    return {
+        "mode": mode,
+        "chats": chats,
+        "wall_s": elapsed,
+        "chats_per_s": chats / elapsed,
+        "probe_samples": len(delays),
+        "probe_p50_ms": statistics.median(delays) * 1000 if delays else 0.0,
+        "probe_max_ms": max(delays) * 1000 if delays else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chats", type=int, default=20)
+    args = parser.parse_args()
+
+    service = StubRAGService()
+    for mode in ("blocking", "async"):
+        result = asyncio.run(_run(service, mode, args.chats))
+        print(
+            f"{result['mode']:<8} chats={result['chats']:<4} "
+            f"wall={result['wall_s']:.2f}s  throughput={result['chats_per_s']:.1f}/s  "
+            f"loop-delay p50={result['probe_p50_ms']:.1f}ms max={result['probe_max_ms']:.1f}ms "
+            f"(samples={result['probe_samples']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Microbenchmark query understanding: regex per-panggilan (lama) vs `QueryParser`.
+
+"legacy" mereproduksi alur lama per chat: `extract_number_from_text`
+(~40 `re.search` berurutan), `parse_future_time`, dan `_detect_category`
+yang mengurutkan ulang `_CATEGORY_KEYWORDS` setiap panggilan.
+"parser" memakai satu `QueryParser.parse` (automaton Aho-Corasick +
+pola yang sudah dikompilasi).
+
+Jalankan: python scripts/bench_query_parser.py --rounds 2000
+"""
+
+import argparse
+import re
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.query_parser import _CATEGORY_KEYWORDS, QueryParser  # noqa: E402
+from src.utils import get_samarinda_time  # noqa: E402
+
+QUERIES = [
+    "rekomendasi bakso enak",
+    "kasih 7 tempat kopi buka malam",
+    "mie ayam yang murah di bawah 20 ribu dong",
+    "besok pagi sarapan bubur dimana ya",
+    "tolong kasih lma tempat nasi goreng",
+    "nanti malam makan seafood enak yang ada parkir",
+    "jam 19 ada steak yang buka?",
+    "tempat nongkrong wifi kencang buat kerja",
+]
+
+# Salinan implementasi lama (utils.py sebelum QueryParser) sebagai baseline
+_LEGACY_NUMBER_PATTERNS = [
+    (r"\bbelas\b", 11), (r"\bdua\s+bela\b", 12), (r"\btiga\s+bela\b", 13),
+    (r"\bempat\s+bela\b", 14), (r"\blima\s+bela\b", 15), (r"\benam\s+bela\b", 16),
+    (r"\btujuh\s+bela\b", 17), (r"\bdelapan\s+bela\b", 18), (r"\bsem\s+bela\b", 19),
+    (r"\bdua\s+puluh\s+sat[uu]\b", 21), (r"\bdua\s+puluh\b", 20),
+    (r"\bsembilan\s+belas\b", 19), (r"\bdelapan\s+belas\b", 18), (r"\btujuh\s+belas\b", 17),
+    (r"\benam\s+belas\b", 16), (r"\blima\s+belas\b", 15), (r"\bempat\s+belas\b", 14),
+    (r"\btiga\s+belas\b", 13), (r"\bdua\s+belas\b", 12), (r"\bsebelas\b", 11),
+    (r"\bsepuluh\b", 10), (r"\bsembilan\b", 9), (r"\bdelapan\b", 8), (r"\btujuh\b", 7),
+    (r"\benam\b", 6), (r"\blima\b", 5), (r"\bempat\b", 4), (r"\btiga\b", 3),
+    (r"\bdua\b", 2), (r"\bsatu\b", 1), (r"\bsmbilan\b", 9), (r"\bsemblan\b", 9),
+    (r"\bdlapan\b", 8), (r"\bdlpan\b", 8), (r"\btjuh\b", 7), (r"\btuju\b", 7),
+    (r"\benam\b", 6), (r"\blma\b", 5), (r"\blim\b", 5), (r"\bempet\b", 4),
+    (r"\bmpat\b", 4), (r"\btga\b", 3), (r"\bspuluh\b", 10), (r"\bspluh\b", 10),
+]
+
+
+def _legacy_extract_number(text):
+    match = re.search(r"\b(\d+)\b", text)
+    if match:
+        num = int(match.group(1))
+        if 1 <= num <= 20:
+            return num
+    text_lower = text.lower()
+    for pattern, num in _LEGACY_NUMBER_PATTERNS:
+        if re.search(pattern, text_lower):
+            return num
+    return None
+
+
+def _legacy_parse_future_time(text):
+    text_lower = text.lower()
+    now = get_samarinda_time()
+
+    def _make_target(base, hour):
+        t = base.replace(hour=hour, minute=0, second=0, microsecond=0)
+        if t <= now:
+            t += timedelta(days=1)
+        return t
+
+    if "besok" in text_lower:
+        tomorrow = now + timedelta(days=1)
+        if any(k in text_lower for k in ("pagi", "sarapan")):
+            return tomorrow.replace(hour=8, minute=0, second=0, microsecond=0), "sarapan besok"
+        if any(k in text_lower for k in ("siang", "lunch")):
+            return tomorrow.replace(hour=12, minute=0, second=0, microsecond=0), "makan siang besok"
+        if "sore" in text_lower:
+            return tomorrow.replace(hour=16, minute=0, second=0, microsecond=0), "cemilan sore besok"
+        if any(k in text_lower for k in ("malam", "dinner")):
+            return tomorrow.replace(hour=19, minute=0, second=0, microsecond=0), "makan malam besok"
+        return tomorrow.replace(hour=12, minute=0, second=0, microsecond=0), "besok"
+    if ("nanti" in text_lower and "malam" in text_lower) or "malam ini" in text_lower:
+        return _make_target(now, 19), "malam ini"
+    if "nanti" in text_lower and "siang" in text_lower:
+        return _make_target(now, 12), "nanti siang"
+    match = re.search(r"(?:jam|pukul)\s*(\d{1,2})", text_lower)
+    if match:
+        hour = int(match.group(1))
+        if 0 <= hour <= 23:
+            return _make_target(now, hour), f"jam {hour}"
+    return None
+
+
+def _legacy_detect_category(query):
+    lower = query.lower()
+    for keyword in sorted(_CATEGORY_KEYWORDS, key=len, reverse=True):
+        if keyword in lower:
+            return _CATEGORY_KEYWORDS[keyword]
+    return None
+
+
+def _legacy(query):
+    return (
+        _legacy_extract_number(query),
+        _legacy_parse_future_time(query),
+        _legacy_detect_category(query),
+    )
+
+
+def _bench(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in QUERIES:
+            func(query)
+    return (time.perf_counter() - start) / (rounds * len(QUERIES)) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    query_parser = QueryParser()
+    # re module menyimpan cache pola; pemanasan agar perbandingan adil
+    _bench(_legacy, 10)
+    _bench(query_parser.parse, 10)
+
+    legacy_us = _bench(_legacy, args.rounds)
+    parser_us = _bench(query_parser.parse, args.rounds)
+    print(f"legacy : {legacy_us:7.1f} µs/query  (count + future time + category)")
+    print(f"parser : {parser_us:7.1f} µs/query  (count + future time + category + price + facilities)")
+    print(f"speedup: {legacy_us / parser_us:.1f}x")
+
+    for query in QUERIES:
+        parsed = query_parser.parse(query)
+        print(
+            f"  {query!r}: count={parsed.count} category={parsed.category} "
+            f"max_price={parsed.max_price} facilities={parsed.facilities} "
+            f"future={parsed.future[1] if parsed.future else None}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark encoder SSE /chat/stream: framing lama vs encoder baru.
+
+Memakai harness ASGI & RAGService stub dari `bench_stream_first_paint.py`
+(retrieval stub, LLM streaming dengan jeda tetap per token). Mode:
+
+- legacy    : framing sebelum `src/sse.py` — f-string + `json.dumps` per
+              event, satu frame per token, tanpa `id:` (baseline sebenarnya)
+- per-token : encoder baru (orjson + `id:`) tanpa penggabungan
+- coalesced : encoder baru dengan penggabungan token (setting default)
+
+"legacy → coalesced" adalah perbaikan total; "per-token → coalesced"
+hanya efek penggabungan token.
+
+Per jawaban dilaporkan (rata-rata):
+
+- cpu   : waktu CPU proses (retrieval stub + pipeline + encoding SSE)
+- sends : jumlah pesan `http.response.body` — uvicorn menulis masing-masing
+          ke socket, jadi ≈ jumlah syscall write/send
+- bytes : total byte body SSE
+
+Jalankan: python scripts/bench_sse_encoder.py --runs 10 --tokens 400
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.bench_stream_first_paint import settings, stream_request, stub_service  # noqa: E402
+from src import main as api  # noqa: E402
+
+MODES = {
+    # (window_ms, max_bytes); None = framing lama
+    "legacy": None,
+    "per-token": (0, 0),
+    "coalesced": (30, 64),
+}
+
+
+async def _legacy_frames(events, **_):
+    """Framing /chat/stream sebelum `src/sse.py`: satu str per event via `json.dumps`."""
+    async for event_type, payload, _event_id in events:
+        yield f"event: {event_type}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def _run(runs: int) -> dict:
+    cpu = sends = size = 0.0
+    for _ in range(runs):
+        started = time.process_time()
+        chunks = await stream_request("rekomendasi bakso enak")
+        cpu += time.process_time() - started
+        sends += len(chunks)
+        size += sum(len(chunk) for _, chunk in chunks)
+    return {"cpu_ms": cpu / runs * 1000, "sends": sends / runs, "bytes": size / runs}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--token-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    api.rag_service = stub_service(first_token_ms=50, token_ms=args.token_ms, tokens=args.tokens)
+    api.limiter.enabled = False
+
+    coalesce_events = api.coalesce_events
+    results = {}
+    for mode, coalescing in MODES.items():
+        if coalescing is None:
+            api.coalesce_events = _legacy_frames
+        else:
+            api.coalesce_events = coalesce_events
+            settings.sse_coalesce_window_ms, settings.sse_coalesce_bytes = coalescing
+        results[mode] = asyncio.run(_run(args.runs))
+        r = results[mode]
+        print(
+            f"{mode:<10} cpu={r['cpu_ms']:.1f}ms/answer  sends={r['sends']:.0f}/answer  "
+            f"bytes={r['bytes']:.0f}/answer"
+        )
+
+    after = results["coalesced"]
+    for baseline, label in (("legacy", "total"), ("per-token", "coalescing only")):
+        before = results[baseline]
+        print(
+            f"{baseline} / coalesced ({label}): "
+            f"sends {before['sends'] / after['sends']:.1f}x, "
+            f"cpu {before['cpu_ms'] / after['cpu_ms']:.2f}x, "
+            f"bytes {before['bytes'] / after['bytes']:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark time-to-first-paint /chat/stream: kartu setelah token vs kartu dulu.
+
+Aplikasi FastAPI dipanggil langsung sebagai ASGI app (tanpa server) dengan
+RAGService stub: retrieval berlatensi tetap dan LLM streaming yang mengirim
+token pertama setelah `--first-token-ms` lalu satu token tiap `--token-ms`.
+Setiap chunk body SSE diberi timestamp, lalu dilaporkan (median):
+
+- first-cards : event `restaurants` pertama — kartu bisa dirender
+- first-token : event `token` pertama
+- first-paint : event pertama yang menampilkan sesuatu (kartu atau token)
+- done        : event `done`
+
+Jalankan: python scripts/bench_stream_first_paint.py --runs 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Query identik tiap run — matikan cache agar retrieval tetap terukur
+for _key in ("EMBEDDING_CACHE_SIZE", "RETRIEVAL_CACHE_SIZE"):
+    os.environ.setdefault(_key, "0")
+
+from scripts.bench_chat_concurrency import StubRAGService  # noqa: E402
+from src import main as api  # noqa: E402
+from src.config import get_settings  # noqa: E402
+
+settings = get_settings()
+
+
+class _StubStreamingLLM:
+    def __init__(self, first_token: float, per_token: float, tokens: int) -> None:
+        self._first_token = first_token
+        self._per_token = per_token
+        self._tokens = tokens
+
+    async def astream(self, messages):
+        await asyncio.sleep(self._first_token)
+        for i in range(self._tokens):
+            if i:
+                await asyncio.sleep(self._per_token)
+            yield SimpleNamespace(content=f"kata{i} ", usage_metadata=None)
+
+
+def stub_service(first_token_ms: float, token_ms: float, tokens: int) -> StubRAGService:
+    service = StubRAGService()
+    service._answer_llm = _StubStreamingLLM(first_token_ms / 1000, token_ms / 1000, tokens)
+    return service
+
+
+async def stream_request(message: str) -> List[Tuple[float, bytes]]:
+    """Satu request /chat/stream langsung ke ASGI app → [(detik sejak mulai, chunk body)]."""
+    body = json.dumps({"message": message, "conversation_history": []}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/chat/stream",
+        "raw_path": b"/chat/stream",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    request_sent = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    chunks: List[Tuple[float, bytes]] = []
+    start = time.perf_counter()
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks.append((time.perf_counter() - start, message["body"]))
+
+    await api.app(scope, receive, send)
+    finished.set()
+    return chunks
+
+
+async def _stream_once(message: str) -> dict:
+    """Waktu (detik) event pertama per jenis event."""
+    timings: dict = {}
+    for at, chunk in await stream_request(message):
+        for line in chunk.decode().splitlines():
+            if line.startswith("event: "):
+                timings.setdefault(line[7:].strip(), at)
+    return timings
+
+
+async def _run(runs: int) -> dict:
+    samples: dict = {"first-cards": [], "first-token": [], "first-paint": [], "done": []}
+    for _ in range(runs):
+        # Sekuensial: tidak ada stream yang sedang berjalan untuk di-coalesce
+        timings = await _stream_once("rekomendasi bakso enak")
+        samples["first-cards"].append(timings["restaurants"])
+        samples["first-token"].append(timings["token"])
+        samples["first-paint"].append(min(timings["restaurants"], timings["token"]))
+        samples["done"].append(timings["done"])
+    return {name: statistics.median(values) * 1000 for name, values in samples.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--token-ms", type=float, default=15)
+    parser.add_argument("--tokens", type=int, default=80)
+    args = parser.parse_args()
+
+    api.rag_service = stub_service(args.first_token_ms, args.token_ms, args.tokens)
+    api.limiter.enabled = False
+
+    results = {}
+    for cards_first in (False, True):
+        settings.stream_cards_first = cards_first
+        results[cards_first] = asyncio.run(_run(args.runs))
+        label = "cards-first" if cards_first else "cards-last"
+        print(
+            f"{label:<12} "
+            + "  ".join(f"{name}={ms:.0f}ms" for name, ms in results[cards_first].items())
+        )
+
+    before, after = results[False]["first-cards"], results[True]["first-cards"]
+    print(f"time to cards: {before:.0f}ms → {after:.0f}ms ({before / after:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,24 @@
 import ast
+import json
 import logging
 import sys
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, PointStruct, VectorParams
+from qdrant_client.models import Distance, PayloadSchemaType, PointStruct, VectorParams
 from tqdm import tqdm
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_core.messages import HumanMessage
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from src.catalog import Catalog  # noqa: E402
 from src.config import get_settings  # noqa: E402
+from src.pricing import parse_price_range  # noqa: E402
+from src.schedule import weekly_intervals  # noqa: E402
+from src.utils import TIME_CONTEXTS  # noqa: E402
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
 logger = logging.getLogger(__name__)
@@ -100,6 +106,53 @@ def _generate_ringkasan_batch(llm: ChatOpenAI, rows: list[dict]) -> list[str]:
     return results
 
 
+def _first_sentence(text: str) -> str:
+    head = text.split(". ")[0].strip()
+    return head if head.endswith((".", "!", "?")) else f"{head}."
+
+
+def _generate_blurb_batch(llm: ChatOpenAI, rows: list[dict]) -> list[dict]:
+    """
+    Generate blurb rekomendasi 1 kalimat per konteks waktu (sarapan, makan
+    siang, cemilan sore, makan malam) untuk ANSWER_MODE=blurb. Satu panggilan
+    LLM per restoran; gagal → kalimat pertama ringkasan untuk semua konteks.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    contexts = ", ".join(f'"{c}"' for c in TIME_CONTEXTS)
+
+    def process_row(row):
+        prompt = (
+            "Tulis satu kalimat rekomendasi (maks 25 kata) untuk restoran berikut "
+            f"pada setiap konteks waktu: {contexts}. Jelaskan kenapa tempat ini cocok "
+            "untuk waktu tersebut dengan Bahasa Indonesia yang ramah. Jangan sebut "
+            "nama tempat, harga, jam buka, atau status buka/tutup.\n\n"
+            f"Nama: {row.get('nama_tempat', 'Unknown')}\n"
+            f"Kategori: {row.get('kategori_makanan', 'Unknown')}\n"
+            f"Tipe: {row.get('tipe_tempat', 'Unknown')}\n"
+            f"Menu: {', '.join(row.get('menu_andalan') or [])}\n"
+            f"Ringkasan: {row.get('ringkasan', '')}\n\n"
+            "Balas HANYA dengan JSON dengan key persis: " + contexts
+        )
+        fallback = _first_sentence(str(row.get("ringkasan") or ""))
+
+        try:
+            response = llm.invoke(
+                [HumanMessage(content=prompt)],
+                response_format={"type": "json_object"},
+                max_tokens=320,
+            )
+            data = json.loads(response.content)
+            return {c: str(data.get(c) or fallback).strip() for c in TIME_CONTEXTS}
+        except Exception as exc:
+            logger.warning("Failed to generate blurb for %s: %s", row.get("nama_tempat"), exc)
+            return {c: fallback for c in TIME_CONTEXTS}
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        futures = [executor.submit(process_row, row) for row in rows]
+        return [future.result() for future in futures]
+
+
 def _build_embedding_text(row: dict) -> str:
     """
     Gabungkan field-field penting menjadi satu string untuk embedding.
@@ -130,6 +183,31 @@ def _build_embedding_text(row: dict) -> str:
     return " | ".join(parts)
 
 
+def _schedule_payload(row: dict) -> dict:
+    """
+    Jadwal mingguan dalam menit-minggu (Senin 00:00 = 0) untuk filter
+    "buka pada waktu T" di Qdrant: ada interval dengan buka <= T < tutup.
+    """
+    intervals = weekly_intervals(
+        row.get("jam_buka"), row.get("jam_tutup"), row.get("hari_operasional")
+    )
+    return {
+        "jadwal_mingguan": [{"buka": start, "tutup": end} for start, end in intervals or ()],
+        "jam_diketahui": intervals is not None,
+    }
+
+
+def _price_payload(row: dict) -> dict:
+    """Harga numerik (rupiah) untuk filter budget; field dihilangkan jika tidak diketahui."""
+    low, high = parse_price_range(row.get("range_harga")) or (None, None)
+    payload = {}
+    if low is not None:
+        payload["harga_min"] = low
+    if high is not None:
+        payload["harga_max"] = high
+    return payload
+
+
 def _row_to_payload(row: dict) -> dict:
     """Konversi dict row ke payload Qdrant."""
     return {
@@ -146,9 +224,12 @@ def _row_to_payload(row: dict) -> dict:
         "jam_tutup": row.get("jam_tutup", "Unknown"),
         "hari_operasional": row.get("hari_operasional", "Unknown"),
         "ringkasan": row["ringkasan"],
+        "blurb": row.get("blurb", {}),
         "tags": row.get("tags", []),
         "popularity_score": row.get("popularity_score", 0.0),
         "user_comments": row.get("user_comments", ""),
+        **_schedule_payload(row),
+        **_price_payload(row),
     }
 
 
@@ -207,6 +288,16 @@ def main() -> None:
     df["ringkasan"] = ringkasan_list
     logger.info("Generated %d ringkasan", len(ringkasan_list))
 
+    # 4b. Blurb rekomendasi per konteks waktu (dipakai ANSWER_MODE=blurb)
+    blurb_list = []
+    rows_as_dicts = df.to_dict("records")
+    for i in tqdm(range(0, len(rows_as_dicts), RINGKASAN_BATCH_SIZE), desc="Blurb"):
+        batch = rows_as_dicts[i:i + RINGKASAN_BATCH_SIZE]
+        blurb_list.extend(_generate_blurb_batch(llm, batch))
+
+    df["blurb"] = blurb_list
+    logger.info("Generated blurbs for %d restaurants", len(blurb_list))
+
     # 5. Inisialisasi embedding (dengan dimensions parameter)
     logger.info("Loading OpenAI embeddings: %s (dim=%d)", settings.embedding_model, settings.embedding_dimensions)
     embeddings = OpenAIEmbeddings(
@@ -237,19 +328,36 @@ def main() -> None:
         "Collection '%s' created (dim=%d)", collection_name, settings.embedding_dimensions
     )
 
+    # Payload index untuk filter jam buka (nested range) & budget di sisi Qdrant
+    for field_name in ("jadwal_mingguan[].buka", "jadwal_mingguan[].tutup", "harga_min", "harga_max"):
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=PayloadSchemaType.INTEGER,
+        )
+    logger.info("Payload indexes created for jadwal_mingguan & harga")
+
     # 8. Generate embedding & upload secara batch
     logger.info("Generating embeddings and uploading (batch=%d)...", BATCH_SIZE)
     final_rows = df.to_dict("records")
     batch: list[PointStruct] = []
     errors = 0
+    # Simpan juga untuk snapshot index lokal
+    snapshot_ids: list[int] = []
+    snapshot_vectors: list[list[float]] = []
+    snapshot_payloads: list[dict] = []
 
     for idx, row in tqdm(enumerate(final_rows), total=len(final_rows), desc="Ingesting"):
         try:
             text = _build_embedding_text(row)
             vector = embeddings.embed_query(text)
+            payload = _row_to_payload(row)
             batch.append(
-                PointStruct(id=idx, vector=vector, payload=_row_to_payload(row))
+                PointStruct(id=idx, vector=vector, payload=payload)
             )
+            snapshot_ids.append(idx)
+            snapshot_vectors.append(vector)
+            snapshot_payloads.append(payload)
 
             if len(batch) >= BATCH_SIZE:
                 client.upsert(collection_name=collection_name, points=batch)
@@ -272,6 +380,14 @@ def main() -> None:
         info.points_count,
     )
 
+    # 10. Ekspor snapshot untuk index vektor lokal (LOCAL_INDEX_ENABLED)
+    Catalog(
+        snapshot_ids,
+        snapshot_payloads,
+        np.asarray(snapshot_vectors, dtype=np.float32),
+        source="ingest",
+    ).save(settings.local_index_path)
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
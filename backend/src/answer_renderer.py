@@ -0,0 +1,129 @@
+"""
+Render jawaban chat di server (mode `compact` dan `blurb`).
+
+Mode compact: LLM hanya mengembalikan JSON berisi nomor kandidat + satu
+kalimat alasan. Mode blurb: alasan diambil dari blurb payload yang dibuat
+saat ingest, tanpa LLM. Teks akhir (nama, menu, harga, status) disusun dari
+payload yang sama dengan kartu, sehingga urutan jawaban dan kartu identik.
+"""
+
+import json
+import logging
+from typing import List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+_GREETINGS = {
+    "sarapan": "Selamat pagi! Ini pilihan sarapan yang cocok buat kamu:",
+    "makan siang": "Waktunya makan siang! Ini rekomendasi yang bisa kamu coba:",
+    "cemilan sore": "Pas buat cemilan sore, coba tempat-tempat ini:",
+    "makan malam": "Buat makan malam, ini rekomendasi yang cocok:",
+}
+_DEFAULT_GREETING = "Ini rekomendasi tempat makan buat kamu:"
+_FUTURE_GREETING = "Untuk {time_context}, ini tempat yang bisa kamu datangi:"
+_CLOSING = "Selamat menikmati, kabari aku kalau mau rekomendasi lain!"
+
+_MAX_MENU_ITEMS = 3
+
+
+class Pick(NamedTuple):
+    """Satu rekomendasi: payload restoran + alasan singkat (dari LLM atau blurb)."""
+
+    resto: dict
+    reason: str
+
+
+def _load_items(text: str) -> list:
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        logger.warning("Compact answer is not valid JSON, using ranking order")
+        return []
+    items = data.get("pilihan") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return []
+    return [item for item in items if isinstance(item, dict)]
+
+
+def parse_compact_answer(text: str, candidates: List[dict], count: int) -> List[Pick]:
+    """
+    Pilihan LLM (nomor 1-based pada `candidates`) → daftar `Pick` berurutan.
+
+    Nomor di luar jangkauan atau duplikat dibuang. Jika pilihan kurang dari
+    `count`, sisanya diisi dari urutan kandidat (buka lebih dulu).
+    """
+    picks: List[Pick] = []
+    seen = set()
+    for item in _load_items(text):
+        if len(picks) >= count:
+            break
+        try:
+            index = int(item.get("no")) - 1
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= index < len(candidates) or index in seen:
+            continue
+        seen.add(index)
+        picks.append(Pick(candidates[index], str(item.get("alasan") or "").strip()))
+
+    for index, resto in enumerate(candidates):
+        if len(picks) >= count:
+            break
+        if index not in seen:
+            seen.add(index)
+            picks.append(Pick(resto, ""))
+    return picks
+
+
+def _blurb(resto: dict, meal_context: str) -> str:
+    blurbs = resto.get("blurb")
+    if isinstance(blurbs, dict) and blurbs.get(meal_context):
+        return str(blurbs[meal_context])
+    # Payload lama tanpa blurb: kalimat pertama ringkasan
+    return str(resto.get("ringkasan") or "").split(". ")[0].strip()
+
+
+def blurb_picks(candidates: List[dict], count: int, meal_context: str) -> List[Pick]:
+    """`count` kandidat teratas dengan blurb ingest untuk konteks waktu makan."""
+    return [Pick(resto, _blurb(resto, meal_context)) for resto in candidates[:count]]
+
+
+def _sentence(text: str) -> str:
+    return text if text.endswith((".", "!", "?")) else f"{text}."
+
+
+def _describe(resto: dict, reason: str) -> str:
+    parts = [_sentence(reason)] if reason else []
+
+    menu = resto.get("menu_andalan") or []
+    if not isinstance(menu, list):
+        menu = [str(menu)]
+    if menu:
+        parts.append(f"Menu andalan: {', '.join(map(str, menu[:_MAX_MENU_ITEMS]))}.")
+
+    harga = resto.get("range_harga")
+    if harga and harga != "Unknown":
+        parts.append(f"Harga {harga}.")
+
+    status = resto.get("status_operasional")
+    if status:
+        jam_buka, jam_tutup = resto.get("jam_buka"), resto.get("jam_tutup")
+        hours = f" (jam {jam_buka}–{jam_tutup})" if jam_buka and jam_tutup else ""
+        parts.append(f"Status: {status}{hours}.")
+    return " ".join(parts)
+
+
+def render_answer(picks: List[Pick], time_context: str, is_future: bool) -> str:
+    """Markdown jawaban dengan format yang sama seperti jawaban prosa LLM."""
+    if is_future:
+        greeting = _FUTURE_GREETING.format(time_context=time_context)
+    else:
+        greeting = _GREETINGS.get(time_context, _DEFAULT_GREETING)
+
+    lines = [greeting, ""]
+    for i, (resto, reason) in enumerate(picks, 1):
+        lines.append(f"**{i}. {resto.get('nama_tempat', 'Unknown')}**")
+        lines.append(_describe(resto, reason))
+        lines.append("")
+    lines.append(_CLOSING)
+    return "\n".join(lines)
@@ -0,0 +1,94 @@
+"""Snapshot katalog restoran (id, payload, vektor) dari koleksi Qdrant."""
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, List, Optional
+
+import numpy as np
+from qdrant_client import QdrantClient
+
+logger = logging.getLogger(__name__)
+
+_SCROLL_BATCH = 256
+
+
+class Catalog:
+    """
+    Salinan in-memory seluruh titik di koleksi Qdrant.
+
+    Dipakai sebagai sumber data untuk index lokal (vektor, leksikal, jadwal)
+    agar retrieval tidak selalu bergantung pada round-trip ke Qdrant.
+    """
+
+    def __init__(
+        self,
+        ids: List[Any],
+        payloads: List[dict],
+        vectors: Optional[np.ndarray] = None,
+        source: str = "unknown",
+    ) -> None:
+        if vectors is not None and len(vectors) != len(ids):
+            raise ValueError("Jumlah vektor tidak sama dengan jumlah id")
+        self.ids = ids
+        self.payloads = payloads
+        self.vectors = vectors
+        self.source = source
+        self.loaded_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_qdrant(
+        cls, client: QdrantClient, collection_name: str, with_vectors: bool = True
+    ) -> "Catalog":
+        """Scroll seluruh koleksi Qdrant ke memori."""
+        ids: List[Any] = []
+        payloads: List[dict] = []
+        vectors: List[List[float]] = []
+
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name,
+                limit=_SCROLL_BATCH,
+                offset=offset,
+                with_payload=True,
+                with_vectors=with_vectors,
+            )
+            for point in points:
+                ids.append(point.id)
+                payloads.append(point.payload or {})
+                if with_vectors:
+                    vectors.append(point.vector)
+            if offset is None:
+                break
+
+        matrix = np.asarray(vectors, dtype=np.float32) if with_vectors else None
+        logger.info("Catalog snapshot from Qdrant '%s': %d points", collection_name, len(ids))
+        return cls(ids, payloads, matrix, source=f"qdrant:{collection_name}")
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "Catalog":
+        """Muat snapshot yang diekspor oleh `scripts/ingest_data.py`."""
+        with np.load(path, allow_pickle=False) as data:
+            ids = data["ids"].tolist()
+            vectors = data["vectors"].astype(np.float32)
+            payloads = json.loads(str(data["payloads"]))
+        logger.info("Catalog snapshot from file '%s': %d points", path, len(ids))
+        return cls(ids, payloads, vectors, source=f"file:{path}")
+
+    def save(self, path: str | Path) -> None:
+        """Simpan snapshot ke file .npz (vektor float32 + payload JSON)."""
+        if self.vectors is None:
+            raise ValueError("Catalog tanpa vektor tidak bisa disimpan")
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path,
+            ids=np.asarray(self.ids),
+            vectors=self.vectors.astype(np.float32),
+            payloads=np.asarray(json.dumps(self.payloads, ensure_ascii=False)),
+        )
+        logger.info("Catalog snapshot saved to '%s' (%d points)", path, len(self))
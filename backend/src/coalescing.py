@@ -0,0 +1,53 @@
+"""Single-flight: request identik yang berjalan bersamaan berbagi satu komputasi."""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Request pertama untuk suatu kunci menjadi "leader" dan menjalankan
+    komputasinya; request lain dengan kunci sama selama leader masih berjalan
+    menunggu hasil yang sama. Setelah selesai, kunci dilepas (bukan cache).
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def run(self, key: Optional[Hashable], func: Callable[[], Awaitable[T]]) -> T:
+        """Jalankan `func` atau ikut hasil komputasi yang sedang berjalan. Kunci None = tanpa coalescing."""
+        if key is None:
+            return await func()
+
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+        else:
+            self.followers += 1
+            logger.info("Coalesced request onto in-flight computation")
+
+        # shield: client yang disconnect tidak membatalkan komputasi milik request lain
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
@@ -1,5 +1,8 @@
+import importlib.util
 from functools import lru_cache
 from pathlib import Path
+from typing import Literal
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
 
@@ -8,14 +11,90 @@ class Settings(BaseSettings):
     qdrant_api_key: str
     qdrant_collection_name: str = "fix-food-chatbot"
 
+    # Transport Qdrant — gRPC lebih hemat untuk payload vektor & batch query
+    qdrant_prefer_grpc: bool = True
+    qdrant_grpc_port: int = 6334
+    qdrant_timeout: int = 10
+    # Interval refresh metadata koleksi (detik)
+    qdrant_metadata_refresh_interval: int = 5 * 60
+
     openai_api_key: str
     llm_model: str = "gpt-4o-mini"          
     llm_temperature: float = 0.7
     llm_max_tokens: int = 2000
 
+    # Mode jawaban: "prose" = LLM menulis seluruh jawaban; "compact" = LLM hanya
+    # memilih nomor kandidat + alasan (JSON), teks dirender di server;
+    # "blurb" = tanpa LLM, teks dari blurb per konteks waktu hasil ingest
+    answer_mode: Literal["prose", "compact", "blurb"] = "prose"
+    compact_max_tokens: int = 400
+
+    # /chat/stream: kirim event `restaurants` sebelum token pertama
+    stream_cards_first: bool = True
+    # Penggabungan token SSE (0 = satu frame per token) & keep-alive (detik)
+    sse_coalesce_window_ms: int = 30
+    sse_coalesce_bytes: int = 64
+    sse_keepalive_interval: float = 15.0
+    # Resume stream via Last-Event-ID: jumlah stream disimpan, umur (detik),
+    # masa tenggang sebelum stream tanpa subscriber dibatalkan (detik), dan
+    # batas event yang di-buffer per stream
+    stream_replay_size: int = 256
+    stream_replay_ttl: float = 300.0
+    stream_resume_grace: float = 10.0
+    stream_max_events: int = 4096
+
+    # Sesi percakapan di server (conversation_id): "memory" (per worker, LRU+TTL)
+    # atau "redis" (server Redis-compatible lokal, dibagi antar worker)
+    session_backend: Literal["memory", "redis"] = "memory"
+    session_redis_url: str = "redis://localhost:6379/0"
+    session_max_sessions: int = 2000
+    session_ttl: int = 60 * 60
+    session_max_history: int = 20
+    session_max_candidates: int = 20
+
+    # Model kecil khusus query compression (output satu query pendek)
+    compression_model: str = "gpt-4o-mini"
+    compression_max_tokens: int = 60
+
+    # Budget token input LLM: data restoran & riwayat percakapan
+    context_token_budget: int = 1800
+    history_token_budget: int = 600
+
     embedding_model: str = "text-embedding-3-large"
     embedding_dimensions: int = 1536
 
+    # Cache embedding query (LRU + TTL)
+    embedding_cache_size: int = 2048
+    embedding_cache_ttl: int = 24 * 60 * 60
+
+    # Cache hasil retrieval (daftar kandidat per query; status dihitung ulang)
+    retrieval_cache_size: int = 1024
+    retrieval_cache_ttl: int = 60 * 60
+
+    # Semantic cache respons penuh untuk pesan pertama (opt-in)
+    response_cache_enabled: bool = False
+    response_cache_size: int = 256
+    response_cache_ttl: int = 30 * 60
+    response_cache_threshold: float = 0.92
+
+    # Index vektor lokal (NumPy) — mirror koleksi Qdrant di memori
+    local_index_enabled: bool = False
+    local_index_path: str = str(Path(__file__).parent.parent / "data" / "vector_index.npz")
+
+    # Index leksikal BM25 untuk hybrid retrieval
+    lexical_index_enabled: bool = True
+
+    # Interval re-sync snapshot katalog (detik)
+    catalog_sync_interval: int = 15 * 60
+
+    @field_validator("session_backend")
+    @classmethod
+    def check_session_backend(cls, v: str) -> str:
+        """Backend redis butuh paket opsional `redis` — gagal saat startup, bukan saat request."""
+        if v == "redis" and importlib.util.find_spec("redis") is None:
+            raise ValueError("SESSION_BACKEND=redis membutuhkan paket `redis` (pip install redis)")
+        return v
+
     class Config:
         env_file = str(Path(__file__).parent.parent / ".env")
         case_sensitive = False
@@ -0,0 +1,182 @@
+"""Index leksikal BM25 in-memory di atas katalog restoran."""
+
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .catalog import Catalog
+from .vector_index import LocalHit
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+# Bobot field (BM25F sederhana): nama tempat paling menentukan
+_FIELD_WEIGHTS = {
+    "nama_tempat": 3.0,
+    "menu_andalan": 2.0,
+    "tags": 1.0,
+    "ringkasan": 1.0,
+}
+
+# Nama tempat dianggap "spesifik" jika punya token yang muncul di <= N dokumen
+_RARE_TOKEN_MAX_DF = 3
+_MIN_NAME_LENGTH = 6
+
+
+def tokenize(text: str) -> List[str]:
+    """Token alfanumerik huruf kecil."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _field_text(value) -> str:
+    if isinstance(value, list):
+        return " ".join(str(v) for v in value)
+    return str(value) if value else ""
+
+
+class BM25Index:
+    """
+    Inverted index BM25 atas `nama_tempat`, `menu_andalan`, `tags`, `ringkasan`.
+
+    Dipakai untuk menangkap query yang menyebut nama tempat/menu secara
+    eksplisit — sinyal yang sering hilang di dense retrieval.
+    """
+
+    def __init__(self, catalog: Catalog, k1: float = 1.2, b: float = 0.75) -> None:
+        self._catalog = catalog
+        self._k1 = k1
+        self._b = b
+
+        n_docs = len(catalog)
+        doc_lengths = np.zeros(n_docs, dtype=np.float32)
+        postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+
+        for doc_id, payload in enumerate(catalog.payloads):
+            weighted_tf: Counter = Counter()
+            for field, weight in _FIELD_WEIGHTS.items():
+                for token in tokenize(_field_text(payload.get(field))):
+                    weighted_tf[token] += weight
+            doc_lengths[doc_id] = sum(weighted_tf.values())
+            for token, tf in weighted_tf.items():
+                postings[token][doc_id] = tf
+
+        avg_length = float(doc_lengths.mean()) if n_docs else 0.0
+        self._length_norm = k1 * (1 - b + b * doc_lengths / (avg_length or 1.0))
+
+        self._postings: Dict[str, tuple] = {}
+        for token, docs in postings.items():
+            df = len(docs)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            self._postings[token] = (
+                np.fromiter(docs.keys(), dtype=np.int32, count=df),
+                np.fromiter(docs.values(), dtype=np.float32, count=df),
+                idf,
+            )
+
+        self._categories = [
+            str(p.get("kategori_makanan", "")).lower() for p in catalog.payloads
+        ]
+
+        # Nama tempat ternormalisasi → dokumen, hanya nama yang cukup spesifik
+        self._names: Dict[str, List[int]] = defaultdict(list)
+        for doc_id, payload in enumerate(catalog.payloads):
+            tokens = tokenize(str(payload.get("nama_tempat", "")))
+            name = " ".join(tokens)
+            if len(name) < _MIN_NAME_LENGTH:
+                continue
+            if any(len(self._postings[t][0]) <= _RARE_TOKEN_MAX_DF for t in tokens):
+                self._names[name].append(doc_id)
+        self._name_order = sorted(self._names, key=len, reverse=True)
+
+        logger.info("BM25 index built: %d docs, %d terms", n_docs, len(self._postings))
+
+    @property
+    def catalog(self) -> Catalog:
+        return self._catalog
+
+    def __len__(self) -> int:
+        return len(self._catalog)
+
+    def _scores(self, tokens: List[str]) -> np.ndarray:
+        scores = np.zeros(len(self._catalog), dtype=np.float32)
+        for token in set(tokens):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            docs, tf, idf = posting
+            scores[docs] += idf * tf * (self._k1 + 1) / (tf + self._length_norm[docs])
+        return scores
+
+    def _to_hits(self, scores: np.ndarray, doc_ids: np.ndarray) -> List[LocalHit]:
+        catalog = self._catalog
+        return [
+            LocalHit(catalog.ids[i], float(scores[i]), catalog.payloads[i])
+            for i in doc_ids
+        ]
+
+    def _apply_filters(
+        self, scores: np.ndarray, category_filter: str | None, allowed: np.ndarray | None
+    ) -> None:
+        """Nol-kan skor dokumen di luar mask `allowed` / kategori (in-place)."""
+        if allowed is not None:
+            scores[~allowed] = 0.0
+        if category_filter:
+            key = category_filter.lower()
+            for i, category in enumerate(self._categories):
+                if key not in category:
+                    scores[i] = 0.0
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        category_filter: str | None = None,
+        allowed: np.ndarray | None = None,
+    ) -> List[LocalHit]:
+        """Top-k dokumen dengan skor BM25 > 0 (opsional dibatasi mask `allowed`)."""
+        scores = self._scores(tokenize(query))
+        self._apply_filters(scores, category_filter, allowed)
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) == 0:
+            return []
+        order = matched[np.argsort(-scores[matched], kind="stable")][:top_k]
+        return self._to_hits(scores, order)
+
+    def exact_name_match(
+        self,
+        query: str,
+        top_k: int,
+        category_filter: str | None = None,
+        allowed: np.ndarray | None = None,
+    ) -> Optional[List[LocalHit]]:
+        """
+        Jika query menyebut nama tempat yang spesifik secara utuh, kembalikan
+        tempat tersebut di urutan teratas diikuti hasil BM25 lainnya.
+        None jika tidak ada nama yang cocok dengan cukup yakin, atau jika
+        tempat itu tersaring oleh kategori / mask `allowed` (sama seperti `search`).
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        padded = f" {' '.join(tokens)} "
+
+        for name in self._name_order:
+            if f" {name} " not in padded:
+                continue
+            named = self._names[name]
+            scores = self._scores(tokens)
+            scores[named] += scores.max() + 1.0
+            self._apply_filters(scores, category_filter, allowed)
+            if not scores[named].any():
+                return None
+            matched = np.flatnonzero(scores > 0)
+            order = matched[np.argsort(-scores[matched], kind="stable")][:top_k]
+            return self._to_hits(scores, order)
+
+        return None
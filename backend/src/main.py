@@ -1,4 +1,4 @@
-import json
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
@@ -11,11 +11,15 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 
+from .coalescing import SingleFlight
 from .exceptions import AppError, app_error_handler
 from .middleware import RequestIDMiddleware
 from .models import ChatRequest, ChatResponse, PostsResponse
 from .posts_service import PostsService
 from .rag_service import RAGService
+from .session_store import create_session_store
+from .sse import coalesce_events, encode_event
+from .streaming import BroadcastRegistry
 from .utils import get_samarinda_time
 from .config import get_settings
 
@@ -35,6 +39,27 @@ limiter = Limiter(key_func=get_remote_address)
 rag_service: RAGService | None = None
 posts_service: PostsService | None = None
 
+# Single-flight untuk pesan identik yang datang bersamaan
+chat_flights = SingleFlight()
+stream_broadcasts = BroadcastRegistry(
+    replay_size=settings.stream_replay_size,
+    replay_ttl=settings.stream_replay_ttl,
+    resume_grace=settings.stream_resume_grace,
+    max_events=settings.stream_max_events,
+)
+# Riwayat & state giliran terakhir per conversation_id
+session_store = create_session_store()
+
+
+async def _run_periodically(interval: float, func) -> None:
+    """Jalankan fungsi sync di thread pool setiap `interval` detik."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(func)
+        except Exception as exc:
+            logger.warning("Background task %s failed: %s", func.__name__, exc)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -51,14 +76,29 @@ async def lifespan(app: FastAPI):
     except Exception as exc:
         logger.error("RAGService failed to initialize: %s", exc)
         rag_service = None 
+
+    background_tasks: list[asyncio.Task] = []
+    if rag_service:
+        background_tasks.append(asyncio.create_task(
+            _run_periodically(
+                settings.qdrant_metadata_refresh_interval, rag_service._store.refresh_metadata
+            )
+        ))
+    if rag_service and (settings.local_index_enabled or settings.lexical_index_enabled):
+        background_tasks.append(asyncio.create_task(
+            _run_periodically(settings.catalog_sync_interval, rag_service.refresh_catalog)
+        ))
     
     yield
     
     # Shutdown
     logger.info("Shutting down gracefully...")
-    if rag_service and rag_service._qdrant:
+    for task in background_tasks:
+        task.cancel()
+    await session_store.aclose()
+    if rag_service:
         try:
-            rag_service._qdrant.close()
+            await rag_service.aclose()
             logger.info("Qdrant connection closed")
         except Exception as exc:
             logger.warning("Error closing Qdrant connection: %s", exc)
@@ -126,7 +166,7 @@ async def health_check():
     # Check Qdrant
     if rag_service:
         try:
-            rag_service._qdrant.get_collections()
+            await rag_service._store.aping()
             checks["qdrant"] = "healthy"
         except Exception as e:
             checks["qdrant"] = f"unhealthy: {e}"
@@ -167,7 +207,7 @@ async def chat(request: Request, body: ChatRequest):
     - Mendukung jumlah rekomendasi dinamis ("kasih 7 tempat").
     - Toleransi typo angka ("lma" → 5, "tjuh" → 7).
     - Mendukung waktu mendatang ("besok pagi", "jam 19").
-    - Riwayat percakapan multi-turn.
+    - Riwayat percakapan multi-turn (sesi server via `conversation_id`).
     - Contextual query compression.
     - Metadata pre-filtering.
     """
@@ -181,12 +221,31 @@ async def chat(request: Request, body: ChatRequest):
             ),
         )
 
+    # Riwayat dari body hanya dipakai jika sesi tidak ditemukan (kedaluwarsa,
+    # worker lain, restart); sesi baru mendapat conversation_id baru
+    session = await session_store.load(
+        body.conversation_id, [msg.model_dump() for msg in body.conversation_history]
+    )
+    history = list(session.history)
     try:
-        response_text, cards = rag_service.generate_response(
-            user_query=body.message,
-            conversation_history=[msg.model_dump() for msg in body.conversation_history],
+        # Pesan identik yang sedang diproses → ikut hasil komputasi yang sama
+        response_text, cards, state = await chat_flights.run(
+            rag_service.coalescing_key(body.message, history),
+            lambda: rag_service.agenerate_turn(
+                user_query=body.message,
+                conversation_history=history,
+                session=session,
+            ),
+        )
+        session.record_turn(
+            body.message, response_text, state, [card.nama_tempat for card in cards]
+        )
+        await session_store.save(session)
+        return ChatResponse(
+            message=response_text,
+            restaurants=cards,
+            conversation_id=session.conversation_id,
         )
-        return ChatResponse(message=response_text, restaurants=cards)
 
     except ConnectionError as exc:
         raise HTTPException(status_code=503, detail=str(exc))
@@ -203,8 +262,17 @@ async def chat_stream(request: Request, body: ChatRequest):
 
     Events:
     - `token`: Token teks dari LLM (streaming)
-    - `restaurants`: Data kartu restoran (setelah streaming selesai)
-    - `done`: Penanda bahwa streaming telah selesai
+    - `restaurants`: Data kartu restoran — sebelum token pertama jika
+      STREAM_CARDS_FIRST aktif; bisa dikirim ulang dengan urutan final
+      (mode compact), event terakhir yang berlaku
+    - `done`: Penanda bahwa streaming telah selesai, berisi `conversation_id`
+      untuk giliran berikutnya
+
+    Setiap event membawa `id: <stream_id>:<seq>`. Client yang terputus
+    mengirim ulang request yang sama dengan header `Last-Event-ID` untuk
+    menerima event yang terlewat lalu lanjut live dari stream yang sama;
+    jika stream sudah tidak tersimpan, jawaban dibuat ulang dari awal
+    (stream_id baru).
     """
     if rag_service is None:
         raise HTTPException(
@@ -212,22 +280,76 @@ async def chat_stream(request: Request, body: ChatRequest):
             detail="RAG service tidak tersedia.",
         )
 
+    session = await session_store.load(
+        body.conversation_id, [msg.model_dump() for msg in body.conversation_history]
+    )
+    history = list(session.history)
+    broadcast, after = None, 0
+    last_event_id = request.headers.get("Last-Event-ID")
+    if last_event_id:
+        broadcast, after = stream_broadcasts.resume(last_event_id)
+    if broadcast is None:
+        # Pesan identik yang sedang di-stream → follower menerima token dari stream yang sama
+        broadcast = stream_broadcasts.attach(
+            rag_service.coalescing_key(body.message, history),
+            lambda: rag_service.agenerate_response_stream(
+                user_query=body.message,
+                conversation_history=history,
+                session=session,
+            ),
+        )
+
+    async def payloads():
+        # Subscription berhenti saat client disconnect; jika tidak ada
+        # subscriber tersisa, stream LLM upstream ikut dibatalkan
+        answer, cards, state = [], [], None
+        async for seq, (event_type, data) in broadcast.subscribe(request.is_disconnected):
+            # Setiap subscriber menyimpan giliran ke sesinya sendiri, sekali
+            # per stream (subscriber yang resume tidak mencatat ulang); jawaban
+            # dikumpulkan dari awal stream meski event sebelum Last-Event-ID
+            # tidak dikirim ulang
+            if event_type == "turn":
+                state = data
+            elif event_type == "token":
+                answer.append(data)
+            elif event_type == "restaurants":
+                cards = data
+            elif (
+                event_type == "done"
+                and state is not None
+                and session.conversation_id not in broadcast.recorded_sessions
+            ):
+                broadcast.recorded_sessions.add(session.conversation_id)
+                session.record_turn(
+                    body.message, "".join(answer), state, [card.nama_tempat for card in cards]
+                )
+                await session_store.save(session)
+            if seq <= after or event_type == "turn":
+                continue
+
+            event_id = broadcast.event_id(seq)
+            if event_type == "token":
+                yield "token", {"content": data}, event_id
+            elif event_type == "restaurants":
+                yield "restaurants", {"restaurants": [card.model_dump() for card in data]}, event_id
+            elif event_type == "done":
+                yield "done", {"conversation_id": session.conversation_id}, event_id
+            elif event_type == "error":
+                yield "error", {"message": data}, event_id
+
     async def event_generator():
         try:
-            for event_type, data in rag_service.generate_response_stream(
-                user_query=body.message,
-                conversation_history=[msg.model_dump() for msg in body.conversation_history],
+            # Token digabung per jendela waktu/ukuran kecil → lebih sedikit frame & write
+            async for frame in coalesce_events(
+                payloads(),
+                window=settings.sse_coalesce_window_ms / 1000,
+                max_bytes=settings.sse_coalesce_bytes,
+                keepalive_interval=settings.sse_keepalive_interval,
             ):
-                if event_type == "token":
-                    yield f"event: token\ndata: {json.dumps({'content': data})}\n\n"
-                elif event_type == "restaurants":
-                    cards_data = [card.model_dump() for card in data]
-                    yield f"event: restaurants\ndata: {json.dumps({'restaurants': cards_data})}\n\n"
-                elif event_type == "done":
-                    yield f"event: done\ndata: {{}}\n\n"
+                yield frame
         except Exception as exc:
             logger.exception("Error in SSE stream")
-            yield f"event: error\ndata: {json.dumps({'message': str(exc)})}\n\n"
+            yield encode_event("error", {"message": str(exc)})
 
     return StreamingResponse(
         event_generator(),
@@ -309,16 +431,16 @@ async def debug_qdrant():
         raise HTTPException(status_code=503, detail="RAG service tidak tersedia.")
     
     try:
-        # Get collection info
-        collection_info = rag_service._qdrant.get_collection(settings.qdrant_collection_name)
+        # Get collection info (live, sekaligus refresh cache metadata)
+        collection_info = await asyncio.to_thread(rag_service._store.refresh_metadata)
         
         # Try a simple query
         test_vector = [0.1] * settings.embedding_dimensions
-        test_results = rag_service._qdrant.query_points(
+        test_results = (await rag_service._store.aclient.query_points(
             collection_name=settings.qdrant_collection_name,
             query=test_vector,
             limit=5,
-        ).points
+        )).points
         
         return {
             "collection_name": settings.qdrant_collection_name,
@@ -333,6 +455,21 @@ async def debug_qdrant():
         raise HTTPException(status_code=500, detail=f"Qdrant debug error: {exc}")
 
 
+@app.get("/api/debug/stats", tags=["Admin"])
+async def debug_stats():
+    """Statistik runtime RAG (cache, counter)."""
+    if rag_service is None:
+        raise HTTPException(status_code=503, detail="RAG service tidak tersedia.")
+    return {
+        **rag_service.get_stats(),
+        "coalescing": {
+            "chat": chat_flights.stats(),
+            "stream": stream_broadcasts.stats(),
+        },
+        "sessions": session_store.stats(),
+    }
+
+
 @app.get("/api/debug/retrieve", tags=["Admin"])
 async def debug_retrieve(query: str = "bakso"):
     """Manual retrieval test untuk debugging."""
@@ -345,15 +482,15 @@ async def debug_retrieve(query: str = "bakso"):
         logger.info("Query: %s", query)
         
         # Generate embedding
-        vector = rag_service._embeddings.embed_query(query)
+        vector = await rag_service._aembed_query(query)
         logger.info("Generated embedding vector length: %d", len(vector))
         
         # Query Qdrant langsung
-        hits = rag_service._qdrant.query_points(
+        hits = (await rag_service._store.aclient.query_points(
             collection_name=settings.qdrant_collection_name,
             query=vector,
             limit=20,
-        ).points
+        )).points
         
         logger.info("Raw Qdrant hits: %d", len(hits))
         
@@ -410,8 +547,8 @@ async def debug_full_rag(query: str = "bakso"):
     try:
         logger.info("=== FULL RAG DEBUG ===")
         
-        # Step 1: Call _retrieve method directly
-        raw_results = rag_service._retrieve(query, top_k=40, category_filter=None)
+        # Step 1: Call _aretrieve method directly
+        raw_results = await rag_service._aretrieve(query, top_k=40, category_filter=None)
         logger.info("Step 1 - Raw retrieve results: %d", len(raw_results))
         
         # Step 2: Annotate status
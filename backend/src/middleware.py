@@ -2,22 +2,36 @@
 
 import uuid
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
+class RequestIDMiddleware:
     """
     Menambahkan X-Request-ID ke setiap request/response.
     Jika client mengirim header X-Request-ID, gunakan nilai tersebut.
     Jika tidak, generate UUID baru.
+
+    Middleware ASGI murni (bukan `BaseHTTPMiddleware`): `receive` dan `send`
+    diteruskan apa adanya, sehingga response streaming tidak di-buffer lewat
+    memory stream dan `request.is_disconnected()` tetap melihat disconnect.
     """
 
-    async def dispatch(self, request: Request, call_next) -> Response:
-        request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
-        request.state.request_id = request_id
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get("X-Request-ID", str(uuid.uuid4()))
+        # Sama dengan `request.state.request_id`
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
 
-        response = await call_next(request)
-        response.headers["X-Request-ID"] = request_id
-        return response
+        await self.app(scope, receive, send_with_request_id)
@@ -16,7 +16,15 @@ class ChatRequest(BaseModel):
     conversation_history: List[ChatMessage] = Field(
         default_factory=list,
         max_length=20,
-        description="Riwayat percakapan sebelumnya (maks 20 pesan)",
+        description=(
+            "Riwayat percakapan sebelumnya (maks 20 pesan); dengan conversation_id "
+            "hanya dipakai jika sesi server sudah tidak ada"
+        ),
+    )
+    conversation_id: Optional[str] = Field(
+        None,
+        max_length=64,
+        description="ID sesi dari respons sebelumnya; riwayat diambil dari server",
     )
 
     @field_validator("message")
@@ -0,0 +1,60 @@
+"""
+Model harga numerik dari teks `range_harga` yang bebas formatnya.
+
+Contoh yang didukung: "Rp 20.000 - Rp 50.000", "15 - 25 K", "< Rp 25.000",
+"50rb", "20-50 ribu", "> 100K", "1,5 jt".
+"""
+
+import re
+from typing import Optional, Tuple
+
+_UNIT_MULTIPLIER = {"ribu": 1_000, "rb": 1_000, "k": 1_000, "jt": 1_000_000, "juta": 1_000_000}
+
+_GROUPED_RE = re.compile(r"^\d{1,3}(?:[.,]\d{3})+$")
+_AMOUNT_RE = re.compile(r"(\d+(?:[.,]\d+)*)\s*(ribu|rb|k|jt|juta)?\b")
+_UPPER_BOUND_RE = re.compile(r"^\s*(?:<|di\s*bawah|kurang\s+dari|maks|max|under)")
+_LOWER_BOUND_RE = re.compile(r"^\s*(?:>|di\s*atas|lebih\s+dari|mulai|start|from)")
+
+PriceRange = Tuple[Optional[int], Optional[int]]
+
+
+def to_rupiah(amount: str, unit: Optional[str]) -> Optional[int]:
+    """
+    Nominal + satuan → rupiah. "20.000" → 20000, "1,5" + "jt" → 1500000.
+    Angka kecil tanpa satuan ("20") diasumsikan ribuan.
+    """
+    if _GROUPED_RE.match(amount):
+        value = float(amount.replace(".", "").replace(",", ""))
+    else:
+        try:
+            value = float(amount.replace(",", "."))
+        except ValueError:
+            return None
+    if unit:
+        return int(value * _UNIT_MULTIPLIER[unit])
+    return int(value * 1_000) if value < 1_000 else int(value)
+
+
+def parse_price_range(text) -> Optional[PriceRange]:
+    """
+    `range_harga` → (harga_min, harga_max) dalam rupiah.
+    Salah satu batas bisa None ("> 100K"); None jika tidak ada nominal.
+    """
+    lower = str(text or "").strip().lower()
+    matches = _AMOUNT_RE.findall(lower)
+    if not matches:
+        return None
+
+    # "15 - 25 K": satuan di akhir berlaku untuk semua angka tanpa satuan
+    trailing_unit = next((unit for _, unit in reversed(matches) if unit), None)
+    values = [to_rupiah(amount, unit or trailing_unit) for amount, unit in matches]
+    values = [v for v in values if v is not None and v > 0]
+    if not values:
+        return None
+
+    low, high = min(values), max(values)
+    if _UPPER_BOUND_RE.match(lower):
+        return 0, high
+    if _LOWER_BOUND_RE.match(lower):
+        return low, None
+    return low, high
@@ -0,0 +1,227 @@
+"""
+Penyusunan konteks prompt dengan batas token.
+
+Data restoran dan riwayat percakapan dipangkas agar jumlah token input
+(biaya & time-to-first-token) tetap terkendali, apa pun panjang `ringkasan`
+yang dihasilkan LLM saat ingest.
+"""
+
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Perkiraan kasar jika encoding tiktoken tidak tersedia (mis. offline)
+_CHARS_PER_TOKEN = 3.5
+# Overhead format chat per pesan (role, pemisah)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Minimal panjang prefix agar prompt caching OpenAI aktif
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+_MAX_MENU_ITEMS = 3
+_MAX_FACILITY_ITEMS = 6
+_ELLIPSIS = "…"
+
+# Prefix statis system prompt — byte-identik di semua request. Naikkan versi
+# setiap kali teks ini diubah. Panjangnya (±250 token) masih di bawah
+# PROMPT_CACHE_MIN_TOKENS, jadi prompt caching OpenAI belum aktif; menambah
+# token hanya demi melewati batas itu lebih mahal daripada diskon cache-nya.
+SYSTEM_PROMPT_VERSION = "2"
+STATIC_SYSTEM_PROMPT = """Kamu adalah asisten chatbot rekomendasi tempat makan di Samarinda yang ramah.
+
+INSTRUKSI:
+1. Berikan TEPAT sejumlah rekomendasi yang diminta di PERMINTAAN — tidak lebih, tidak kurang.
+2. Ikuti prioritas di PERMINTAAN (tempat yang buka sekarang / akan buka pada waktu tersebut).
+3. Jika tempat tutup, sebutkan kapan akan buka.
+4. Sesuaikan dengan konteks waktu (sarapan/siang/malam/cemilan).
+5. Pertimbangkan permintaan khusus pengguna (budget, jenis makanan, fasilitas).
+6. Gunakan Bahasa Indonesia yang ramah dan natural.
+7. HANYA rekomendasikan tempat yang ada di DATA RESTORAN.
+
+FORMAT WAJIB (gunakan persis):
+[Sapaan singkat 1 kalimat]
+
+**1. Nama Tempat**
+[Deskripsi 2–3 kalimat: kenapa cocok, menu andalan, harga, status buka/tutup]
+
+**2. Nama Tempat**
+[Deskripsi 2–3 kalimat]
+
+... dst hingga jumlah rekomendasi yang diminta ...
+
+[Penutup 1 kalimat]
+"""
+
+# Prefix statis untuk ANSWER_MODE=compact: LLM hanya memilih & memberi alasan
+COMPACT_SYSTEM_PROMPT = """Kamu adalah asisten rekomendasi tempat makan di Samarinda.
+
+Pilih tempat dari DATA RESTORAN yang paling cocok dengan pesan pengguna.
+
+ATURAN:
+1. Pilih TEPAT sejumlah rekomendasi yang diminta di PERMINTAAN, urut dari yang paling cocok.
+2. Ikuti prioritas di PERMINTAAN (tempat yang buka sekarang / akan buka pada waktu tersebut).
+3. Pertimbangkan konteks waktu dan permintaan khusus pengguna (budget, jenis makanan, fasilitas).
+4. HANYA gunakan nomor yang ada di DATA RESTORAN.
+5. Alasan: satu kalimat Bahasa Indonesia yang ramah, maksimal 20 kata. Jangan ulangi
+   nama, harga, jam, atau status — semua itu ditampilkan otomatis.
+
+Balas HANYA dengan JSON berikut, tanpa teks lain:
+{"pilihan": [{"no": <nomor di DATA RESTORAN>, "alasan": "<satu kalimat>"}]}
+"""
+
+
+class TokenCounter:
+    """Hitung & potong teks per token memakai encoding tiktoken model yang dipakai."""
+
+    def __init__(self, model: str) -> None:
+        self._encoding = None
+        try:
+            import tiktoken
+
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as exc:
+            logger.warning("tiktoken encoding unavailable, estimating tokens: %s", exc)
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is None:
+            return int(len(text) / _CHARS_PER_TOKEN) + 1
+        return len(self._encoding.encode(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Potong `text` menjadi maksimal `max_tokens` token (ditandai elipsis)."""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        # Satu token disisakan untuk elipsis
+        if self._encoding is None:
+            cut = text[: int((max_tokens - 1) * _CHARS_PER_TOKEN)]
+        else:
+            cut = self._encoding.decode(self._encoding.encode(text)[: max_tokens - 1])
+        return cut.rstrip() + _ELLIPSIS
+
+
+def _as_list(value) -> List[str]:
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    return [str(value)] if value else []
+
+
+def _is_open(resto: dict) -> bool:
+    return "Buka" in str(resto.get("status_operasional", ""))
+
+
+def _header(index: int, resto: dict) -> str:
+    return (
+        f"{index}. {resto.get('nama_tempat', 'Unknown')}\n"
+        f"   Kategori : {resto.get('kategori_makanan', 'Unknown')}\n"
+        f"   Harga    : {resto.get('range_harga', 'Unknown')}\n"
+        f"   Lokasi   : {resto.get('lokasi', 'Unknown')}\n"
+        f"   Status   : {resto.get('status_operasional', 'Unknown')}\n"
+        f"   Jam      : {resto.get('jam_buka', '?')} – {resto.get('jam_tutup', '?')}\n"
+    )
+
+
+def _details(resto: dict, allowance: int, counter: TokenCounter) -> Tuple[str, int]:
+    """
+    Menu, fasilitas, dan deskripsi sesuai jatah token. Menu & fasilitas
+    dikurangi per item, deskripsi dipotong per token. Kembalikan (teks, token).
+    """
+    menu = _as_list(resto.get("menu_andalan"))[:_MAX_MENU_ITEMS]
+    fasilitas = _as_list(resto.get("fasilitas"))[:_MAX_FACILITY_ITEMS]
+
+    def render(menu_items, facility_items, description) -> str:
+        text = f"   Menu     : {', '.join(menu_items) or 'Tidak tersedia'}\n"
+        if facility_items:
+            text += f"   Fasilitas: {', '.join(facility_items)}\n"
+        if description:
+            text += f"   Deskripsi: {description}\n"
+        return text
+
+    # Daftar dipangkas dulu sampai muat tanpa deskripsi
+    while menu or fasilitas:
+        if counter.count(render(menu, fasilitas, "")) <= allowance:
+            break
+        if len(fasilitas) > 0:
+            fasilitas = fasilitas[:-1]
+        else:
+            menu = menu[:-1]
+
+    base = render(menu, fasilitas, "")
+    used = counter.count(base)
+    # Label "Deskripsi" juga memakan token; token teks gabungan bisa sedikit
+    # berbeda dari jumlah per bagian, jadi deskripsi dipotong lagi jika lewat
+    ringkasan = str(resto.get("ringkasan") or "")
+    description_budget = allowance - used - 4
+    while True:
+        text = render(menu, fasilitas, counter.truncate(ringkasan, description_budget))
+        tokens = counter.count(text)
+        if tokens <= allowance or description_budget <= 0:
+            return text, tokens
+        description_budget -= tokens - allowance
+
+
+def build_context(restaurants: List[dict], counter: TokenCounter, budget: int) -> Tuple[str, int]:
+    """
+    Teks DATA RESTORAN dengan total ±`budget` token → (teks, jumlah_token).
+
+    Setiap kandidat selalu mendapat baris identitas (nama, kategori, harga,
+    lokasi, status, jam) agar penomoran sama dengan kartu. Sisa budget dibagi
+    untuk menu/fasilitas/deskripsi tempat yang buka, berbobot 1/peringkat;
+    jatah yang tidak terpakai otomatis jatuh ke peringkat berikutnya. Tempat
+    yang tutup tidak diberi detail.
+    """
+    headers = [_header(i, r) for i, r in enumerate(restaurants, 1)]
+    used = sum(counter.count(h) for h in headers)
+    remaining = budget - used
+
+    detailed = [i for i, r in enumerate(restaurants) if _is_open(r)]
+    weights = {i: 1.0 / (rank + 1) for rank, i in enumerate(detailed)}
+    weight_left = sum(weights.values())
+
+    entries = list(headers)
+    for i in detailed:
+        if remaining <= 0:
+            break
+        share = int(remaining * weights[i] / weight_left)
+        weight_left -= weights[i]
+        text, tokens = _details(restaurants[i], share, counter)
+        if tokens > share:
+            # Bahkan baris menu tanpa item tidak muat — lewati detail tempat ini
+            continue
+        entries[i] += text
+        remaining -= tokens
+        used += tokens
+
+    return "\n".join(entries), used
+
+
+def trim_history(history: List[dict], counter: TokenCounter, budget: int) -> List[dict]:
+    """
+    Pesan terbaru yang muat dalam `budget` token (urutan kronologis).
+    Pesan terbaru yang terlalu panjang dipotong alih-alih dibuang.
+    """
+    kept: List[dict] = []
+    remaining = budget
+    for msg in reversed(history):
+        content = str(msg.get("content", ""))
+        cost = counter.count(content) + MESSAGE_OVERHEAD_TOKENS
+        if cost > remaining:
+            if not kept and remaining > MESSAGE_OVERHEAD_TOKENS:
+                truncated = counter.truncate(content, remaining - MESSAGE_OVERHEAD_TOKENS)
+                kept.append({**msg, "content": truncated})
+            break
+        kept.append(msg)
+        remaining -= cost
+    kept.reverse()
+    return kept
@@ -0,0 +1,140 @@
+"""Lapisan tipis di atas client Qdrant (sync + async) untuk jalur retrieval."""
+
+import logging
+import time
+from typing import List, Optional, Sequence
+
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import CollectionInfo, Filter, QueryRequest, ScoredPoint
+
+logger = logging.getLogger(__name__)
+
+# Field payload yang benar-benar dipakai pipeline (konteks LLM, kartu, status).
+# `user_comments`, `tags`, `popularity_score`, dan field filter tidak perlu ikut.
+RETRIEVAL_FIELDS = [
+    "nama_tempat",
+    "kategori_makanan",
+    "range_harga",
+    "lokasi",
+    "jam_buka",
+    "jam_tutup",
+    "hari_operasional",
+    "menu_andalan",
+    "fasilitas",
+    "ringkasan",
+    "blurb",
+    "link_lokasi",
+    "link_instagram",
+    "url",
+]
+
+
+def _fingerprint(info: CollectionInfo) -> tuple:
+    """Ringkasan metadata yang berubah jika isi koleksi berubah (ingest ulang, upsert)."""
+    return (info.points_count, sorted((info.payload_schema or {}).keys()), str(info.config))
+
+
+class QdrantStore:
+    """
+    Satu koleksi Qdrant: client sync & async berbagi konfigurasi transport.
+
+    Metadata koleksi dimuat sekali saat startup dan di-refresh di background,
+    sehingga request chat tidak lagi memanggil `get_collection`.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        client: QdrantClient,
+        aclient: AsyncQdrantClient,
+    ) -> None:
+        self.collection_name = collection_name
+        self.client = client
+        self.aclient = aclient
+        self._info: Optional[CollectionInfo] = None
+        self._info_loaded_at: Optional[float] = None
+        # Naik setiap kali metadata koleksi berubah — dipakai untuk invalidasi cache
+        self.version = 0
+
+    @classmethod
+    def connect(
+        cls,
+        url: str,
+        api_key: str,
+        collection_name: str,
+        prefer_grpc: bool = True,
+        grpc_port: int = 6334,
+        timeout: int = 10,
+    ) -> "QdrantStore":
+        """
+        Buat client sync & async. Dengan `prefer_grpc`, tiap client memakai satu
+        channel gRPC persisten (HTTP/2, multiplexed) untuk semua request.
+        """
+        options = dict(
+            url=url,
+            api_key=api_key,
+            prefer_grpc=prefer_grpc,
+            grpc_port=grpc_port,
+            timeout=timeout,
+        )
+        logger.info("Connecting to Qdrant: %s (grpc=%s)", url, prefer_grpc)
+        return cls(collection_name, QdrantClient(**options), AsyncQdrantClient(**options))
+
+    @property
+    def points_count(self) -> Optional[int]:
+        return self._info.points_count if self._info is not None else None
+
+    def refresh_metadata(self) -> Optional[CollectionInfo]:
+        """Muat ulang metadata koleksi; metadata lama tetap dipakai jika gagal."""
+        try:
+            info = self.client.get_collection(self.collection_name)
+        except Exception as exc:
+            if self._info is None:
+                raise
+            logger.warning("Collection metadata refresh failed: %s", exc)
+            return self._info
+        if self._info is None or _fingerprint(info) != _fingerprint(self._info):
+            logger.info("Collection '%s' has %d points", self.collection_name, info.points_count)
+            self.version += 1
+        self._info = info
+        self._info_loaded_at = time.time()
+        return info
+
+    def stats(self) -> dict:
+        return {
+            "collection": self.collection_name,
+            "points_count": self.points_count,
+            "version": self.version,
+            "metadata_loaded_at": self._info_loaded_at,
+        }
+
+    def _requests(
+        self, vector: Sequence[float], filters: Sequence[Optional[Filter]], limit: int
+    ) -> List[QueryRequest]:
+        return [
+            QueryRequest(
+                query=list(vector),
+                filter=query_filter,
+                limit=limit,
+                with_payload=RETRIEVAL_FIELDS,
+            )
+            for query_filter in filters
+        ]
+
+    async def asearch_batch(
+        self, vector: Sequence[float], filters: Sequence[Optional[Filter]], limit: int
+    ) -> List[List[ScoredPoint]]:
+        """Satu round-trip untuk beberapa filter; hasil per filter, urutan sama."""
+        responses = await self.aclient.query_batch_points(
+            collection_name=self.collection_name,
+            requests=self._requests(vector, filters, limit),
+        )
+        return [response.points for response in responses]
+
+    async def aping(self) -> None:
+        await self.aclient.get_collections()
+
+    async def aclose(self) -> None:
+        """Tutup koneksi Qdrant (sync dan async)."""
+        self.client.close()
+        await self.aclient.close()
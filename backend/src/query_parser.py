@@ -0,0 +1,443 @@
+"""
+Query understanding satu lintasan untuk pesan chat.
+
+Semua keyword (kategori, kata angka, penanda waktu, fasilitas) dikompilasi
+sekali ke automaton Aho-Corasick, dan pola angka/jam/harga dikompilasi
+sekali saat import. Satu panggilan `QueryParser.parse` menghasilkan jumlah
+rekomendasi, waktu mendatang, kategori, batas harga, fasilitas, intent
+"yang sedang buka", "lebih murah", dan "tambah lagi", serta sinyal apakah
+query berdiri sendiri (standalone) atau hanya menyaring jawaban sebelumnya.
+"""
+
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .pricing import to_rupiah
+from .utils import get_samarinda_time
+
+# Mapping keyword query → kategori di Qdrant payload
+_CATEGORY_KEYWORDS = {
+    "soto": "Soto", "bakso": "Bakso", "mie": "Mie",
+    "mie ayam": "Mie Ayam", "mie goreng": "Mie Goreng",
+    "japanese": "Japanese", "jepang": "Japanese",
+    "coffee": "Coffee", "kopi": "Kopi",
+    "seafood": "Seafood", "steak": "Steak",
+    "ayam": "Ayam", "ayam goreng": "Ayam Goreng",
+    "nasi goreng": "Nasi Goreng", "ikan bakar": "Ikan Bakar",
+    "sate": "Sate", "pecel": "Pecel", "bubur": "Bubur",
+    "pizza": "Pizza", "burger": "Burger",
+    "roti": "Roti", "pentol": "Pentol", "tahu": "Tahu",
+    "es krim": "Es Krim", "dessert": "Dessert",
+    "nasi kuning": "Nasi Kuning", "bakmi": "Bakmi",
+}
+
+# Kata angka (termasuk toleransi typo ringan) → nilai
+_NUMBER_WORDS = {
+    "belas": 11,
+    "dua bela": 12, "tiga bela": 13, "empat bela": 14, "lima bela": 15,
+    "enam bela": 16, "tujuh bela": 17, "delapan bela": 18, "sem bela": 19,
+    "dua puluh satu": 21, "dua puluh": 20,
+    "sembilan belas": 19, "delapan belas": 18, "tujuh belas": 17,
+    "enam belas": 16, "lima belas": 15, "empat belas": 14,
+    "tiga belas": 13, "dua belas": 12, "sebelas": 11, "sepuluh": 10,
+    "sembilan": 9, "delapan": 8, "tujuh": 7, "enam": 6, "lima": 5,
+    "empat": 4, "tiga": 3, "dua": 2, "satu": 1,
+    "smbilan": 9, "semblan": 9, "dlapan": 8, "dlpan": 8,
+    "tjuh": 7, "tuju": 7, "lma": 5, "lim": 5, "empet": 4, "mpat": 4,
+    "tga": 3, "spuluh": 10, "spluh": 10,
+}
+
+# Penanda waktu untuk deteksi waktu mendatang
+_TIME_WORDS = (
+    "besok", "nanti", "malam ini",
+    "pagi", "sarapan", "siang", "lunch", "sore", "malam", "dinner",
+)
+
+# Frasa yang meminta restoran yang sedang buka saat ini
+_OPEN_NOW_PHRASES = (
+    "buka sekarang", "buka skrg", "yang buka", "yg buka", "masih buka",
+    "lagi buka", "sedang buka", "open now", "masih open",
+)
+
+# Penanda rujukan ke giliran sebelumnya — query tidak bisa dipahami tanpa riwayat
+_ANAPHORA_PHRASES = (
+    "yang itu", "yg itu", "yang tadi", "yg tadi", "tadi", "tempat itu", "itu aja",
+    "lagi", "lainnya", "yang lain", "yg lain", "selain itu", "yang mana", "yg mana",
+    "di sana", "disana", "ke sana", "kesana", "situ", "tersebut",
+    "kalau", "kalo", "gimana kalau", "bagaimana dengan",
+    "harganya", "menunya", "lokasinya", "alamatnya", "jamnya", "tempatnya",
+    "lebih murah", "lebih dekat", "lebih enak",
+)
+
+# Refinement jawaban sebelumnya: minta yang lebih murah / tambah pilihan lain
+_CHEAPER_PHRASES = (
+    "murah", "termurah", "lebih murah", "hemat", "lebih hemat",
+    "terjangkau", "ekonomis", "low budget",
+)
+_MORE_PHRASES = (
+    "lagi", "tambah", "tambahin", "tambahkan", "lainnya", "yang lain", "yg lain",
+    "selain itu", "lebih banyak",
+)
+
+# Query tanpa subjek sependek ini dianggap elipsis ("3 aja", "yang pedas?")
+_ELLIPTICAL_MAX_WORDS = 4
+_MIN_DISH_LENGTH = 4
+_MIN_PLACE_LENGTH = 6
+
+# Keyword fasilitas → nama fasilitas kanonik (dicocokkan ke payload `fasilitas`)
+_FACILITY_KEYWORDS = {
+    "wifi": "wifi", "wi-fi": "wifi", "wi fi": "wifi",
+    "parkir": "parkir", "parkiran": "parkir",
+    "ac": "ac", "ber-ac": "ac",
+    "musholla": "musholla", "mushola": "musholla", "musala": "musholla",
+    "toilet": "toilet",
+    "colokan": "colokan", "stop kontak": "colokan",
+    "outdoor": "outdoor", "indoor": "indoor",
+    "smoking": "smoking area", "smoking area": "smoking area",
+    "live music": "live music",
+    "tempat bermain": "area bermain", "playground": "area bermain",
+    "lesehan": "lesehan",
+    "drive thru": "drive thru",
+}
+
+_HAS_DIGIT_RE = re.compile(r"\d")
+_DIGIT_RE = re.compile(r"\b(\d+)\b")
+_CLOCK_RE = re.compile(r"(?:jam|pukul)\s*(\d{1,2})")
+
+_PRICE_NUMBER = r"(?:rp\.?\s*)?(\d+(?:[.,]\d{3})*(?:[.,]\d+)?)\s*"
+# Batas harga dengan penanda eksplisit ("di bawah 20 ribu", "budget 30k")
+_PRICE_CEILING_RE = re.compile(
+    r"(?:di\s*bawah|kurang\s+dari|maks(?:imal|imum)?|max|budget|bujet|under|"
+    r"paling\s+mahal|(?:gak|nggak|tidak|ga)\s+lebih\s+dari|<)\s*"
+    + _PRICE_NUMBER + r"(ribu|rb|k|jt|juta)?\b"
+)
+# Nominal dengan satuan eksplisit tanpa penanda ("nasi goreng 15 ribuan")
+_PRICE_AMOUNT_RE = re.compile(r"(?:rp\.?\s*)(\d+(?:[.,]\d{3})*)\b|\b(\d+)\s*(ribu|rb|k|jt|juta)")
+
+_WORD_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789")
+
+
+@dataclass
+class ParsedQuery:
+    """Hasil ekstraksi satu pesan pengguna."""
+
+    text: str
+    count: Optional[int] = None
+    future: Optional[Tuple[datetime, str]] = None
+    category: Optional[str] = None
+    max_price: Optional[int] = None
+    facilities: List[str] = field(default_factory=list)
+    open_now: bool = False
+    dish: Optional[str] = None
+    place: Optional[str] = None
+    anaphora: bool = False
+    cheaper: bool = False
+    more: bool = False
+
+    @property
+    def has_subject(self) -> bool:
+        """Query menyebut kategori, menu, atau nama tempat secara eksplisit."""
+        return bool(self.category or self.dish or self.place)
+
+    @property
+    def is_standalone(self) -> bool:
+        """
+        Query bisa dipakai untuk retrieval tanpa riwayat percakapan.
+
+        Butuh riwayat hanya jika ada rujukan ("yang tadi", "lagi", "harganya")
+        atau query sangat pendek — dan tidak ada subjek eksplisit. Batasan
+        (harga, jam, fasilitas) saja tidak cukup: "yang tadi di bawah 20rb"
+        tetap butuh kategori dari giliran sebelumnya.
+        """
+        if self.has_subject:
+            return True
+        if self.anaphora:
+            return False
+        return len(self.text.split()) > _ELLIPTICAL_MAX_WORDS
+
+    @property
+    def is_refinement(self) -> bool:
+        """
+        Query lanjutan yang hanya menyaring atau menambah jawaban sebelumnya
+        ("yang lebih murah", "yang buka sekarang", "ada wifi?", "tambah 3 lagi")
+        tanpa subjek atau waktu baru — bisa dijawab dari kandidat giliran lalu.
+        """
+        if self.is_standalone or self.future:
+            return False
+        return (
+            self.cheaper
+            or self.more
+            or self.open_now
+            or bool(self.facilities)
+            or self.max_price is not None
+        )
+
+
+class KeywordAutomaton:
+    """
+    Automaton Aho-Corasick untuk mencari banyak keyword sekaligus dalam
+    satu kali scan teks. Setiap keyword membawa (jenis, nilai).
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, str, object]]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str, object]]] = [[]]
+
+        for phrase, kind, value in keywords:
+            state = 0
+            for char in phrase:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((phrase, kind, value))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> List[Tuple[int, int, str, str, object]]:
+        """Semua kemunculan keyword: (start, end, phrase, kind, value)."""
+        matches = []
+        state = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for phrase, kind, value in out[state]:
+                matches.append((i - len(phrase) + 1, i + 1, phrase, kind, value))
+        return matches
+
+
+def _at_word_start(text: str, start: int) -> bool:
+    return start == 0 or text[start - 1] not in _WORD_CHARS
+
+
+def _at_word_end(text: str, end: int) -> bool:
+    return end == len(text) or text[end] not in _WORD_CHARS
+
+
+def _overlaps(span: Tuple[int, int], spans: List[Tuple[int, int]]) -> bool:
+    return any(span[0] < end and start < span[1] for start, end in spans)
+
+
+def _dish_keywords(dishes: Iterable[str]) -> set:
+    """
+    Nama menu dari katalog → keyword. "Nasi Goreng Spesial" juga
+    didaftarkan sebagai "nasi goreng" karena pengguna jarang menulis lengkap.
+    """
+    keywords = set()
+    for dish in dishes:
+        words = str(dish).lower().split()
+        for phrase in (" ".join(words), " ".join(words[:2])):
+            if len(phrase) >= _MIN_DISH_LENGTH and phrase not in ("unknown", "nan"):
+                keywords.add(phrase)
+    return keywords
+
+
+class QueryParser:
+    """
+    Ekstraksi jumlah, waktu, kategori, budget, dan fasilitas dalam satu lintasan.
+
+    Automaton dibangun sekali (saat startup / re-sync katalog) dari
+    `_CATEGORY_KEYWORDS` ditambah kategori, menu, dan nama tempat yang
+    ditemukan di dataset.
+    """
+
+    def __init__(
+        self,
+        extra_categories: Iterable[str] = (),
+        dishes: Iterable[str] = (),
+        places: Iterable[str] = (),
+    ) -> None:
+        categories = dict(_CATEGORY_KEYWORDS)
+        for category in extra_categories:
+            for part in str(category).split(","):
+                name = part.strip()
+                key = name.lower()
+                if len(key) >= 3 and key not in ("unknown", "nan") and key not in categories:
+                    categories[key] = name
+
+        keywords: List[Tuple[str, str, object]] = []
+        keywords += [(k, "category", v) for k, v in categories.items()]
+        keywords += [(k, "number", v) for k, v in _NUMBER_WORDS.items()]
+        keywords += [(k, "time", k) for k in _TIME_WORDS]
+        keywords += [(k, "facility", v) for k, v in _FACILITY_KEYWORDS.items()]
+        keywords += [(k, "open_now", True) for k in _OPEN_NOW_PHRASES]
+        keywords += [(k, "anaphora", True) for k in _ANAPHORA_PHRASES]
+        keywords += [(k, "cheaper", True) for k in _CHEAPER_PHRASES]
+        keywords += [(k, "more", True) for k in _MORE_PHRASES]
+        keywords += [(k, "dish", k) for k in _dish_keywords(dishes) - categories.keys()]
+        keywords += [
+            (k, "place", k)
+            for k in {str(p).strip().lower() for p in places}
+            if len(k) >= _MIN_PLACE_LENGTH and k not in ("unknown", "nan")
+        ]
+        self._automaton = KeywordAutomaton(keywords)
+
+    def detect_category(self, text: str) -> Optional[str]:
+        """Kategori dengan keyword terpanjang (e.g. "mie ayam" sebelum "mie")."""
+        lower = text.lower()
+        best = None
+        for start, end, phrase, kind, value in self._automaton.find(lower):
+            if kind == "category" and _at_word_start(lower, start):
+                if best is None or len(phrase) > len(best[0]):
+                    best = (phrase, value)
+        return best[1] if best else None
+
+    def parse(self, text: str, now: Optional[datetime] = None) -> ParsedQuery:
+        lower = text.lower()
+        result = ParsedQuery(text=text)
+
+        category: Optional[Tuple[str, str]] = None
+        number: Optional[Tuple[int, int, int]] = None  # (start, -len, value)
+        time_words: set = set()
+        facilities: List[str] = []
+
+        for start, end, phrase, kind, value in self._automaton.find(lower):
+            if not _at_word_start(lower, start):
+                continue
+            if kind == "category":
+                if category is None or len(phrase) > len(category[0]):
+                    category = (phrase, value)
+            elif kind == "number":
+                if not _at_word_end(lower, end):
+                    continue
+                candidate = (start, -len(phrase), value)
+                if number is None or candidate < number:
+                    number = candidate
+            elif kind == "time":
+                time_words.add(value)
+            elif kind == "facility":
+                if _at_word_end(lower, end) and value not in facilities:
+                    facilities.append(value)
+            elif kind == "open_now":
+                if _at_word_end(lower, end):
+                    result.open_now = True
+            elif kind == "anaphora":
+                if _at_word_end(lower, end):
+                    result.anaphora = True
+            elif kind == "cheaper":
+                if _at_word_end(lower, end):
+                    result.cheaper = True
+            elif kind == "more":
+                # "lagi buka" = masih buka, bukan minta tambahan
+                if _at_word_end(lower, end) and not lower[end:].lstrip().startswith("buka"):
+                    result.more = True
+            elif kind in ("dish", "place"):
+                current = getattr(result, kind)
+                if _at_word_end(lower, end) and (current is None or len(phrase) > len(current)):
+                    setattr(result, kind, value)
+
+        result.category = category[1] if category else None
+        result.facilities = facilities
+
+        # Angka yang merupakan bagian dari jam/harga tidak dihitung sebagai jumlah
+        clock = None
+        if _HAS_DIGIT_RE.search(lower):
+            consumed: List[Tuple[int, int]] = []
+
+            clock = _CLOCK_RE.search(lower)
+            if clock:
+                consumed.append(clock.span())
+
+            price = _PRICE_CEILING_RE.search(lower)
+            if price:
+                consumed.append(price.span())
+                result.max_price = to_rupiah(price.group(1), price.group(2))
+            else:
+                amount = _PRICE_AMOUNT_RE.search(lower)
+                if amount:
+                    consumed.append(amount.span())
+                    if amount.group(1):
+                        result.max_price = to_rupiah(amount.group(1), None)
+                    else:
+                        result.max_price = to_rupiah(amount.group(2), amount.group(3))
+
+            for match in _DIGIT_RE.finditer(lower):
+                if _overlaps(match.span(), consumed):
+                    continue
+                value = int(match.group(1))
+                if 1 <= value <= 20:
+                    result.count = value
+                break
+
+        if result.count is None and number is not None:
+            result.count = number[2]
+
+        if time_words or clock:
+            result.future = self._parse_future_time(lower, time_words, clock, now or get_samarinda_time())
+        return result
+
+    @staticmethod
+    def _parse_future_time(
+        lower: str, words: set, clock: Optional[re.Match], now: datetime
+    ) -> Optional[Tuple[datetime, str]]:
+        """
+        Deteksi ekspresi waktu mendatang dalam teks Bahasa Indonesia.
+
+        Contoh yang didukung:
+        - "besok pagi / siang / sore / malam"
+        - "nanti malam / siang"
+        - "jam 19" / "pukul 12"
+        """
+        def _make_target(hour: int) -> datetime:
+            """Buat datetime pada jam tertentu; geser +1 hari jika sudah lewat."""
+            t = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+            if t <= now:
+                t += timedelta(days=1)
+            return t
+
+        if "besok" in words:
+            tomorrow = now + timedelta(days=1)
+
+            def _at(hour: int) -> datetime:
+                return tomorrow.replace(hour=hour, minute=0, second=0, microsecond=0)
+
+            if words & {"pagi", "sarapan"}:
+                return _at(8), "sarapan besok"
+            if words & {"siang", "lunch"}:
+                return _at(12), "makan siang besok"
+            if "sore" in words:
+                return _at(16), "cemilan sore besok"
+            if words & {"malam", "dinner"}:
+                return _at(19), "makan malam besok"
+            return _at(12), "besok"
+
+        if ("nanti" in words and "malam" in words) or "malam ini" in words:
+            return _make_target(19), "malam ini"
+
+        if "nanti" in words and "siang" in words:
+            return _make_target(12), "nanti siang"
+
+        if clock:
+            hour = int(clock.group(1))
+            if 0 <= hour <= 23:
+                if 5 <= hour < 10:
+                    context = f"jam {hour} (sarapan)"
+                elif 10 <= hour < 15:
+                    context = f"jam {hour} (makan siang)"
+                elif 15 <= hour < 18:
+                    context = f"jam {hour} (cemilan sore)"
+                else:
+                    context = f"jam {hour} (makan malam)"
+                return _make_target(hour), context
+
+        return None
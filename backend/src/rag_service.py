@@ -1,22 +1,57 @@
+import asyncio
 import logging
-from typing import List, Tuple
-
+import time
+from collections import Counter
+from contextlib import aclosing
+from dataclasses import dataclass
+from datetime import datetime
+import statistics
+from typing import Iterable, List, NamedTuple, Tuple
+
+import numpy as np
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.runnables import Runnable
 from langchain_openai import ChatOpenAI
 from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchText, ScoredPoint
+from qdrant_client.models import (
+    FieldCondition,
+    Filter,
+    MatchText,
+    Nested,
+    NestedCondition,
+    Range,
+    ScoredPoint,
+)
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from .cache import TTLCache
+from .catalog import Catalog
 from .config import get_settings
 from .models import RestaurantCard
+from .lexical_index import BM25Index, tokenize
+from .query_parser import ParsedQuery, QueryParser
+from .answer_renderer import blurb_picks, parse_compact_answer, render_answer
+from .pricing import parse_price_range
+from .prompt_context import (
+    COMPACT_SYSTEM_PROMPT,
+    MESSAGE_OVERHEAD_TOKENS,
+    PROMPT_CACHE_MIN_TOKENS,
+    STATIC_SYSTEM_PROMPT,
+    SYSTEM_PROMPT_VERSION,
+    TokenCounter,
+    build_context,
+    trim_history,
+)
+from .qdrant_store import QdrantStore
+from .response_cache import CachedResponse, SemanticResponseCache
+from .schedule import WeeklyScheduleIndex, minute_of_week
+from .session_store import Session, TurnState
+from .vector_index import LocalHit, LocalVectorIndex
 from .utils import (
-    check_operational_status,
-    check_operational_status_at_time,
-    extract_number_from_text,
     get_day_name_indonesian,
     get_samarinda_time,
     get_time_context,
-    parse_future_time,
+    time_context_for,
 )
 
 logger = logging.getLogger(__name__)
@@ -30,21 +65,18 @@ _RETRIEVE_MINIMUM = 40
 
 _MIN_RELEVANCE_SCORE = 0.1
 
-# Mapping keyword query → kategori di Qdrant payload
-_CATEGORY_KEYWORDS = {
-    "soto": "Soto", "bakso": "Bakso", "mie": "Mie",
-    "mie ayam": "Mie Ayam", "mie goreng": "Mie Goreng",
-    "japanese": "Japanese", "jepang": "Japanese",
-    "coffee": "Coffee", "kopi": "Kopi",
-    "seafood": "Seafood", "steak": "Steak",
-    "ayam": "Ayam", "ayam goreng": "Ayam Goreng",
-    "nasi goreng": "Nasi Goreng", "ikan bakar": "Ikan Bakar",
-    "sate": "Sate", "pecel": "Pecel", "bubur": "Bubur",
-    "pizza": "Pizza", "burger": "Burger",
-    "roti": "Roti", "pentol": "Pentol", "tahu": "Tahu",
-    "es krim": "Es Krim", "dessert": "Dessert",
-    "nasi kuning": "Nasi Kuning", "bakmi": "Bakmi",
-}
+# Retrieval dengan filter jam buka/budget: kandidat sudah lolos, tidak perlu over-fetch
+_FILTERED_RETRIEVE_MINIMUM = 20
+
+# Tahap filter dilonggarkan jika hasilnya kurang dari ini
+_MIN_STAGE_RESULTS = 3
+
+# Retrieval spekulatif: minimal overlap token (Jaccard) query mentah vs hasil compression
+_SPECULATION_MIN_OVERLAP = 0.6
+
+# Hybrid retrieval: konstanta RRF standar dan jumlah kandidat BM25
+_RRF_K = 60
+_LEXICAL_TOP_K = 20
 
 
 class RAGService:
@@ -55,7 +87,47 @@ class RAGService:
     def __init__(self) -> None:
         self._embeddings = self._init_embeddings()
         self._llm = self._init_llm()
-        self._qdrant = self._init_qdrant()
+        # LLM yang menghasilkan jawaban; mode compact memakai output JSON ringkas
+        if settings.answer_mode == "compact":
+            self._answer_llm = self._init_compact_llm()
+            self._static_prompt = COMPACT_SYSTEM_PROMPT
+        else:
+            self._answer_llm = self._llm
+            self._static_prompt = STATIC_SYSTEM_PROMPT
+        self._compression_llm = self._init_compression_llm()
+        self._store = self._init_store()
+        # Bitmap jadwal dipertahankan lintas refresh: jadwal unik jarang berubah
+        self._schedule = WeeklyScheduleIndex()
+        self._catalog_features_cache: Tuple[Catalog, np.ndarray, np.ndarray] | None = None
+        self._indexes = self._build_local_indexes(
+            self._init_catalog(self._store.client), self._store.version
+        )
+        self._embedding_cache: TTLCache[List[float]] = TTLCache(
+            maxsize=settings.embedding_cache_size,
+            ttl=settings.embedding_cache_ttl,
+        )
+        # Hasil retrieval tidak bergantung waktu; status dianotasi ulang per request
+        self._retrieval_cache: TTLCache[List[dict]] = TTLCache(
+            maxsize=settings.retrieval_cache_size,
+            ttl=settings.retrieval_cache_ttl,
+        )
+        self._response_cache = SemanticResponseCache(
+            maxsize=settings.response_cache_size,
+            ttl=settings.response_cache_ttl,
+            threshold=settings.response_cache_threshold,
+        )
+        self._token_counter = TokenCounter(settings.llm_model)
+        self._static_prefix_tokens = self._token_counter.count(self._static_prompt)
+        # Prefix di bawah batas minimum tidak pernah di-cache upstream
+        self._prompt_cache_eligible = self._static_prefix_tokens >= PROMPT_CACHE_MIN_TOKENS
+        if not self._prompt_cache_eligible:
+            logger.warning(
+                "Static system prompt is %d tokens; OpenAI prompt caching needs %d, "
+                "so cached_tokens will stay 0",
+                self._static_prefix_tokens,
+                PROMPT_CACHE_MIN_TOKENS,
+            )
+        self._counters: Counter = Counter()
 
 
     @staticmethod
@@ -78,138 +150,604 @@ class RAGService:
             temperature=settings.llm_temperature,
             max_tokens=settings.llm_max_tokens,
             openai_api_key=settings.openai_api_key,
+            # Chunk terakhir stream membawa usage (termasuk cached_tokens)
+            stream_usage=True,
+        )
+
+    @staticmethod
+    def _init_compact_llm() -> Runnable:
+        # Output hanya nomor kandidat + alasan singkat; teks akhir dirender server
+        return ChatOpenAI(
+            model=settings.llm_model,
+            temperature=settings.llm_temperature,
+            max_tokens=settings.compact_max_tokens,
+            openai_api_key=settings.openai_api_key,
+            stream_usage=True,
+        ).bind(response_format={"type": "json_object"})
+
+    @staticmethod
+    def _init_compression_llm() -> ChatOpenAI:
+        # Output hanya satu query pendek: model kecil, deterministik, token dibatasi
+        return ChatOpenAI(
+            model=settings.compression_model,
+            temperature=0,
+            max_tokens=settings.compression_max_tokens,
+            openai_api_key=settings.openai_api_key,
         )
 
     @staticmethod
-    def _init_qdrant() -> QdrantClient:
-        logger.info("Connecting to Qdrant: %s", settings.qdrant_url)
-        client = QdrantClient(
+    def _init_store() -> QdrantStore:
+        store = QdrantStore.connect(
             url=settings.qdrant_url,
             api_key=settings.qdrant_api_key,
-            timeout=10,
+            collection_name=settings.qdrant_collection_name,
+            prefer_grpc=settings.qdrant_prefer_grpc,
+            grpc_port=settings.qdrant_grpc_port,
+            timeout=settings.qdrant_timeout,
         )
 
-        client.get_collections()
-        logger.info("Qdrant connected")
-        return client
+        try:
+            store.refresh_metadata()
+        except Exception as exc:
+            if not settings.local_index_enabled:
+                raise
+            # Index lokal masih bisa melayani retrieval tanpa Qdrant
+            logger.warning("Qdrant unreachable, continuing with local index: %s", exc)
+            return store
 
+        logger.info("Qdrant connected")
+        return store
 
     @staticmethod
-    def _detect_category(query: str) -> str | None:
-        """Deteksi kategori makanan dari query pengguna."""
-        lower = query.lower()
-        # Cek frasa lebih panjang dulu (e.g., "mie ayam" sebelum "mie")
-        for keyword in sorted(_CATEGORY_KEYWORDS, key=len, reverse=True):
-            if keyword in lower:
-                return _CATEGORY_KEYWORDS[keyword]
-        return None
+    def _init_catalog(client: QdrantClient) -> Catalog | None:
+        """
+        Snapshot koleksi Qdrant untuk index lokal (vektor dan/atau BM25).
+        Jika Qdrant tidak bisa dijangkau, gunakan file hasil ekspor ingest.
+        """
+        if not (settings.local_index_enabled or settings.lexical_index_enabled):
+            return None
 
+        try:
+            return Catalog.from_qdrant(
+                client,
+                settings.qdrant_collection_name,
+                with_vectors=settings.local_index_enabled,
+            )
+        except Exception as exc:
+            logger.warning("Qdrant snapshot failed (%s), trying file %s", exc, settings.local_index_path)
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=4))
-    def _retrieve(
-        self, query: str, top_k: int, category_filter: str | None = None
-    ) -> List[dict]:
+        try:
+            return Catalog.from_file(settings.local_index_path)
+        except Exception as exc:
+            if settings.local_index_enabled:
+                raise RuntimeError(
+                    f"Local index tidak bisa dimuat dari Qdrant maupun file: {exc}"
+                ) from exc
+            logger.warning("Catalog snapshot unavailable, local indexes disabled: %s", exc)
+            return None
+
+    def _build_local_indexes(
+        self, catalog: Catalog | None, store_version: int
+    ) -> "_LocalIndexes":
         """
-        Cari restoran relevan di Qdrant menggunakan embedding query.
-        Mendukung metadata pre-filtering berdasarkan kategori.
-        Hasil difilter berdasarkan minimum relevance score.
+        Bangun index vektor lokal, BM25, query parser, dan jadwal dari satu
+        snapshot katalog. Pemanggil mempublikasikan hasilnya sekaligus.
         """
-        # Debug: Check collection info
+        payloads = catalog.payloads if catalog is not None else []
+        query_parser = QueryParser(
+            extra_categories=(p.get("kategori_makanan", "") for p in payloads),
+            dishes=(
+                dish
+                for p in payloads
+                if isinstance(p.get("menu_andalan"), list)
+                for dish in p["menu_andalan"]
+            ),
+            places=(p.get("nama_tempat", "") for p in payloads),
+        )
+        if catalog is not None:
+            self._schedule.compile(catalog.payloads)
+        local_index = (
+            LocalVectorIndex(catalog)
+            if catalog is not None and settings.local_index_enabled
+            else None
+        )
+        lexical_index = (
+            BM25Index(catalog)
+            if catalog is not None and settings.lexical_index_enabled
+            else None
+        )
+        if catalog is not None:
+            logger.info(
+                "Local indexes ready from %s: vector=%s, lexical=%s",
+                catalog.source, local_index is not None, lexical_index is not None,
+            )
+        from_qdrant = catalog is not None and catalog.source.startswith("qdrant:")
+        return _LocalIndexes(
+            query_parser, local_index, lexical_index, store_version if from_qdrant else None
+        )
+
+    @property
+    def _query_parser(self) -> QueryParser:
+        return self._indexes.query_parser
+
+    @property
+    def _local_index(self) -> LocalVectorIndex | None:
+        return self._indexes.local_index
+
+    @property
+    def _lexical_index(self) -> BM25Index | None:
+        return self._indexes.lexical_index
+
+    def refresh_catalog(self) -> None:
+        """
+        Re-sync index lokal dari Qdrant jika versi koleksi berubah sejak
+        snapshot terakhir; index lama tetap dipakai jika gagal.
+        """
+        # Berdasarkan setting, bukan index yang ada: snapshot awal yang gagal
+        # dimuat tetap bisa dipulihkan oleh re-sync berikutnya
+        if not (settings.local_index_enabled or settings.lexical_index_enabled):
+            return
+        # Versi dibaca sebelum scroll: perubahan selama scroll memicu re-sync berikutnya
+        version = self._store.version
+        if self._indexes.store_version == version:
+            return
         try:
-            collection_info = self._qdrant.get_collection(settings.qdrant_collection_name)
-            logger.info("Collection '%s' has %d points", 
-                       settings.qdrant_collection_name, collection_info.points_count)
-        except Exception as e:
-            logger.error("Failed to get collection info: %s", e)
-            return []
-
-        vector = self._embeddings.embed_query(query)
-        logger.info("Generated embedding vector of length %d for query: '%s'", 
-                   len(vector), query[:50])
+            catalog = Catalog.from_qdrant(
+                self._store.client,
+                settings.qdrant_collection_name,
+                with_vectors=settings.local_index_enabled,
+            )
+        except Exception as exc:
+            logger.warning("Catalog re-sync failed, keeping previous snapshot: %s", exc)
+            return
+        # Satu assignment: request tidak pernah melihat parser & index dari
+        # snapshot yang berbeda
+        self._indexes = self._build_local_indexes(catalog, version)
+
+    async def aclose(self) -> None:
+        """Tutup koneksi Qdrant (sync dan async)."""
+        await self._store.aclose()
+
+
+    def _compression_stats(self) -> dict:
+        skipped = self._counters["compression_skipped"]
+        called = self._counters["compression_called"]
+        total = skipped + called
+        hits = self._counters["speculation_hit"]
+        speculated = hits + self._counters["speculation_miss"]
+        return {
+            "skipped": skipped,
+            "called": called,
+            "skip_rate": round(skipped / total, 4) if total else 0.0,
+            # Retrieval spekulatif selama compression; dilewati jika tidak mungkin hit
+            "speculation": {
+                "hit": hits,
+                "miss": self._counters["speculation_miss"],
+                "skipped": self._counters["speculation_skipped"],
+                "hit_rate": round(hits / speculated, 4) if speculated else 0.0,
+            },
+        }
+
+    def _prompt_stats(self) -> dict:
+        requests = self._counters["prompt_requests"]
+        prompt_tokens = self._counters["llm_input_tokens"]
+
+        def avg_latency(bucket: str) -> float:
+            calls = self._counters[f"llm_calls_{bucket}"]
+            return round(self._counters[f"llm_latency_ms_{bucket}"] / calls, 1) if calls else 0.0
+
+        calls = self._counters["llm_calls"]
+        return {
+            "answer_mode": settings.answer_mode,
+            "system_prompt_version": SYSTEM_PROMPT_VERSION,
+            "static_prefix_tokens": self._static_prefix_tokens,
+            "prompt_cache_eligible": self._prompt_cache_eligible,
+            # cached_tokens / prompt_tokens yang dilaporkan OpenAI
+            "cache_hit_ratio": (
+                round(self._counters["llm_cached_tokens"] / prompt_tokens, 4)
+                if prompt_tokens else 0.0
+            ),
+            "cached_tokens": self._counters["llm_cached_tokens"],
+            "avg_output_tokens": (
+                round(self._counters["llm_output_tokens"] / calls, 1) if calls else 0.0
+            ),
+            "avg_latency_ms_cached": avg_latency("cached"),
+            "avg_latency_ms_uncached": avg_latency("uncached"),
+            "exact_tokenizer": self._token_counter.exact,
+            "context_token_budget": settings.context_token_budget,
+            "history_token_budget": settings.history_token_budget,
+            "avg_input_tokens": (
+                round(self._counters["prompt_input_tokens"] / requests, 1) if requests else 0.0
+            ),
+            "avg_context_tokens": (
+                round(self._counters["prompt_context_tokens"] / requests, 1) if requests else 0.0
+            ),
+        }
+
+    def get_stats(self) -> dict:
+        """Statistik runtime untuk endpoint admin."""
+        local_index = self._local_index
+        return {
+            "embedding_cache": self._embedding_cache.stats(),
+            "retrieval_cache": self._retrieval_cache.stats(),
+            "response_cache": {
+                "enabled": settings.response_cache_enabled,
+                **self._response_cache.stats(),
+            },
+            "qdrant": self._store.stats(),
+            "local_index": {
+                "enabled": local_index is not None,
+                "points": len(local_index) if local_index else 0,
+                "source": local_index.catalog.source if local_index else None,
+                "loaded_at": local_index.catalog.loaded_at if local_index else None,
+            },
+            "lexical_index": {
+                "enabled": self._lexical_index is not None,
+                "docs": len(self._lexical_index) if self._lexical_index else 0,
+            },
+            "schedule_index": {"unique_schedules": len(self._schedule)},
+            "query_compression": self._compression_stats(),
+            # Giliran lanjutan yang dijawab dari pool sesi vs kembali ke retrieval
+            "refinement": {
+                "local": self._counters["refinement_local"],
+                "fallback": self._counters["refinement_fallback"],
+            },
+            "prompt": self._prompt_stats(),
+            "streaming": {
+                "aborted": self._counters["stream_aborted"],
+                "tokens_generated_before_abort": self._counters["stream_aborted_tokens_generated"],
+                "tokens_saved_estimate": self._counters["stream_tokens_saved"],
+            },
+            "counters": dict(self._counters),
+        }
+
+
+    @staticmethod
+    def _embedding_cache_key(text: str) -> tuple:
+        # Normalisasi ringan: huruf kecil + spasi dirapikan
+        normalized = " ".join(text.lower().split())
+        return (settings.embedding_model, settings.embedding_dimensions, normalized)
+
+    async def _aembed_query(self, text: str) -> List[float]:
+        """Embedding query dengan cache — retry `_aretrieve_uncached` tidak embed ulang."""
+        key = self._embedding_cache_key(text)
+        vector = self._embedding_cache.get(key)
+        if vector is None:
+            vector = await self._embeddings.aembed_query(text)
+            self._embedding_cache.set(key, vector)
+        return vector
+
+
+    def _detect_category(self, query: str) -> str | None:
+        """Deteksi kategori makanan dari query pengguna."""
+        return self._query_parser.detect_category(query)
+
 
-        query_filter = None
+    @staticmethod
+    def _retrieval_stages(
+        category_filter: str | None,
+        open_at: datetime | None,
+        max_price: int | None = None,
+    ) -> List["_Stage"]:
+        """
+        Urutan filter yang dicoba: paling ketat dulu, lalu dilonggarkan.
+        Kategori dilepas lebih dulu; batasan jam buka & budget dilepas terakhir.
+        """
+        stages = [_Stage(category_filter, open_at, max_price)]
         if category_filter:
-            query_filter = Filter(
-                must=[
-                    FieldCondition(
-                        key="kategori_makanan",
-                        match=MatchText(text=category_filter),
+            stages.append(_Stage(None, open_at, max_price))
+        if open_at is not None or max_price is not None:
+            stages.append(_Stage(None, None, None))
+        return stages
+
+    @staticmethod
+    def _stage_query_filter(stage: "_Stage") -> Filter | None:
+        """Bangun filter Qdrant untuk metadata pre-filtering kategori, jam buka & budget."""
+        conditions: list = []
+        if stage.category:
+            conditions.append(
+                FieldCondition(
+                    key="kategori_makanan",
+                    match=MatchText(text=stage.category),
+                )
+            )
+        if stage.open_at is not None:
+            # Buka pada menit-minggu t: ada interval dengan buka <= t < tutup
+            minute = minute_of_week(stage.open_at)
+            conditions.append(
+                NestedCondition(
+                    nested=Nested(
+                        key="jadwal_mingguan",
+                        filter=Filter(
+                            must=[
+                                FieldCondition(key="buka", range=Range(lte=minute)),
+                                FieldCondition(key="tutup", range=Range(gt=minute)),
+                            ]
+                        ),
                     )
-                ]
+                )
+            )
+        if stage.max_price is not None:
+            # Terjangkau: harga termurah di tempat itu masih dalam budget
+            conditions.append(
+                FieldCondition(key="harga_min", range=Range(lte=stage.max_price))
             )
+        return Filter(must=conditions) if conditions else None
 
-        hits: List[ScoredPoint] = self._qdrant.query_points(
-            collection_name=settings.qdrant_collection_name,
-            query=vector,
-            query_filter=query_filter,
-            limit=top_k,
-        ).points
-
-        # Debug: Ambil semua hasil tanpa filter score untuk debugging
-        all_results = [hit.payload for hit in hits]
-        logger.info("Total hits from Qdrant: %d", len(all_results))
-        
+    def _catalog_features(self, catalog: Catalog) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Baris jadwal & harga minimum per baris katalog, di-cache per snapshot.
+        Snapshot lama tanpa `harga_min` di payload di-parse dari `range_harga`.
+        """
+        cached = self._catalog_features_cache
+        if cached is None or cached[0] is not catalog:
+            min_prices = np.full(len(catalog), np.nan)
+            for i, payload in enumerate(catalog.payloads):
+                low = _min_price(payload)
+                if low is not None:
+                    min_prices[i] = low
+            cached = (catalog, self._schedule.rows_for(catalog.payloads), min_prices)
+            self._catalog_features_cache = cached
+        return cached[1], cached[2]
+
+    def _stage_local_mask(self, catalog: Catalog, stage: "_Stage") -> np.ndarray | None:
+        """Mask baris katalog yang lolos batasan jam buka & budget (untuk index lokal)."""
+        if stage.open_at is None and stage.max_price is None:
+            return None
+        rows, min_prices = self._catalog_features(catalog)
+        mask = np.ones(len(catalog), dtype=bool)
+        if stage.open_at is not None:
+            mask &= self._schedule.open_mask_rows(rows, stage.open_at)
+        if stage.max_price is not None:
+            # NaN (harga tidak diketahui) selalu False, sama seperti filter Qdrant
+            mask &= min_prices <= stage.max_price
+        return mask
+
+    @staticmethod
+    def _log_stage_fallback(stage: "_Stage", count: int) -> None:
+        logger.info(
+            "Filter (category=%s, open_at=%s, max_price=%s) returned only %d results, filling from next stage",
+            stage.category, stage.open_at, stage.max_price, count,
+        )
+
+    @staticmethod
+    def _filter_hits(hits: List[ScoredPoint]) -> List[ScoredPoint]:
+        """
+        Ambil hits dengan score >= minimum relevance.
+        Jika tidak ada yang lolos, ambil top 10 tanpa filter score.
+        """
         if len(hits) > 0:
             logger.info("Sample scores: %s", [f"{hit.score:.3f}" for hit in hits[:5]])
-        
-        filtered = [hit.payload for hit in hits if hit.score >= _MIN_RELEVANCE_SCORE]
-        logger.info("Retrieved %d results from Qdrant (min score: %.2f)", 
+
+        filtered = [hit for hit in hits if hit.score >= _MIN_RELEVANCE_SCORE]
+        logger.info("Retrieved %d results (min score: %.2f)", 
                    len(filtered), _MIN_RELEVANCE_SCORE)
 
         # Jika tidak ada hasil dengan score tinggi, ambil top results tanpa filter score
         if len(filtered) == 0 and len(hits) > 0:
             logger.info("No results above min score, taking top %d results without score filter", 
                        min(10, len(hits)))
-            filtered = [hit.payload for hit in hits[:10]]
+            filtered = hits[:10]
+        return filtered
 
-        # Jika filter terlalu ketat dan hasil terlalu sedikit, fallback tanpa filter
-        if category_filter and len(filtered) < 3:
-            logger.info(
-                "Category filter '%s' returned only %d results, falling back to unfiltered",
-                category_filter, len(filtered),
+    @staticmethod
+    def _fuse_rankings(
+        dense_hits: list, lexical_hits: list, top_k: int
+    ) -> List[dict]:
+        """
+        Reciprocal-rank fusion antara hasil vektor dan BM25.
+        Skor = Σ 1 / (k + rank) untuk setiap daftar tempat dokumen muncul.
+        """
+        if not lexical_hits:
+            return [hit.payload for hit in dense_hits[:top_k]]
+
+        fused: dict = {}
+        payloads: dict = {}
+        for ranking in (dense_hits, lexical_hits):
+            for rank, hit in enumerate(ranking, 1):
+                fused[hit.id] = fused.get(hit.id, 0.0) + 1.0 / (_RRF_K + rank)
+                payloads.setdefault(hit.id, hit.payload)
+
+        order = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        return [payloads[point_id] for point_id in order]
+
+    def _lexical_candidates(
+        self, lexical: BM25Index | None, lexical_query: str, top_k: int, stage: "_Stage"
+    ) -> Tuple[List[LocalHit], List[dict] | None]:
+        """
+        Jalankan BM25. Kembalikan (hits_leksikal, hasil_short_circuit).
+        Short-circuit terisi jika query menyebut nama tempat spesifik yang
+        lolos filter tahap pertama — retrieval vektor (dan embedding OpenAI)
+        tidak perlu dipanggil.
+        """
+        if lexical is None:
+            return [], None
+
+        allowed = self._stage_local_mask(lexical.catalog, stage)
+        exact = lexical.exact_name_match(lexical_query, top_k, stage.category, allowed)
+        if exact:
+            self._counters["lexical_short_circuit"] += 1
+            logger.info("Exact name match for '%s': %s", lexical_query[:50], exact[0].payload.get("nama_tempat"))
+            return exact, [hit.payload for hit in exact]
+
+        hits = lexical.search(
+            lexical_query,
+            _LEXICAL_TOP_K,
+            stage.category,
+            allowed=allowed,
+        )
+        logger.info("Total hits from BM25: %d", len(hits))
+        return hits, None
+
+    def _merge_stage_hits(self, stages: List["_Stage"], hit_lists: Iterable[list]) -> list:
+        """
+        Pilih hasil dari tahap filter pertama yang cukup (>= 3 hasil).
+        Hasil tahap yang lebih ketat tetap di urutan depan, sisanya diisi
+        dari tahap berikutnya (tanpa duplikat).
+        """
+        self._counters["retrieval_staged"] += 1
+        merged: list = []
+        seen: set = set()
+        for i, (stage, hits) in enumerate(zip(stages, hit_lists)):
+            if i == 1:
+                self._counters["retrieval_fallback"] += 1
+            filtered = self._filter_hits(hits)
+            merged.extend(hit for hit in filtered if hit.id not in seen)
+            seen.update(hit.id for hit in filtered)
+            if len(filtered) >= _MIN_STAGE_RESULTS:
+                break
+            if i < len(stages) - 1:
+                self._log_stage_fallback(stage, len(filtered))
+        return merged
+
+    def _search_local(
+        self, index: LocalVectorIndex, vector: List[float], top_k: int, stages: List["_Stage"]
+    ) -> List[LocalHit]:
+        """Retrieval di index lokal dengan logika filter & fallback yang sama seperti Qdrant."""
+        # Generator: tahap berikutnya hanya dihitung jika memang dibutuhkan
+        hit_lists = (
+            index.search(
+                vector, top_k, stage.category, allowed=self._stage_local_mask(index.catalog, stage)
             )
-            hits = self._qdrant.query_points(
-                collection_name=settings.qdrant_collection_name,
-                query=vector,
-                limit=top_k,
-            ).points
-            filtered = [hit.payload for hit in hits if hit.score >= _MIN_RELEVANCE_SCORE]
-            
-            # Fallback lagi jika masih kosong
-            if len(filtered) == 0 and len(hits) > 0:
-                logger.info("Still no results, taking top results without any filter")
-                filtered = [hit.payload for hit in hits[:10]]
+            for stage in stages
+        )
+        return self._merge_stage_hits(stages, hit_lists)[:top_k]
 
-        return filtered
+    def _retrieval_cache_key(
+        self,
+        query: str,
+        top_k: int,
+        category_filter: str | None,
+        lexical_query: str | None,
+        open_at: datetime | None,
+        max_price: int | None,
+    ) -> tuple:
+        """
+        Kunci cache hasil retrieval. Status buka/tutup tidak ikut (dihitung ulang
+        per request); filter jam buka ikut sebagai menit-minggu karena menentukan
+        himpunan kandidat. Versi data membuat cache otomatis basi saat koleksi
+        atau snapshot katalog berubah.
+        """
+        return (
+            " ".join(query.lower().split()),
+            " ".join((lexical_query or query).lower().split()),
+            category_filter,
+            top_k,
+            minute_of_week(open_at) if open_at is not None else None,
+            max_price,
+            *self._data_version(),
+        )
 
+    def _data_version(self) -> tuple:
+        """Versi koleksi Qdrant + waktu muat snapshot katalog, untuk kunci cache."""
+        indexes = self._indexes
+        local = indexes.local_index or indexes.lexical_index
+        return (
+            self._store.version,
+            local.catalog.loaded_at if local is not None else None,
+        )
 
-    @staticmethod
-    def _annotate_status(restaurants: List[dict], target_time=None) -> List[dict]:
+    async def _aretrieve(
+        self,
+        query: str,
+        top_k: int,
+        category_filter: str | None = None,
+        lexical_query: str | None = None,
+        open_at: datetime | None = None,
+        max_price: int | None = None,
+    ) -> List[dict]:
+        """`_aretrieve_uncached` dengan cache hasil (tanpa embedding & Qdrant saat hit)."""
+        key = self._retrieval_cache_key(
+            query, top_k, category_filter, lexical_query, open_at, max_price
+        )
+        cached = self._retrieval_cache.get(key)
+        if cached is not None:
+            return list(cached)
+        results, degraded = await self._aretrieve_uncached(
+            query, top_k, category_filter, lexical_query, open_at, max_price
+        )
+        # Hasil lexical-only (Qdrant gagal) tidak di-cache agar request
+        # berikutnya kembali mencoba pencarian vektor
+        if not degraded:
+            self._retrieval_cache.set(key, results)
+        return list(results)
+
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=4))
+    async def _aretrieve_uncached(
+        self,
+        query: str,
+        top_k: int,
+        category_filter: str | None = None,
+        lexical_query: str | None = None,
+        open_at: datetime | None = None,
+        max_price: int | None = None,
+    ) -> Tuple[List[dict], bool]:
+        """
+        Cari restoran relevan: BM25 + embedding query (Qdrant / index lokal).
+        Mendukung metadata pre-filtering berdasarkan kategori, jam buka
+        (`open_at`), dan budget (`max_price`); filter dilonggarkan bertahap
+        jika hasil terlalu sedikit.
+        Hasil difilter berdasarkan minimum relevance score lalu digabung via RRF.
+
+        Returns:
+            (hasil, degraded) — `degraded` True jika Qdrant gagal dan hasil
+            hanya dari index lexical.
+        """
+        indexes = self._indexes
+        stages = self._retrieval_stages(category_filter, open_at, max_price)
+        lexical_hits, short_circuit = self._lexical_candidates(
+            indexes.lexical_index, lexical_query or query, top_k, stages[0]
+        )
+        if short_circuit is not None:
+            return short_circuit, False
+
+        local_index = indexes.local_index
+        if local_index is not None:
+            vector = await self._aembed_query(query)
+            dense = self._search_local(local_index, vector, top_k, stages)
+            return self._fuse_rankings(dense, lexical_hits, top_k), False
+
+        vector = await self._aembed_query(query)
+        logger.info("Generated embedding vector of length %d for query: '%s'",
+                   len(vector), query[:50])
+
+        filters = [self._stage_query_filter(stage) for stage in stages]
+        try:
+            hit_lists = await self._store.asearch_batch(vector, filters, top_k)
+        except Exception as exc:
+            if not lexical_hits:
+                raise
+            logger.error("Qdrant search failed, using lexical results: %s", exc)
+            self._counters["retrieval_degraded"] += 1
+            return [hit.payload for hit in lexical_hits[:top_k]], True
+        logger.info("Total hits from Qdrant per stage: %s", [len(hits) for hits in hit_lists])
+        filtered = self._merge_stage_hits(stages, hit_lists)[:top_k]
+
+        return self._fuse_rankings(filtered, lexical_hits, top_k), False
+
+
+    def _refresh_status(self, restaurants: List[dict], target_time=None) -> List[dict]:
+        """Salinan `restaurants` dengan `status_operasional` terkini, urutan tetap."""
+        moment = target_time or get_samarinda_time()
+        statuses = self._schedule.statuses(restaurants, moment, is_future=target_time is not None)
+        return [
+            {**resto, "status_operasional": status}
+            for resto, status in zip(restaurants, statuses)
+        ]
+
+    def _annotate_status(self, restaurants: List[dict], target_time=None) -> List[dict]:
         """
         Tambahkan field `status_operasional` ke setiap restoran.
         Restoran yang buka diprioritaskan di depan.
+
+        Status dihitung dari bitmap jadwal mingguan yang sudah dikompilasi,
+        sehingga satu lookup kolom cukup untuk seluruh kandidat.
         """
         open_list: List[dict] = []
         closed_list: List[dict] = []
 
-        for resto in restaurants:
-            if target_time:
-                status = check_operational_status_at_time(
-                    resto.get("jam_buka", "Unknown"),
-                    resto.get("jam_tutup", "Unknown"),
-                    resto.get("hari_operasional", "Unknown"),
-                    target_time,
-                )
-            else:
-                status = check_operational_status(
-                    resto.get("jam_buka", "Unknown"),
-                    resto.get("jam_tutup", "Unknown"),
-                    resto.get("hari_operasional", "Unknown"),
-                )
-
-            resto = {**resto, "status_operasional": status}
-
-            if "Buka" in status:
+        for resto in self._refresh_status(restaurants, target_time):
+            if "Buka" in resto["status_operasional"]:
                 open_list.append(resto)
             else:
                 closed_list.append(resto)
@@ -217,7 +755,7 @@ class RAGService:
         return open_list + closed_list
 
     @staticmethod
-    def _build_system_prompt(
+    def _build_turn_prompt(
         requested_count: int,
         time_context: str,
         day_name: str,
@@ -225,6 +763,10 @@ class RAGService:
         is_future: bool,
         context_text: str,
     ) -> str:
+        """
+        Bagian system prompt yang berubah per request. Dikirim setelah
+        `STATIC_SYSTEM_PROMPT` agar prefix statis tetap byte-identik.
+        """
         future_note = (
             "\n- CATATAN: Ini adalah rekomendasi untuk WAKTU MENDATANG"
             if is_future
@@ -236,82 +778,43 @@ class RAGService:
             else "Prioritaskan tempat yang BUKA SEKARANG"
         )
 
-        return f"""Kamu adalah asisten chatbot rekomendasi tempat makan di Samarinda yang ramah.
+        return f"""PERMINTAAN:
+- Jumlah rekomendasi: {requested_count}
+- Prioritas: {priority_note}
 
 KONTEKS WAKTU:
 - Jam   : {current_time_str} WITA
 - Hari  : {day_name}
 - Waktu : {time_context}{future_note}
 
-INSTRUKSI:
-1. Berikan TEPAT {requested_count} rekomendasi — tidak lebih, tidak kurang.
-2. {priority_note}.
-3. Jika tempat tutup, sebutkan kapan akan buka.
-4. Sesuaikan dengan konteks waktu (sarapan/siang/malam/cemilan).
-5. Pertimbangkan permintaan khusus pengguna (budget, jenis makanan, fasilitas).
-6. Gunakan Bahasa Indonesia yang ramah dan natural.
-7. HANYA rekomendasikan tempat yang ada di DATA RESTORAN di bawah.
-
-FORMAT WAJIB (gunakan persis):
-[Sapaan singkat 1 kalimat]
-
-**1. Nama Tempat**
-[Deskripsi 2–3 kalimat: kenapa cocok, menu andalan, harga, status buka/tutup]
-
-**2. Nama Tempat**
-[Deskripsi 2–3 kalimat]
-
-... dst hingga {requested_count} rekomendasi ...
-
-[Penutup 1 kalimat]
-
 DATA RESTORAN YANG TERSEDIA:
 {context_text}
 """
 
-    @staticmethod
-    def _format_context(restaurants: List[dict]) -> str:
-        """Format data restoran menjadi teks konteks untuk LLM."""
-        lines = []
-        for i, r in enumerate(restaurants, 1):
-            menu_raw = r.get("menu_andalan", [])
-            if isinstance(menu_raw, list):
-                menu = ", ".join(menu_raw[:3]) or "Tidak tersedia"
-            else:
-                menu = str(menu_raw) if menu_raw else "Tidak tersedia"
-
-            fasilitas_raw = r.get("fasilitas", [])
-            if isinstance(fasilitas_raw, list):
-                fasilitas = ", ".join(fasilitas_raw) or "Tidak tersedia"
-            else:
-                fasilitas = str(fasilitas_raw) if fasilitas_raw else "Tidak tersedia"
-
-            lines.append(
-                f"{i}. {r.get('nama_tempat', 'Unknown')}\n"
-                f"   Kategori : {r.get('kategori_makanan', 'Unknown')}\n"
-                f"   Harga    : {r.get('range_harga', 'Unknown')}\n"
-                f"   Lokasi   : {r.get('lokasi', 'Unknown')}\n"
-                f"   Status   : {r.get('status_operasional', 'Unknown')}\n"
-                f"   Jam      : {r.get('jam_buka', '?')} – {r.get('jam_tutup', '?')}\n"
-                f"   Menu     : {menu}\n"
-                f"   Fasilitas: {fasilitas}\n"
-                f"   Deskripsi: {r.get('ringkasan', '-')}\n"
-            )
-        return "\n".join(lines)
+    def _format_context(self, restaurants: List[dict]) -> Tuple[str, int]:
+        """Format data restoran menjadi teks konteks untuk LLM (dalam budget token)."""
+        return build_context(restaurants, self._token_counter, settings.context_token_budget)
 
-    @staticmethod
     def _build_messages(
-        system_prompt: str,
+        self,
+        turn_prompt: str,
         conversation_history: List[dict],
         user_query: str,
     ) -> list:
         """
         Bangun daftar pesan untuk LLM dengan menyertakan riwayat percakapan.
+        Urutan: prefix statis → bagian per request → riwayat → query.
         """
-        messages = [SystemMessage(content=system_prompt)]
-
-        # Sertakan 4 pesan terakhir sebagai konteks percakapan
-        for msg in conversation_history[-4:]:
+        messages = [
+            SystemMessage(content=self._static_prompt),
+            SystemMessage(content=turn_prompt),
+        ]
+
+        # Riwayat terbaru yang muat dalam budget token
+        history = trim_history(
+            conversation_history, self._token_counter, settings.history_token_budget
+        )
+        for msg in history:
             role = msg.get("role", "")
             content = msg.get("content", "")
             if role == "user":
@@ -322,6 +825,53 @@ DATA RESTORAN YANG TERSEDIA:
         messages.append(HumanMessage(content=user_query))
         return messages
 
+    def _record_usage(self, usage: dict | None, latency: float) -> None:
+        """Catat usage LLM; `cache_read` = token prefix yang dilayani dari prompt cache."""
+        if not usage:
+            return
+        cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        bucket = "cached" if cached else "uncached"
+        self._counters["llm_calls"] += 1
+        self._counters["llm_input_tokens"] += usage.get("input_tokens", 0)
+        self._counters["llm_output_tokens"] += usage.get("output_tokens", 0)
+        self._counters["llm_cached_tokens"] += cached
+        self._counters[f"llm_calls_{bucket}"] += 1
+        self._counters[f"llm_latency_ms_{bucket}"] += int(latency * 1000)
+        logger.info(
+            "LLM usage: %d input (%d cached), %d output, %.2fs",
+            usage.get("input_tokens", 0),
+            cached,
+            usage.get("output_tokens", 0),
+            latency,
+        )
+
+    def _record_aborted_stream(self, generated_chunks: int) -> None:
+        """
+        Stream dibatalkan sebelum LLM selesai. Token yang dihemat diperkirakan
+        dari rata-rata output stream yang selesai (atau batas `max_tokens`);
+        satu chunk stream OpenAI ≈ satu token.
+        """
+        calls = self._counters["llm_calls"]
+        if calls:
+            expected = self._counters["llm_output_tokens"] // calls
+        elif settings.answer_mode == "compact":
+            expected = settings.compact_max_tokens
+        else:
+            expected = settings.llm_max_tokens
+        saved = max(expected - generated_chunks, 0)
+        self._counters["stream_aborted"] += 1
+        self._counters["stream_aborted_tokens_generated"] += generated_chunks
+        self._counters["stream_tokens_saved"] += saved
+        logger.info(
+            "Stream aborted after %d tokens (~%d output tokens saved)", generated_chunks, saved
+        )
+
+    def _count_input_tokens(self, messages: list) -> int:
+        return sum(
+            self._token_counter.count(str(m.content)) + MESSAGE_OVERHEAD_TOKENS
+            for m in messages
+        )
+
 
     @staticmethod
     def _make_cards(
@@ -369,20 +919,24 @@ DATA RESTORAN YANG TERSEDIA:
         return cards
 
 
-    def _compress_query_with_history(self, query: str, history: list) -> str:
-        """
-        Gabungkan query baru dengan konteks dari history percakapan
-        untuk menghasilkan query retrieval yang standalone.
-        """
-        if not history:
-            return query
+    @staticmethod
+    def _compression_prompt(query: str, history: list, previous_query: str | None = None) -> str:
+        if previous_query:
+            # Sesi server: query standalone giliran lalu sudah merangkum riwayat
+            return (
+                "Gabungkan query pencarian restoran sebelumnya dengan pesan baru "
+                "menjadi satu query pencarian yang lengkap dan standalone.\n\n"
+                f"Query sebelumnya: {previous_query}\n"
+                f"Pesan baru: {query}\n\n"
+                "Output hanya query standalone, tanpa penjelasan:"
+            )
 
         last_exchanges = history[-4:]
         context = "\n".join(
             [f"{m['role']}: {m['content'][:200]}" for m in last_exchanges]
         )
 
-        prompt = (
+        return (
             "Berdasarkan riwayat percakapan berikut, buat query pencarian restoran "
             "yang lengkap dan standalone. Gabungkan konteks relevan dari riwayat.\n\n"
             f"Riwayat:\n{context}\n\n"
@@ -390,8 +944,28 @@ DATA RESTORAN YANG TERSEDIA:
             "Output hanya query standalone, tanpa penjelasan:"
         )
 
+    def _needs_compression(self, parsed: ParsedQuery, history: list) -> bool:
+        """Compression LLM hanya untuk query lanjutan yang tidak berdiri sendiri."""
+        if not history:
+            return False
+        if parsed.is_standalone:
+            self._counters["compression_skipped"] += 1
+            logger.info("Query is standalone, skipping compression: '%s'", parsed.text[:50])
+            return False
+        self._counters["compression_called"] += 1
+        return True
+
+    async def _acompress_query_with_history(
+        self, query: str, history: list, previous_query: str | None = None
+    ) -> str:
+        """
+        Gabungkan query baru dengan konteks dari history percakapan (atau
+        query standalone giliran sebelumnya dari sesi) untuk menghasilkan
+        query retrieval yang standalone.
+        """
+        prompt = self._compression_prompt(query, history, previous_query)
         try:
-            response = self._llm.invoke([HumanMessage(content=prompt)])
+            response = await self._compression_llm.ainvoke([HumanMessage(content=prompt)])
             compressed = response.content.strip()
             logger.info("Compressed query: '%s' -> '%s'", query, compressed)
             return compressed
@@ -399,33 +973,181 @@ DATA RESTORAN YANG TERSEDIA:
             logger.warning("Query compression failed, using original: %s", exc)
             return query
 
+    def _retrieval_args(self, turn: "_Turn", retrieval_query: str) -> dict:
+        """Argumen `_aretrieve` untuk satu query retrieval."""
+        return dict(
+            query=self._enhance_query(retrieval_query, turn),
+            top_k=self._retrieve_count(turn),
+            category_filter=self._detect_category(retrieval_query),
+            lexical_query=retrieval_query,
+            open_at=turn.open_at,
+            max_price=turn.parsed.max_price,
+        )
 
-    def generate_response(
-        self,
-        user_query: str,
-        conversation_history: List[dict],
-    ) -> Tuple[str, List[RestaurantCard]]:
+    def _speculation_usable(self, raw_query: str, compressed_query: str) -> bool:
         """
-        Proses query pengguna dan kembalikan (teks_respons, kartu_restoran).
+        Hasil retrieval query mentah boleh dipakai jika query hasil compression
+        hampir sama: kategori terdeteksi sama dan overlap token tinggi.
+        """
+        if self._detect_category(raw_query) != self._detect_category(compressed_query):
+            return False
+        raw_tokens, compressed_tokens = set(tokenize(raw_query)), set(tokenize(compressed_query))
+        union = raw_tokens | compressed_tokens
+        if not union:
+            return True
+        return len(raw_tokens & compressed_tokens) / len(union) >= _SPECULATION_MIN_OVERLAP
+
+    def _speculation_plausible(
+        self, raw_query: str, history: list, previous_query: str | None
+    ) -> bool:
+        """
+        Compression mewarisi subjek giliran sebelumnya. Jika kategori giliran
+        itu berbeda dari kategori query mentah (biasanya: query mentah tanpa
+        kategori setelah "rekomendasi bakso"), hasil compression pasti gagal
+        `_speculation_usable`.
+        """
+        context = previous_query or next(
+            (m.get("content", "") for m in reversed(history) if m.get("role") == "user"), ""
+        )
+        return self._detect_category(context) == self._detect_category(raw_query)
 
-        Alur:
-        1. Tentukan jumlah rekomendasi yang diminta (default 5, maks 15).
-        2. Deteksi referensi waktu mendatang ("besok pagi", "jam 7", dll.).
-        3. Compress query dengan history untuk retrieval yang kontekstual.
-        4. Deteksi kategori untuk metadata pre-filtering.
-        5. Ambil kandidat restoran dari Qdrant.
-        6. Anotasi & urutkan berdasarkan status operasional.
-        7. Bangun prompt + riwayat percakapan, kirim ke OpenAI.
-        8. Buat kartu restoran dari pool kandidat yang sama.
+    async def _aresolve_and_retrieve(
+        self, turn: "_Turn", user_query: str, history: list, previous_query: str | None = None
+    ) -> Tuple[str, List[dict]]:
+        """
+        Query compression + retrieval → (retrieval_query, hasil).
+
+        Untuk query lanjutan, retrieval dengan query mentah dijalankan secara
+        spekulatif sebagai task selama compression LLM berjalan. Jika hasil
+        compression hampir sama, embed + search kedua tidak perlu dilakukan.
+        Spekulasi hanya jika hit mungkin (`_speculation_plausible`); selain
+        itu spekulasi hanya membuang satu embedding + search.
+        """
+        if not self._needs_compression(turn.parsed, history):
+            return user_query, await self._aretrieve(**self._retrieval_args(turn, user_query))
+
+        if not self._speculation_plausible(user_query, history, previous_query):
+            self._counters["speculation_skipped"] += 1
+            retrieval_query = await self._acompress_query_with_history(
+                user_query, history, previous_query
+            )
+            return retrieval_query, await self._aretrieve(
+                **self._retrieval_args(turn, retrieval_query)
+            )
+
+        speculative = asyncio.create_task(
+            self._aretrieve(**self._retrieval_args(turn, user_query))
+        )
+        try:
+            retrieval_query = await self._acompress_query_with_history(
+                user_query, history, previous_query
+            )
+        except BaseException:
+            speculative.cancel()
+            raise
+        if self._speculation_usable(user_query, retrieval_query):
+            self._counters["speculation_hit"] += 1
+            return retrieval_query, await speculative
+
+        self._counters["speculation_miss"] += 1
+        speculative.cancel()
+        speculative.add_done_callback(_consume_task_result)
+        return retrieval_query, await self._aretrieve(**self._retrieval_args(turn, retrieval_query))
+
+    def _refine_candidates(self, turn: "_Turn", session: Session | None) -> List[dict] | None:
+        """
+        Jawab refinement ("yang lebih murah", "yang buka sekarang", "ada wifi?",
+        "tambah 3 lagi") dari pool kandidat giliran sebelumnya tanpa
+        compression, embedding, maupun Qdrant. None jika query bukan refinement
+        atau pool sudah tidak cukup (lanjut ke retrieval biasa).
+        """
+        parsed = turn.parsed
+        if session is None or not session.candidates or not parsed.is_refinement:
+            return None
+
+        candidates = session.candidates
+        if parsed.more:
+            shown = set(session.shown)
+            candidates = [r for r in candidates if r.get("nama_tempat") not in shown]
+        if parsed.facilities:
+            candidates = [r for r in candidates if _has_facilities(r, parsed.facilities)]
+        if turn.open_at is not None and candidates:
+            mask = self._schedule.open_mask(candidates, turn.open_at)
+            candidates = [r for r, is_open in zip(candidates, mask) if is_open]
+        if parsed.max_price is not None:
+            # Sama dengan filter retrieval: harga termurah masih dalam budget
+            candidates = [
+                r for r in candidates
+                if (price := _min_price(r)) is not None and price <= parsed.max_price
+            ]
+        if parsed.cheaper:
+            candidates = self._cheaper_than_shown(candidates, session)
+
+        if len(candidates) < min(turn.requested_count, _MIN_STAGE_RESULTS):
+            self._counters["refinement_fallback"] += 1
+            logger.info("Refinement pool exhausted (%d left), retrieving", len(candidates))
+            return None
+        self._counters["refinement_local"] += 1
+        logger.info(
+            "Refined previous pool locally: %d of %d candidates",
+            len(candidates),
+            len(session.candidates),
+        )
+        return candidates
+
+    @staticmethod
+    def _cheaper_than_shown(candidates: List[dict], session: Session) -> List[dict]:
+        """
+        Kandidat dengan harga termurah di bawah median rekomendasi sebelumnya,
+        urut dari yang paling murah (urutan ranking dipertahankan untuk harga sama).
+        """
+        shown = set(session.shown)
+        shown_prices = [
+            price for r in session.candidates
+            if r.get("nama_tempat") in shown and (price := _min_price(r)) is not None
+        ]
+        priced = [(price, r) for r in candidates if (price := _min_price(r)) is not None]
+        if shown_prices:
+            ceiling = statistics.median(shown_prices)
+            priced = [(price, r) for price, r in priced if price < ceiling]
+        return [r for _, r in sorted(priced, key=lambda item: item[0])]
+
+    async def _aresolve_turn(
+        self, turn: "_Turn", user_query: str, history: list, session: Session | None
+    ) -> Tuple[TurnState, List[dict]]:
+        """
+        (state untuk sesi, kandidat giliran ini). Refinement memakai ulang pool
+        sesi (state tetap merujuk pool lama); selain itu compression + retrieval.
         """
-        # 1. Jumlah rekomendasi
+        refined = self._refine_candidates(turn, session)
+        if refined is not None:
+            state = TurnState(
+                session.last_query or user_query, session.candidates, tuple(session.shown)
+            )
+            return state, refined
+
+        previous_query = session.last_query if session is not None else None
+        retrieval_query, raw_results = await self._aresolve_and_retrieve(
+            turn, user_query, history, previous_query
+        )
+        if session is not None and turn.parsed.more and session.shown:
+            # Pool habis untuk "tambah lagi": hasil retrieval baru tetap tanpa
+            # restoran yang sudah direkomendasikan
+            shown = set(session.shown)
+            fresh = [r for r in raw_results if r.get("nama_tempat") not in shown]
+            return TurnState(retrieval_query, raw_results, tuple(session.shown)), fresh
+        return TurnState(retrieval_query, raw_results), raw_results
+
+
+    def _plan_turn(self, user_query: str) -> "_Turn":
+        """Tentukan jumlah rekomendasi dan konteks waktu (sekarang atau mendatang)."""
+        parsed = self._query_parser.parse(user_query)
         requested_count = min(
-            extract_number_from_text(user_query) or _DEFAULT_RECOMMENDATIONS,
+            parsed.count or _DEFAULT_RECOMMENDATIONS,
             _MAX_RECOMMENDATIONS,
         )
 
-        # 2. Waktu (sekarang atau mendatang)
-        future = parse_future_time(user_query)
+        future = parsed.future
         if future:
             target_time, time_context = future
             day_name = _DAY_ID_MAP.get(target_time.strftime("%A"), target_time.strftime("%A"))
@@ -436,117 +1158,403 @@ DATA RESTORAN YANG TERSEDIA:
             day_name = get_day_name_indonesian()
             is_future = False
 
+        # Waktu yang harus dipenuhi jam buka: waktu yang diminta, atau sekarang
+        # jika pengguna eksplisit minta yang sedang buka
         current_time = target_time or get_samarinda_time()
+        open_at = target_time if is_future else (current_time if parsed.open_now else None)
 
-        # 3. Contextual query compression
-        retrieval_query = self._compress_query_with_history(user_query, conversation_history)
-
-        # 4. Deteksi kategori untuk pre-filtering
-        category_filter = self._detect_category(retrieval_query)
-
-        # 5. Retrieval
-        retrieve_count = max(requested_count * _RETRIEVE_MULTIPLIER, _RETRIEVE_MINIMUM)
-        enhanced_query = (
-            f"{retrieval_query} "
-            f"(Waktu: {time_context}, Hari: {day_name}, "
-            f"Jam: {current_time.strftime('%H:%M')})"
-        )
-        raw_results = self._retrieve(enhanced_query, top_k=retrieve_count, category_filter=category_filter)
-
-        # 6. Anotasi & sortir
-        annotated = self._annotate_status(raw_results, target_time=target_time)
-
-        # 7. Generasi teks — gunakan pool kandidat yang sama untuk LLM dan cards
-        candidate_pool = annotated[: requested_count + 5]
-        context_text = self._format_context(candidate_pool)
-        system_prompt = self._build_system_prompt(
+        return _Turn(
+            parsed=parsed,
             requested_count=requested_count,
+            target_time=target_time,
             time_context=time_context,
             day_name=day_name,
-            current_time_str=current_time.strftime("%H:%M"),
             is_future=is_future,
+            current_time=current_time,
+            open_at=open_at,
+        )
+
+    @staticmethod
+    def _retrieve_count(turn: "_Turn") -> int:
+        """
+        Jumlah kandidat yang diambil. Tanpa filter jam buka/budget perlu
+        over-fetch karena sebagian besar hasil bisa saja tutup atau terlalu mahal.
+        """
+        filtered = turn.open_at is not None or turn.parsed.max_price is not None
+        minimum = _FILTERED_RETRIEVE_MINIMUM if filtered else _RETRIEVE_MINIMUM
+        return max(turn.requested_count * _RETRIEVE_MULTIPLIER, minimum)
+
+    @staticmethod
+    def _enhance_query(retrieval_query: str, turn: "_Turn") -> str:
+        """
+        Tambahkan konteks waktu makan ke query retrieval.
+
+        Hanya konteks kasar (sarapan/siang/...) yang ikut di-embed; hari dan
+        jam berubah tiap menit sehingga akan membuat cache embedding tidak
+        pernah hit. Status buka/tutup ditangani oleh `_annotate_status`.
+        """
+        return f"{retrieval_query} (Waktu: {turn.time_context})"
+
+    def _candidate_pool(self, turn: "_Turn", raw_results: List[dict]) -> List[dict]:
+        """
+        Kandidat beranotasi status (buka lebih dulu) untuk jawaban & kartu.
+        Untuk "yang lebih murah" urutan di tiap kelompok status adalah harga
+        termurah, termasuk saat refinement kembali ke retrieval.
+        """
+        annotated = self._annotate_status(raw_results, target_time=turn.target_time)
+        if turn.parsed.cheaper:
+            annotated.sort(key=_open_then_cheapest)
+        return annotated[: turn.requested_count + 5]
+
+    def _blurb_answer(
+        self, turn: "_Turn", raw_results: List[dict]
+    ) -> Tuple[str, List[RestaurantCard]]:
+        """Mode blurb: jawaban disusun dari blurb ingest tanpa panggilan LLM."""
+        self._counters["answers_without_llm"] += 1
+        return self._finalize_answer(turn, self._candidate_pool(turn, raw_results), "")
+
+    def _prepare_generation(
+        self,
+        turn: "_Turn",
+        raw_results: List[dict],
+        conversation_history: List[dict],
+        user_query: str,
+    ) -> Tuple[list, List[dict]]:
+        """
+        Anotasi status, pilih pool kandidat, lalu bangun pesan untuk LLM.
+        Pool kandidat yang sama dipakai untuk LLM dan cards.
+        """
+        candidate_pool = self._candidate_pool(turn, raw_results)
+        context_text, context_tokens = self._format_context(candidate_pool)
+        turn_prompt = self._build_turn_prompt(
+            requested_count=turn.requested_count,
+            time_context=turn.time_context,
+            day_name=turn.day_name,
+            current_time_str=turn.current_time.strftime("%H:%M"),
+            is_future=turn.is_future,
             context_text=context_text,
         )
-        messages = self._build_messages(system_prompt, conversation_history, user_query)
-        response = self._llm.invoke(messages)
+        messages = self._build_messages(turn_prompt, conversation_history, user_query)
+
+        input_tokens = self._count_input_tokens(messages)
+        self._counters["prompt_requests"] += 1
+        self._counters["prompt_input_tokens"] += input_tokens
+        self._counters["prompt_context_tokens"] += context_tokens
+        logger.info(
+            "Prompt: %d input tokens (context %d, %d candidates, %d history msgs)",
+            input_tokens,
+            context_tokens,
+            len(candidate_pool),
+            len(messages) - 3,
+        )
+        return messages, candidate_pool
+
+
+    def coalescing_key(self, user_query: str, conversation_history: List[dict]) -> tuple | None:
+        """
+        Kunci single-flight untuk request identik yang datang bersamaan:
+        query ternormalisasi, jumlah, dan konteks waktu. None jika ada riwayat
+        (jawaban bergantung percakapan masing-masing pengguna).
+        """
+        if conversation_history:
+            return None
+        turn = self._plan_turn(user_query)
+        return (" ".join(user_query.lower().split()), turn.requested_count, turn.time_context)
+
+    def _response_cache_key(
+        self, turn: "_Turn", conversation_history: List[dict]
+    ) -> tuple | None:
+        """
+        Kunci kelompok semantic cache; None jika respons tidak boleh di-cache
+        (fitur nonaktif, ada riwayat percakapan, atau waktu mendatang spesifik).
+        Mode blurb tidak memanggil LLM sehingga tidak perlu cache respons.
+        Versi data ikut, seperti kunci cache retrieval, agar jawaban basi
+        setelah koleksi atau katalog berubah.
+        """
+        if not settings.response_cache_enabled or conversation_history or turn.is_future:
+            return None
+        if settings.answer_mode == "blurb":
+            return None
+        parsed = turn.parsed
+        return (
+            turn.requested_count,
+            parsed.category,
+            turn.time_context,
+            parsed.open_now,
+            parsed.max_price,
+            tuple(parsed.facilities),
+            *self._data_version(),
+        )
+
+    def _cached_response(
+        self, turn: "_Turn", cache_key: tuple, query_vector: List[float]
+    ) -> Tuple[str, List[RestaurantCard], List[dict]] | None:
+        """
+        Teks dari cache + kartu dengan status operasional yang dihitung ulang,
+        beserta pool kandidatnya (untuk state sesi).
+        """
+        cached = self._response_cache.get(cache_key, query_vector)
+        if cached is None:
+            return None
+        logger.info("Semantic response cache hit for '%s'", turn.parsed.text[:50])
+        # Urutan pool tetap seperti saat di-cache: nomor pilihan (compact) dan
+        # urutan restoran di teks LLM (prose) merujuk ke urutan itu
+        candidates = self._refresh_status(cached.candidates, target_time=turn.target_time)
+        text, cards = self._finalize_answer(turn, candidates, cached.text)
+        return text, cards, candidates
+
+    def _finalize_answer(
+        self, turn: "_Turn", candidate_pool: List[dict], llm_text: str
+    ) -> Tuple[str, List[RestaurantCard]]:
+        """
+        Teks final + kartu. Mode prose: teks LLM apa adanya. Mode compact:
+        teks dirender dari pilihan LLM; mode blurb: dari kandidat teratas +
+        blurb ingest. Kartu mengikuti urutan yang sama dengan teks.
+        """
+        if settings.answer_mode in ("compact", "blurb"):
+            if settings.answer_mode == "compact":
+                picks = parse_compact_answer(llm_text, candidate_pool, turn.requested_count)
+            else:
+                meal_context = time_context_for(turn.current_time.hour)
+                picks = blurb_picks(candidate_pool, turn.requested_count, meal_context)
+            text = render_answer(picks, turn.time_context, turn.is_future)
+            return text, self._make_cards(
+                [pick.resto for pick in picks], max_cards=turn.requested_count
+            )
+        return llm_text, self._make_cards(candidate_pool, max_cards=turn.requested_count)
+
+    async def agenerate_response(
+        self,
+        user_query: str,
+        conversation_history: List[dict],
+    ) -> Tuple[str, List[RestaurantCard]]:
+        """
+        Proses query pengguna dan kembalikan (teks_respons, kartu_restoran).
+
+        Alur:
+        1. Tentukan jumlah rekomendasi yang diminta (default 5, maks 15).
+        2. Deteksi referensi waktu mendatang ("besok pagi", "jam 7", dll.).
+        3. Compress query dengan history untuk retrieval yang kontekstual.
+        4. Deteksi kategori untuk metadata pre-filtering.
+        5. Ambil kandidat restoran dari Qdrant.
+        6. Anotasi & urutkan berdasarkan status operasional.
+        7. Bangun prompt + riwayat percakapan, kirim ke OpenAI.
+        8. Buat kartu restoran dari pool kandidat yang sama.
+
+        Semua panggilan jaringan (compression, embedding, Qdrant, LLM) memakai
+        API async sehingga satu worker bisa melayani banyak chat sekaligus.
+        """
+        text, cards, _ = await self.agenerate_turn(user_query, conversation_history)
+        return text, cards
+
+    async def agenerate_turn(
+        self,
+        user_query: str,
+        conversation_history: List[dict],
+        session: Session | None = None,
+    ) -> Tuple[str, List[RestaurantCard], TurnState]:
+        """
+        `agenerate_response` + state giliran untuk sesi percakapan. Dengan
+        `session`, refinement dijawab dari pool kandidat giliran sebelumnya dan
+        query standalone sebelumnya menggantikan riwayat di prompt compression.
+        """
+        turn = self._plan_turn(user_query)
+
+        cache_key = self._response_cache_key(turn, conversation_history)
+        if cache_key is not None:
+            query_vector = await self._aembed_query(self._enhance_query(user_query, turn))
+            cached = self._cached_response(turn, cache_key, query_vector)
+            if cached is not None:
+                text, cards, candidates = cached
+                return text, cards, TurnState(user_query, candidates)
+
+        state, raw_results = await self._aresolve_turn(
+            turn, user_query, conversation_history, session
+        )
+
+        if settings.answer_mode == "blurb":
+            return (*self._blurb_answer(turn, raw_results), state)
+
+        messages, candidate_pool = self._prepare_generation(
+            turn, raw_results, conversation_history, user_query
+        )
+        started = time.perf_counter()
+        response = await self._answer_llm.ainvoke(messages)
+        self._record_usage(response.usage_metadata, time.perf_counter() - started)
 
-        # 8. Kartu — dari pool kandidat yang sama agar selalu match dengan rekomendasi LLM
-        logger.info("Creating cards from %d candidates, requesting %d cards", 
-                   len(candidate_pool), requested_count)
-        cards = self._make_cards(candidate_pool, max_cards=requested_count)
+        text, cards = self._finalize_answer(turn, candidate_pool, response.content)
         logger.info("Generated %d cards", len(cards))
 
-        return response.content, cards
+        if cache_key is not None:
+            self._response_cache.set(
+                cache_key, query_vector, CachedResponse(response.content, candidate_pool)
+            )
+        return text, cards, state
+
 
+    @staticmethod
+    def _complete_answer_events(text: str, cards: List[RestaurantCard]):
+        """Event stream untuk jawaban yang sudah lengkap (cache hit / mode blurb)."""
+        if settings.stream_cards_first:
+            yield ("restaurants", cards)
+            yield ("token", text)
+        else:
+            yield ("token", text)
+            yield ("restaurants", cards)
+        yield ("done", "")
 
-    def generate_response_stream(
+    async def agenerate_response_stream(
         self,
         user_query: str,
         conversation_history: List[dict],
+        session: Session | None = None,
     ):
         """
-        Versi streaming dari generate_response.
-        Yield token per token, lalu yield cards di akhir.
+        Versi streaming dari `agenerate_turn`. Cards dikirim sebelum token
+        pertama jika `stream_cards_first` aktif, atau setelah token terakhir.
 
         Yields:
-            Tuple[str, str | List[RestaurantCard]]:
+            Tuple[str, Any]:
+                ("turn", TurnState) setelah retrieval — untuk disimpan ke sesi,
+                    tidak dikirim ke client
                 ("token", content_str) untuk setiap token
-                ("restaurants", List[RestaurantCard]) untuk cards
+                ("restaurants", List[RestaurantCard]) untuk cards — bisa dikirim
+                    ulang dengan urutan final; event terakhir yang berlaku
                 ("done", "") sebagai penanda selesai
+
+        Memakai `astream` sehingga event loop tidak tertahan per chunk. Jika
+        consumer berhenti di tengah jalan (client disconnect → task dibatalkan),
+        stream OpenAI ikut ditutup dan perkiraan token yang tidak jadi
+        dihasilkan dicatat.
         """
-        # 1-6: Sama dengan generate_response
-        requested_count = min(
-            extract_number_from_text(user_query) or _DEFAULT_RECOMMENDATIONS,
-            _MAX_RECOMMENDATIONS,
-        )
+        tokens: List[str] = []
+        llm_finished = False
+        try:
+            turn = self._plan_turn(user_query)
+
+            cache_key = self._response_cache_key(turn, conversation_history)
+            if cache_key is not None:
+                query_vector = await self._aembed_query(self._enhance_query(user_query, turn))
+                cached = self._cached_response(turn, cache_key, query_vector)
+                if cached is not None:
+                    llm_finished = True
+                    text, cards, candidates = cached
+                    yield ("turn", TurnState(user_query, candidates))
+                    for event in self._complete_answer_events(text, cards):
+                        yield event
+                    return
+
+            state, raw_results = await self._aresolve_turn(
+                turn, user_query, conversation_history, session
+            )
+            yield ("turn", state)
 
-        future = parse_future_time(user_query)
-        if future:
-            target_time, time_context = future
-            day_name = _DAY_ID_MAP.get(target_time.strftime("%A"), target_time.strftime("%A"))
-            is_future = True
-        else:
-            target_time = None
-            time_context = get_time_context()
-            day_name = get_day_name_indonesian()
-            is_future = False
+            if settings.answer_mode == "blurb":
+                llm_finished = True
+                for event in self._complete_answer_events(*self._blurb_answer(turn, raw_results)):
+                    yield event
+                return
 
-        current_time = target_time or get_samarinda_time()
+            messages, candidate_pool = self._prepare_generation(
+                turn, raw_results, conversation_history, user_query
+            )
 
-        retrieval_query = self._compress_query_with_history(user_query, conversation_history)
-        category_filter = self._detect_category(retrieval_query)
+            if settings.stream_cards_first:
+                yield ("restaurants", self._make_cards(candidate_pool, max_cards=turn.requested_count))
+
+            usage = None
+            started = time.perf_counter()
+            # aclosing: saat dibatalkan, generator astream (dan koneksi HTTP
+            # OpenAI) ditutup di sini, bukan menunggu garbage collector
+            async with aclosing(self._answer_llm.astream(messages)) as stream:
+                async for chunk in stream:
+                    if chunk.usage_metadata:
+                        usage = chunk.usage_metadata
+                    if not chunk.content:
+                        continue
+                    tokens.append(chunk.content)
+                    if settings.answer_mode != "compact":
+                        yield ("token", chunk.content)
+            llm_finished = True
+            self._record_usage(usage, time.perf_counter() - started)
+
+            text, cards = self._finalize_answer(turn, candidate_pool, "".join(tokens))
+            if settings.answer_mode == "compact":
+                yield ("token", text)
+            if not settings.stream_cards_first or settings.answer_mode == "compact":
+                yield ("restaurants", cards)
+            yield ("done", "")
+
+            if cache_key is not None:
+                self._response_cache.set(
+                    cache_key, query_vector, CachedResponse("".join(tokens), candidate_pool)
+                )
+        except (asyncio.CancelledError, GeneratorExit):
+            if not llm_finished:
+                self._record_aborted_stream(len(tokens))
+            raise
 
-        retrieve_count = max(requested_count * _RETRIEVE_MULTIPLIER, _RETRIEVE_MINIMUM)
-        enhanced_query = (
-            f"{retrieval_query} "
-            f"(Waktu: {time_context}, Hari: {day_name}, "
-            f"Jam: {current_time.strftime('%H:%M')})"
-        )
-        raw_results = self._retrieve(enhanced_query, top_k=retrieve_count, category_filter=category_filter)
 
-        annotated = self._annotate_status(raw_results, target_time=target_time)
+def _min_price(resto: dict) -> int | None:
+    """Harga termurah restoran: `harga_min` payload, atau di-parse dari `range_harga`."""
+    low = resto.get("harga_min")
+    if low is None:
+        low = (parse_price_range(resto.get("range_harga")) or (None, None))[0]
+    return low
 
-        candidate_pool = annotated[: requested_count + 5]
-        context_text = self._format_context(candidate_pool)
-        system_prompt = self._build_system_prompt(
-            requested_count=requested_count,
-            time_context=time_context,
-            day_name=day_name,
-            current_time_str=current_time.strftime("%H:%M"),
-            is_future=is_future,
-            context_text=context_text,
-        )
-        messages = self._build_messages(system_prompt, conversation_history, user_query)
 
-        # Stream tokens via LLM
-        for chunk in self._llm.stream(messages):
-            if chunk.content:
-                yield ("token", chunk.content)
+def _open_then_cheapest(resto: dict) -> tuple:
+    """Kunci sort stabil: buka dulu, lalu harga termurah (tanpa harga di akhir)."""
+    price = _min_price(resto)
+    return ("Buka" not in resto["status_operasional"], price is None, price or 0)
 
-        # Kirim cards setelah streaming selesai
-        cards = self._make_cards(candidate_pool, max_cards=requested_count)
-        yield ("restaurants", cards)
-        yield ("done", "")
+
+def _has_facilities(resto: dict, facilities: List[str]) -> bool:
+    """Semua fasilitas kanonik (`QueryParser`) ada di payload `fasilitas`."""
+    available = [" ".join(tokenize(str(item))) for item in resto.get("fasilitas") or []]
+    return all(
+        any(f" {wanted} " in f" {item} " or wanted == item.replace(" ", "") for item in available)
+        for wanted in facilities
+    )
+
+
+def _consume_task_result(task: asyncio.Task) -> None:
+    """Ambil exception task spekulatif yang dibuang agar tidak di-log sebagai 'never retrieved'."""
+    if not task.cancelled():
+        task.exception()
+
+
+class _LocalIndexes(NamedTuple):
+    """Index turunan satu snapshot katalog; diganti utuh saat re-sync."""
+
+    query_parser: QueryParser
+    local_index: LocalVectorIndex | None
+    lexical_index: BM25Index | None
+    # Versi koleksi Qdrant saat snapshot diambil (None: dari file / tanpa katalog)
+    store_version: int | None
+
+
+@dataclass
+class _Turn:
+    """Parameter satu giliran chat yang diturunkan dari query pengguna."""
+
+    parsed: ParsedQuery
+    requested_count: int
+    target_time: datetime | None
+    time_context: str
+    day_name: str
+    is_future: bool
+    current_time: datetime
+    open_at: datetime | None = None
+
+
+@dataclass(frozen=True)
+class _Stage:
+    """Satu tahap filter retrieval: kategori, waktu restoran harus buka, dan budget."""
+
+    category: str | None
+    open_at: datetime | None
+    max_price: int | None = None
 
 
 _DAY_ID_MAP = {
@@ -0,0 +1,112 @@
+"""Cache respons chat berbasis kemiripan embedding query (semantic cache)."""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Sequence, Set
+
+import numpy as np
+
+
+class CachedResponse(NamedTuple):
+    """Teks jawaban LLM + pool kandidat yang dipakai untuk membuatnya."""
+
+    text: str
+    candidates: List[dict]
+
+
+class _Entry(NamedTuple):
+    key: Hashable
+    vector: np.ndarray
+    expires_at: float
+    response: CachedResponse
+
+
+class SemanticResponseCache:
+    """
+    Cache LRU + TTL yang dicocokkan dengan cosine similarity.
+
+    Entri dikelompokkan per kunci eksak (jumlah, kategori, konteks waktu, ...);
+    di dalam satu kelompok, query dianggap sama jika cosine embedding-nya
+    >= `threshold`. Aman dipakai dari beberapa thread.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, threshold: float) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._threshold = threshold
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[Hashable, Set[int]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(vector: Sequence[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        bucket = self._buckets[entry.key]
+        bucket.discard(entry_id)
+        if not bucket:
+            del self._buckets[entry.key]
+
+    def get(self, key: Hashable, vector: Sequence[float]) -> Optional[CachedResponse]:
+        """Respons dengan embedding paling mirip di kelompok `key`, atau None."""
+        query = self._unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_score = None, self._threshold
+            for entry_id in list(self._buckets.get(key, ())):
+                entry = self._entries[entry_id]
+                if entry.expires_at < now:
+                    self._remove(entry_id)
+                    continue
+                score = float(entry.vector @ query)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id].response
+
+    def set(
+        self, key: Hashable, vector: Sequence[float], response: CachedResponse
+    ) -> None:
+        if self._maxsize <= 0:
+            return
+        entry_id = next(self._ids)
+        entry = _Entry(key, self._unit(vector), time.monotonic() + self._ttl, response)
+        with self._lock:
+            self._entries[entry_id] = entry
+            self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self._maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self._maxsize,
+            "ttl_seconds": self._ttl,
+            "threshold": self._threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
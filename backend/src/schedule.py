@@ -0,0 +1,304 @@
+"""
+Index jam operasional mingguan berbasis bitmap.
+
+Setiap jadwal unik (jam_buka, jam_tutup, hari_operasional) dikompilasi sekali
+menjadi bitmap 10080 menit (Senin 00:00 → Minggu 23:59). Status buka/tutup
+untuk banyak restoran pada waktu T cukup satu lookup kolom pada matriks NumPy.
+"""
+
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+_ALL_DAYS = frozenset(range(7))
+
+_DAY_INDEX = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
+    "friday": 4, "saturday": 5, "sunday": 6,
+    "senin": 0, "selasa": 1, "rabu": 2, "kamis": 3,
+    "jumat": 4, "jum'at": 4, "sabtu": 5, "minggu": 6, "ahad": 6,
+}
+
+_DAY_TOKEN_RE = re.compile(
+    r"setiap\s+hari|tiap\s+hari|everyday|every\s+day|daily|weekdays?|weekends?|kecuali|"
+    r"\b(?:" + "|".join(sorted(_DAY_INDEX, key=len, reverse=True)) + r")\b|-|–|sampai|s/d|hingga"
+)
+_CLOCK_VALUE_RE = re.compile(r"^(\d{1,2})(?:[:.](\d{2}))?$")
+
+Interval = Tuple[int, int]
+
+
+def minute_of_week(moment: datetime) -> int:
+    """Menit sejak Senin 00:00 untuk waktu yang diberikan."""
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+
+def parse_operating_days(hari_operasional) -> Optional[Set[int]]:
+    """
+    Hari operasional → set indeks hari (0 = Senin).
+    None jika tidak diketahui (diperlakukan buka setiap hari).
+
+    Mendukung: "Setiap Hari", "Weekday", "Weekend", "Senin-Jumat",
+    "Senin, Rabu, Jumat", "Setiap hari kecuali Senin", nama hari Inggris.
+    """
+    if isinstance(hari_operasional, (list, tuple)):
+        text = ", ".join(str(h) for h in hari_operasional)
+    else:
+        text = str(hari_operasional or "")
+    text = text.strip().lower()
+    if not text or text in ("unknown", "nan", "[]"):
+        return None
+
+    days: Set[int] = set()
+    excluded: Set[int] = set()
+    excluding = False
+    range_start: Optional[int] = None
+    pending_range = False
+
+    for match in _DAY_TOKEN_RE.finditer(text):
+        token = match.group(0)
+        if token in ("-", "–", "sampai", "s/d", "hingga"):
+            pending_range = range_start is not None
+            continue
+        if token == "kecuali":
+            excluding = True
+            continue
+
+        if token.startswith(("setiap", "tiap", "every", "daily")):
+            selected = set(_ALL_DAYS)
+        elif token.startswith("weekday"):
+            selected = {0, 1, 2, 3, 4}
+        elif token.startswith("weekend"):
+            selected = {5, 6}
+        else:
+            day = _DAY_INDEX[token]
+            if pending_range and range_start is not None:
+                # Rentang hari, termasuk yang melewati akhir minggu (Jumat-Selasa)
+                span = (day - range_start) % 7
+                selected = {(range_start + i) % 7 for i in range(span + 1)}
+            else:
+                selected = {day}
+            range_start = day
+        pending_range = False
+
+        (excluded if excluding else days).update(selected)
+
+    if not days and excluded:
+        days = set(_ALL_DAYS)
+    days -= excluded
+    return days or None
+
+
+def _parse_clock(value) -> Optional[int]:
+    """'HH:MM' / 'HH.MM' / 'HH' → menit sejak 00:00."""
+    if value is None:
+        return None
+    match = _CLOCK_VALUE_RE.match(str(value).strip())
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if hour == 24 and minute == 0:
+        return MINUTES_PER_DAY
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def _is_all_day(value) -> bool:
+    text = str(value or "").strip().lower().replace(" ", "")
+    return text in ("24jam", "24hours", "24h", "buka24jam")
+
+
+def weekly_intervals(jam_buka, jam_tutup, hari_operasional) -> Optional[List[Interval]]:
+    """
+    Jadwal → daftar interval [start, end) dalam menit-minggu.
+    None jika jam operasional tidak diketahui.
+
+    - "24 Jam" di salah satu field → buka sepanjang hari operasional.
+    - Jam tutup "habis" (sampai habis) → dianggap tutup 24:00.
+    - Jam tutup <= jam buka → lewat tengah malam (overnight).
+    """
+    days = parse_operating_days(hari_operasional) or _ALL_DAYS
+
+    if _is_all_day(jam_buka) or _is_all_day(jam_tutup):
+        open_m, close_m = 0, MINUTES_PER_DAY
+    else:
+        open_m = _parse_clock(jam_buka)
+        if str(jam_tutup or "").strip().lower() in ("habis", "sampai habis"):
+            close_m = MINUTES_PER_DAY
+        else:
+            close_m = _parse_clock(jam_tutup)
+        if open_m is None or close_m is None:
+            return None
+        if close_m == open_m:
+            close_m = open_m + MINUTES_PER_DAY
+        elif close_m < open_m:
+            close_m += MINUTES_PER_DAY
+
+    intervals: List[Interval] = []
+    for day in sorted(days):
+        start = day * MINUTES_PER_DAY + open_m
+        end = day * MINUTES_PER_DAY + close_m
+        if end > MINUTES_PER_WEEK:
+            # Minggu malam → Senin dini hari
+            intervals.append((start, MINUTES_PER_WEEK))
+            intervals.append((0, end - MINUTES_PER_WEEK))
+        else:
+            intervals.append((start, end))
+    return intervals
+
+
+def _signature(resto: dict) -> Hashable:
+    hari = resto.get("hari_operasional", "Unknown")
+    if isinstance(hari, list):
+        hari = tuple(hari)
+    return (resto.get("jam_buka", "Unknown"), resto.get("jam_tutup", "Unknown"), hari)
+
+
+class _Compiled(NamedTuple):
+    """Isi index yang immutable; diganti utuh saat ada jadwal baru."""
+
+    rows: Dict[Hashable, int]
+    matrix: np.ndarray
+    known: List[bool]
+    days: List[Optional[Set[int]]]
+
+
+class WeeklyScheduleIndex:
+    """
+    Matriks bitmap (jadwal unik x 10080 menit) + metadata per jadwal.
+
+    Restoran dengan jadwal identik berbagi satu baris, sehingga katalog
+    ~700 restoran hanya butuh beberapa ratus baris. Jadwal baru yang belum
+    pernah terlihat dikompilasi saat pertama kali diminta.
+
+    Aman dipakai dari beberapa thread: kompilasi membangun salinan baru lalu
+    menukarnya di bawah lock, dan pembaca mengambil satu snapshot sehingga
+    indeks baris dan matriks selalu konsisten. Baris hanya ditambah, jadi
+    baris dari snapshot lama tetap valid di snapshot yang lebih baru.
+    """
+
+    def __init__(self, restaurants: Iterable[dict] = ()) -> None:
+        self._compiled = _Compiled({}, np.zeros((0, MINUTES_PER_WEEK), dtype=bool), [], [])
+        self._lock = threading.Lock()
+        self.compile(restaurants)
+
+    def __len__(self) -> int:
+        return len(self._snapshot().rows)
+
+    def _snapshot(self) -> _Compiled:
+        with self._lock:
+            return self._compiled
+
+    def compile(self, restaurants: Iterable[dict]) -> None:
+        """Kompilasi semua jadwal yang belum ada di index sekaligus."""
+        restaurants = list(restaurants)
+        while True:
+            base = self._snapshot()
+            pending = {}
+            for resto in restaurants:
+                signature = _signature(resto)
+                if signature not in base.rows and signature not in pending:
+                    pending[signature] = resto
+            if not pending:
+                return
+
+            rows = dict(base.rows)
+            known = list(base.known)
+            days = list(base.days)
+            new_rows = []
+            for signature, resto in pending.items():
+                hari = resto.get("hari_operasional", "Unknown")
+                intervals = weekly_intervals(resto.get("jam_buka"), resto.get("jam_tutup"), hari)
+                bitmap = np.zeros(MINUTES_PER_WEEK, dtype=bool)
+                for start, end in intervals or ():
+                    bitmap[start:end] = True
+                new_rows.append(bitmap)
+                known.append(intervals is not None)
+                days.append(parse_operating_days(hari))
+                rows[signature] = len(rows)
+            matrix = np.vstack([base.matrix, np.asarray(new_rows)])
+
+            with self._lock:
+                # Thread lain sudah menukar index lebih dulu: ulangi dari versi terbaru
+                if self._compiled is base:
+                    self._compiled = _Compiled(rows, matrix, known, days)
+                    return
+
+    def _lookup(self, restaurants: List[dict]) -> Tuple[np.ndarray, _Compiled]:
+        """Baris per restoran beserta snapshot tempat baris itu berlaku."""
+        self.compile(restaurants)
+        compiled = self._snapshot()
+        rows = np.fromiter(
+            (compiled.rows[_signature(r)] for r in restaurants),
+            dtype=np.int64,
+            count=len(restaurants),
+        )
+        return rows, compiled
+
+    def rows_for(self, restaurants: List[dict]) -> np.ndarray:
+        return self._lookup(restaurants)[0]
+
+    def open_mask(self, restaurants: List[dict], moment: datetime) -> np.ndarray:
+        """Boolean per restoran: buka pada `moment`?"""
+        rows, compiled = self._lookup(restaurants)
+        return compiled.matrix[rows, minute_of_week(moment)]
+
+    def open_mask_rows(self, rows: np.ndarray, moment: datetime) -> np.ndarray:
+        """Seperti `open_mask`, untuk baris hasil `rows_for` yang sudah di-cache."""
+        return self._snapshot().matrix[rows, minute_of_week(moment)]
+
+    def statuses(
+        self, restaurants: List[dict], moment: datetime, is_future: bool = False
+    ) -> List[str]:
+        """
+        Label status operasional per restoran pada `moment`.
+
+        Label sama dengan versi lama: "Buka Sekarang" / "Akan Buka",
+        "Buka dalam N menit|jam" jika buka lagi di hari yang sama,
+        "Tutup (Tidak beroperasi hari ini)" jika hari libur.
+        """
+        if not restaurants:
+            return []
+
+        rows, compiled = self._lookup(restaurants)
+        t = minute_of_week(moment)
+        day = t // MINUTES_PER_DAY
+        matrix = compiled.matrix
+
+        is_open = matrix[rows, t]
+        # Pindai sisa hari ini untuk restoran yang tutup: menit sampai buka berikutnya
+        window = matrix[rows, t : (day + 1) * MINUTES_PER_DAY]
+        opens_later = window.any(axis=1)
+        minutes_until = window.argmax(axis=1)
+
+        open_label = "Akan Buka" if is_future else "Buka Sekarang"
+        closed_label = "Akan Tutup" if is_future else "Tutup"
+        off_day_label = (
+            "Akan Tutup (Tidak beroperasi hari itu)"
+            if is_future
+            else "Tutup (Tidak beroperasi hari ini)"
+        )
+
+        labels: List[str] = []
+        for i, row in enumerate(rows):
+            if is_open[i]:
+                labels.append(open_label)
+                continue
+            days = compiled.days[row]
+            if days is not None and day not in days:
+                labels.append(off_day_label)
+            elif not compiled.known[row]:
+                labels.append("Jam operasional tidak tersedia")
+            elif opens_later[i]:
+                hours, mins = divmod(int(minutes_until[i]), 60)
+                labels.append(f"Buka dalam {mins} menit" if hours == 0 else f"Buka dalam {hours} jam")
+            else:
+                labels.append(closed_label)
+        return labels
@@ -0,0 +1,194 @@
+"""
+Sesi percakapan di sisi server (`conversation_id`).
+
+Client mengirim pesan baru + `conversation_id`; riwayat, query retrieval
+standalone giliran terakhir, pool kandidatnya, dan restoran yang sudah
+ditampilkan disimpan di server sehingga giliran lanjutan tidak perlu
+memproses ulang semuanya (refinement dijawab dari pool tanpa retrieval).
+
+Sesi bisa hilang (TTL, eviction LRU, restart, request jatuh ke worker
+lain), jadi client tetap mengirim beberapa pesan terakhir sebagai
+cadangan: sesi baru diisi dari riwayat itu dan mendapat id baru.
+
+Backend:
+- "memory": LRU + TTL per worker (default).
+- "redis": server Redis-compatible (Redis/Valkey/KeyDB lokal) yang dibagi
+  antar worker. Butuh paket `redis` (`pip install redis`); batas jumlah
+  sesi diatur lewat `maxmemory` + `maxmemory-policy allkeys-lru` di server.
+"""
+
+import logging
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import orjson
+
+from .cache import TTLCache
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_REDIS_KEY_PREFIX = "chat-session:"
+
+
+class TurnState(NamedTuple):
+    """Hasil resolusi satu giliran: query retrieval standalone & pool kandidatnya."""
+
+    retrieval_query: str
+    candidates: List[dict]
+    # Restoran dari giliran sebelumnya yang tetap dianggap sudah tampil
+    # (refinement & "tambah lagi"); kosong untuk pencarian baru
+    shown: Tuple[str, ...] = ()
+
+
+@dataclass
+class Session:
+    """State satu percakapan."""
+
+    conversation_id: str
+    history: List[dict] = field(default_factory=list)
+    # Query retrieval standalone (hasil compression) giliran terakhir
+    last_query: Optional[str] = None
+    # Kandidat hasil retrieval giliran terakhir (payload restoran, urutan ranking)
+    candidates: List[dict] = field(default_factory=list)
+    # Nama restoran yang sudah direkomendasikan dari pool `candidates`
+    shown: List[str] = field(default_factory=list)
+
+    def record_turn(
+        self, user_message: str, answer: str, state: TurnState, shown: List[str]
+    ) -> None:
+        self.history.append({"role": "user", "content": user_message})
+        self.history.append({"role": "assistant", "content": answer})
+        self.last_query = state.retrieval_query
+        self.candidates = state.candidates
+        # "tambah lagi" berikutnya tidak mengulang yang sudah tampil
+        self.shown = list(dict.fromkeys([*state.shown, *shown]))
+
+
+class MemorySessionBackend:
+    """Sesi di memori proses — hilang saat restart, tidak dibagi antar worker."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._cache: TTLCache[Session] = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, conversation_id: str) -> Optional[Session]:
+        return self._cache.get(conversation_id)
+
+    async def set(self, session: Session) -> None:
+        # Entri disegarkan (TTL & urutan LRU) setiap giliran
+        self._cache.set(session.conversation_id, session)
+
+    async def aclose(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+class RedisSessionBackend:
+    """Sesi di Redis (JSON via orjson) dengan TTL per key."""
+
+    def __init__(self, url: str, ttl: float) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:  # dicegah validasi Settings; jaga-jaga
+            raise RuntimeError(
+                "SESSION_BACKEND=redis membutuhkan paket `redis` (pip install redis)"
+            ) from exc
+        self._client = redis.from_url(url)
+        self._ttl = int(ttl)
+
+    async def get(self, conversation_id: str) -> Optional[Session]:
+        raw = await self._client.get(_REDIS_KEY_PREFIX + conversation_id)
+        if raw is None:
+            return None
+        return Session(**orjson.loads(raw))
+
+    async def set(self, session: Session) -> None:
+        await self._client.set(
+            _REDIS_KEY_PREFIX + session.conversation_id,
+            orjson.dumps(asdict(session)),
+            ex=self._ttl,
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"ttl_seconds": self._ttl}
+
+
+class SessionStore:
+    """
+    Load/simpan sesi dengan batas ukuran: riwayat dipotong ke
+    `max_history` pesan terakhir dan pool kandidat ke `max_candidates`
+    (nama yang sudah ditampilkan selalu merujuk ke pool tersebut).
+    """
+
+    def __init__(self, backend, max_history: int, max_candidates: int) -> None:
+        self._backend = backend
+        self._max_history = max_history
+        self._max_candidates = max_candidates
+        self.loaded = 0
+        self.created = 0
+        self.expired = 0
+
+    async def load(
+        self, conversation_id: Optional[str], fallback_history: List[dict] = ()
+    ) -> Session:
+        """
+        Sesi untuk `conversation_id`. Jika kosong atau kedaluwarsa, sesi baru
+        (id baru) yang riwayatnya diisi dari `fallback_history` kiriman client.
+        """
+        if conversation_id:
+            try:
+                session = await self._backend.get(conversation_id)
+            except Exception as exc:
+                logger.warning("Session backend unavailable, starting new session: %s", exc)
+                session = None
+            if session is not None:
+                self.loaded += 1
+                return session
+            self.expired += 1
+            logger.info("Conversation %s not found, starting new session", conversation_id)
+        self.created += 1
+        return Session(
+            conversation_id=uuid.uuid4().hex,
+            history=list(fallback_history)[-self._max_history:],
+        )
+
+    async def save(self, session: Session) -> None:
+        session.history = session.history[-self._max_history:]
+        session.candidates = session.candidates[: self._max_candidates]
+        try:
+            await self._backend.set(session)
+        except Exception as exc:
+            # Sesi hilang hanya membuat giliran berikutnya mulai dari awal
+            logger.warning("Failed to save session %s: %s", session.conversation_id, exc)
+
+    async def aclose(self) -> None:
+        await self._backend.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": settings.session_backend,
+            "loaded": self.loaded,
+            "created": self.created,
+            "expired": self.expired,
+            **self._backend.stats(),
+        }
+
+
+def create_session_store() -> SessionStore:
+    """SessionStore sesuai `SESSION_BACKEND`."""
+    if settings.session_backend == "redis":
+        backend = RedisSessionBackend(settings.session_redis_url, settings.session_ttl)
+    else:
+        backend = MemorySessionBackend(settings.session_max_sessions, settings.session_ttl)
+    return SessionStore(
+        backend,
+        max_history=settings.session_max_history,
+        max_candidates=settings.session_max_candidates,
+    )
@@ -0,0 +1,117 @@
+"""
+Encoder Server-Sent Events untuk /chat/stream.
+
+Token LLM tidak dikirim satu frame per chunk: token yang datang dalam
+jendela waktu/ukuran kecil digabung menjadi satu event `token`, sehingga
+jumlah frame, serialisasi JSON, dan write ke socket turun drastis tanpa
+terasa oleh pengguna. Stream yang diam diberi komentar keep-alive agar
+proxy/load balancer tidak memutus koneksi.
+
+Setiap frame membawa `id:`; frame token gabungan memakai id token
+terakhir di dalamnya, sehingga `Last-Event-ID` dari client selalu
+menunjuk event terakhir yang benar-benar diterima.
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import orjson
+
+# Komentar SSE — diabaikan client, menjaga koneksi idle tetap hidup
+KEEPALIVE_FRAME = b": keep-alive\n\n"
+
+# (event_type, payload, event_id)
+Payload = Tuple[str, Dict[str, Any], Optional[str]]
+
+
+def encode_event(
+    event_type: str, payload: Dict[str, Any], event_id: Optional[str] = None
+) -> bytes:
+    """Satu frame SSE: `id:` (opsional) + `event:` + `data:` JSON (orjson, tanpa spasi)."""
+    frame = b"event: " + event_type.encode() + b"\ndata: " + orjson.dumps(payload) + b"\n\n"
+    if event_id is not None:
+        return b"id: " + event_id.encode() + b"\n" + frame
+    return frame
+
+
+async def coalesce_events(
+    events: AsyncIterator[Payload],
+    window: float = 0.03,
+    max_bytes: int = 64,
+    keepalive_interval: float = 15.0,
+) -> AsyncIterator[bytes]:
+    """
+    Frame SSE dari `(event_type, payload, event_id)`. Token pertama langsung dikirim
+    (time-to-first-token tidak berubah); token berikutnya digabung sampai
+    `max_bytes` teks atau `window` detik sejak token pertama di buffer. Event
+    lain mem-flush token tertunda lalu dikirim apa adanya. `window` 0 =
+    satu frame per token. Tanpa event selama `keepalive_interval` detik,
+    kirim komentar keep-alive.
+    """
+    iterator = events.__aiter__()
+    # Satu __anext__ dipertahankan lintas timeout: membatalkannya akan
+    # menghentikan generator sumber (subscription broadcast)
+    next_event: Optional[asyncio.Future] = None
+    pending: List[str] = []
+    pending_bytes = 0
+    pending_since = 0.0
+    pending_id: Optional[str] = None
+    first_token = True
+    last_sent = time.monotonic()
+
+    def flush() -> bytes:
+        nonlocal pending_bytes, last_sent
+        frame = encode_event("token", {"content": "".join(pending)}, pending_id)
+        pending.clear()
+        pending_bytes = 0
+        last_sent = time.monotonic()
+        return frame
+
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(iterator.__anext__())
+            now = time.monotonic()
+            if pending:
+                timeout = max(pending_since + window - now, 0.0)
+            else:
+                timeout = max(last_sent + keepalive_interval - now, 0.0)
+
+            done, _ = await asyncio.wait({next_event}, timeout=timeout)
+            if not done:
+                if pending:
+                    yield flush()
+                else:
+                    last_sent = time.monotonic()
+                    yield KEEPALIVE_FRAME
+                continue
+
+            task, next_event = next_event, None
+            try:
+                event_type, payload, event_id = task.result()
+            except StopAsyncIteration:
+                break
+
+            if event_type == "token":
+                if not pending:
+                    pending_since = time.monotonic()
+                text = payload.get("content", "")
+                pending.append(text)
+                pending_id = event_id
+                pending_bytes += len(text.encode())
+                if first_token or pending_bytes >= max_bytes or window <= 0:
+                    first_token = False
+                    yield flush()
+                continue
+
+            if pending:
+                yield flush()
+            last_sent = time.monotonic()
+            yield encode_event(event_type, payload, event_id)
+
+        if pending:
+            yield flush()
+    finally:
+        if next_event is not None:
+            next_event.cancel()
@@ -0,0 +1,255 @@
+"""
+Fan-out event streaming chat ke banyak subscriber.
+
+Satu produser (pipeline RAG) mem-publish event ke `StreamBroadcast`;
+setiap client SSE berlangganan dan menerima semua event dari awal
+(replay) lalu event baru secara live. Jika semua subscriber pergi
+sebelum stream selesai, produser dibatalkan (LLM berhenti ditagih)
+setelah masa tenggang singkat untuk reconnect.
+
+Setiap event punya nomor urut (1, 2, ...) dalam stream-nya; id SSE
+berbentuk `<stream_id>:<seq>`. Client yang terputus bisa melanjutkan
+dengan `Last-Event-ID` selama stream masih tersimpan di registry.
+Buffer event per stream dibatasi; stream yang sudah membuang event
+terlama tidak bisa diikuti atau di-resume lagi.
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Event = Tuple[str, Any]
+
+# Seberapa sering subscriber memeriksa apakah client masih terhubung (detik)
+_DISCONNECT_POLL_INTERVAL = 0.5
+
+
+class StreamBroadcast:
+    """Buffer event satu stream + notifikasi untuk semua subscriber."""
+
+    def __init__(self, resume_grace: float = 0.0, max_events: int = 0) -> None:
+        self.stream_id = uuid.uuid4().hex
+        # Hanya `max_events` event terbaru yang disimpan (0 = tanpa batas)
+        self._events: "deque[Event]" = deque(maxlen=max_events or None)
+        self._published = 0
+        self._done = False
+        self._changed = asyncio.Condition()
+        self._subscribers = 0
+        self._resume_grace = resume_grace
+        self._grace_timer: Optional[asyncio.TimerHandle] = None
+        self.abandoned = False
+        self.task: Optional[asyncio.Task] = None
+        # conversation_id yang gilirannya sudah disimpan dari stream ini;
+        # subscriber yang resume tidak menyimpan giliran yang sama lagi
+        self.recorded_sessions: Set[str] = set()
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def truncated(self) -> bool:
+        """Event awal sudah dibuang: replay dari awal tidak lagi lengkap."""
+        return self._published > len(self._events)
+
+    async def publish(self, event: Event) -> None:
+        async with self._changed:
+            self._events.append(event)
+            self._published += 1
+            self._changed.notify_all()
+
+    async def finish(self) -> None:
+        async with self._changed:
+            self._done = True
+            self._changed.notify_all()
+
+    async def _wait(self, index: int) -> Tuple[int, List[Event], bool]:
+        """
+        (index event pertama, event baru sejak `index`, selesai). Kosong jika
+        belum ada event dalam interval poll; subscriber yang tertinggal dari
+        buffer melompat ke event tertua yang masih tersimpan.
+        """
+        async with self._changed:
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: index < self._published or self._done),
+                    timeout=_DISCONNECT_POLL_INTERVAL,
+                )
+            except asyncio.TimeoutError:
+                pass
+            dropped = self._published - len(self._events)
+            start = max(index, dropped)
+            return start, list(islice(self._events, start - dropped, None)), self._done
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.stream_id}:{seq}"
+
+    async def subscribe(
+        self, is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> AsyncIterator[Tuple[int, Event]]:
+        """
+        `(seq, event)` untuk semua event sejak awal stream, lalu event baru
+        sampai stream selesai.
+
+        `is_disconnected` (mis. `request.is_disconnected`) diperiksa berkala;
+        subscription berakhir begitu client terputus.
+        """
+        index = 0
+        checked_at = time.monotonic()
+        self._subscribers += 1
+        if self._grace_timer is not None:
+            # Client reconnect dalam masa tenggang — produser tetap jalan
+            self._grace_timer.cancel()
+            self._grace_timer = None
+        try:
+            while True:
+                start, pending, done = await self._wait(index)
+                for offset, event in enumerate(pending, start + 1):
+                    yield offset, event
+                index = start + len(pending)
+                if done and index >= self._published:
+                    return
+                if is_disconnected is not None and (
+                    time.monotonic() - checked_at >= _DISCONNECT_POLL_INTERVAL
+                ):
+                    checked_at = time.monotonic()
+                    if await is_disconnected():
+                        logger.info("Client disconnected from stream")
+                        return
+        finally:
+            self._subscribers -= 1
+            if self._subscribers == 0 and not self._done:
+                if self._resume_grace > 0:
+                    self._grace_timer = asyncio.get_running_loop().call_later(
+                        self._resume_grace, self._abandon
+                    )
+                else:
+                    self._abandon()
+
+    def _abandon(self) -> None:
+        """Tidak ada lagi yang mendengarkan: batalkan produser."""
+        self._grace_timer = None
+        if self._subscribers > 0 or self._done:
+            return
+        self.abandoned = True
+        if self.task is not None and not self.task.done():
+            logger.info("All subscribers left, cancelling stream producer")
+            self.task.cancel()
+
+
+class BroadcastRegistry:
+    """
+    Stream yang sedang berjalan per kunci. Request dengan kunci sama
+    menempel ke stream yang ada (follower) alih-alih memulai pipeline baru.
+    """
+
+    def __init__(
+        self,
+        replay_size: int = 256,
+        replay_ttl: float = 300.0,
+        resume_grace: float = 0.0,
+        max_events: int = 4096,
+    ) -> None:
+        self._streams: Dict[Hashable, StreamBroadcast] = {}
+        # Stream terbaru per stream_id (berjalan maupun selesai) untuk resume
+        self._replay: "OrderedDict[str, Tuple[float, StreamBroadcast]]" = OrderedDict()
+        self._replay_size = replay_size
+        self._replay_ttl = replay_ttl
+        self._resume_grace = resume_grace
+        self._max_events = max_events
+        self.leaders = 0
+        self.followers = 0
+        self.aborted = 0
+        self.resumed = 0
+
+    def attach(
+        self,
+        key: Optional[Hashable],
+        producer: Callable[[], AsyncIterator[Event]],
+    ) -> StreamBroadcast:
+        """Stream untuk `key`; `producer` hanya dipanggil jika belum ada yang berjalan."""
+        if key is not None:
+            existing = self._streams.get(key)
+            # Stream yang sedang dibatalkan atau sudah membuang event awal
+            # tidak bisa diikuti dari awal
+            if existing is not None and not (existing.abandoned or existing.truncated):
+                self.followers += 1
+                logger.info("Coalesced stream onto in-flight broadcast")
+                return existing
+
+        self.leaders += 1
+        broadcast = StreamBroadcast(
+            resume_grace=self._resume_grace, max_events=self._max_events
+        )
+        if key is not None:
+            self._streams[key] = broadcast
+        self._remember(broadcast)
+        # Task terpisah dari request: leader yang disconnect tidak memutus follower
+        broadcast.task = asyncio.create_task(self._pump(key, broadcast, producer()))
+        return broadcast
+
+    def _remember(self, broadcast: StreamBroadcast) -> None:
+        if self._replay_size <= 0:
+            return
+        now = time.monotonic()
+        # Urutan sisip = urutan kedaluwarsa (TTL sama): buang dari depan
+        while self._replay and next(iter(self._replay.values()))[0] < now:
+            self._replay.popitem(last=False)
+        self._replay[broadcast.stream_id] = (now + self._replay_ttl, broadcast)
+        while len(self._replay) > self._replay_size:
+            self._replay.popitem(last=False)
+
+    def resume(self, last_event_id: str) -> Tuple[Optional[StreamBroadcast], int]:
+        """
+        Stream dan nomor event terakhir yang diterima client dari header
+        `Last-Event-ID` (`<stream_id>:<seq>`). `(None, 0)` jika stream sudah
+        kedaluwarsa, dibatalkan, atau id tidak valid.
+        """
+        stream_id, _, seq = last_event_id.strip().rpartition(":")
+        entry = self._replay.get(stream_id)
+        if entry is None or not seq.isdigit():
+            return None, 0
+        expires_at, broadcast = entry
+        if expires_at < time.monotonic() or broadcast.abandoned or broadcast.truncated:
+            del self._replay[stream_id]
+            return None, 0
+        self.resumed += 1
+        logger.info("Resuming stream %s after event %s", stream_id, seq)
+        return broadcast, int(seq)
+
+    async def _pump(
+        self, key: Optional[Hashable], broadcast: StreamBroadcast, source: AsyncIterator[Event]
+    ) -> None:
+        try:
+            # aclosing: saat dibatalkan, generator produser ditutup di sini
+            # (stream LLM ikut berhenti), bukan menunggu garbage collector
+            async with contextlib.aclosing(source) as events:
+                async for event in events:
+                    await broadcast.publish(event)
+        except asyncio.CancelledError:
+            self.aborted += 1
+            raise
+        except Exception as exc:
+            logger.exception("Error in broadcast producer")
+            await broadcast.publish(("error", str(exc)))
+        finally:
+            if key is not None and self._streams.get(key) is broadcast:
+                del self._streams[key]
+            await broadcast.finish()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._streams),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "aborted": self.aborted,
+            "resumed": self.resumed,
+            "replay_streams": len(self._replay),
+        }
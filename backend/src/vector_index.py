@@ -0,0 +1,100 @@
+"""Index vektor lokal berbasis NumPy — exact cosine top-k tanpa round-trip Qdrant."""
+
+import logging
+from typing import Any, Dict, List, NamedTuple, Sequence
+
+import numpy as np
+
+from .catalog import Catalog
+
+logger = logging.getLogger(__name__)
+
+
+class LocalHit(NamedTuple):
+    """Hasil pencarian lokal; atributnya kompatibel dengan `ScoredPoint`."""
+
+    id: Any
+    score: float
+    payload: dict
+
+
+class LocalVectorIndex:
+    """
+    Cosine similarity exact di atas seluruh katalog.
+
+    Vektor dinormalisasi sekali saat build, sehingga satu pencarian hanya
+    satu perkalian matriks-vektor (~709 x 1536 float32 ≈ 4 MB).
+    """
+
+    def __init__(self, catalog: Catalog) -> None:
+        if catalog.vectors is None:
+            raise ValueError("Catalog tidak memiliki vektor")
+
+        matrix = catalog.vectors.astype(np.float32, copy=True)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._matrix = matrix / norms
+
+        self._catalog = catalog
+        self._categories = [
+            str(p.get("kategori_makanan", "")).lower() for p in catalog.payloads
+        ]
+        self._category_masks: Dict[str, np.ndarray] = {}
+
+    @property
+    def catalog(self) -> Catalog:
+        return self._catalog
+
+    def __len__(self) -> int:
+        return len(self._catalog)
+
+    def _category_mask(self, category: str) -> np.ndarray:
+        """
+        Mask baris yang kategori_makanan-nya mengandung `category`.
+        Setara dengan `MatchText` Qdrant tanpa full-text index (substring match).
+        """
+        key = category.lower()
+        mask = self._category_masks.get(key)
+        if mask is None:
+            mask = np.fromiter((key in c for c in self._categories), dtype=bool, count=len(self._categories))
+            self._category_masks[key] = mask
+        return mask
+
+    def search(
+        self,
+        vector: Sequence[float],
+        top_k: int,
+        category_filter: str | None = None,
+        allowed: np.ndarray | None = None,
+    ) -> List[LocalHit]:
+        """
+        Top-k berdasarkan cosine similarity, diurutkan dari skor tertinggi.
+        `allowed` adalah mask boolean per baris katalog (mis. restoran yang buka).
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        scores = self._matrix @ query
+        candidates = np.arange(len(scores))
+        mask = allowed
+        if category_filter:
+            category_mask = self._category_mask(category_filter)
+            mask = category_mask if mask is None else mask & category_mask
+        if mask is not None:
+            candidates = candidates[mask]
+            scores = scores[candidates]
+
+        if len(candidates) == 0:
+            return []
+
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        catalog = self._catalog
+        return [
+            LocalHit(catalog.ids[candidates[i]], float(scores[i]), catalog.payloads[candidates[i]])
+            for i in top
+        ]
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Settings wajib diisi saat import; test tidak pernah memanggil layanan eksternal
+for _key in ("QDRANT_URL", "QDRANT_API_KEY", "OPENAI_API_KEY"):
+    os.environ.setdefault(_key, "http://stub" if _key == "QDRANT_URL" else "stub")
+
+from src.config import get_settings  # noqa: E402
+from src.qdrant_store import QdrantStore  # noqa: E402
+from src.rag_service import RAGService  # noqa: E402
+from src.lexical_index import tokenize  # noqa: E402
+from src.pricing import parse_price_range  # noqa: E402
+
+_VECTOR_DIM = 64
+
+
+def restaurant(name: str, **fields) -> dict:
+    """Payload restoran minimal; default buka 24 jam setiap hari."""
+    payload = {
+        "nama_tempat": name,
+        "kategori_makanan": "Bakso",
+        "range_harga": "15 - 25 K",
+        "lokasi": "Samarinda",
+        "jam_buka": "24 Jam",
+        "jam_tutup": "24 Jam",
+        "hari_operasional": "Setiap Hari",
+        "menu_andalan": [],
+        "fasilitas": [],
+        "ringkasan": "",
+        **fields,
+    }
+    # Seperti ingest: harga termurah numerik untuk filter budget
+    payload.setdefault("harga_min", (parse_price_range(payload["range_harga"]) or (None,))[0])
+    return payload
+
+
+def embed(text: str) -> list:
+    """Embedding deterministik: bag-of-words di-hash ke vektor kecil."""
+    vector = np.zeros(_VECTOR_DIM, dtype=np.float32)
+    for token in tokenize(text):
+        vector[int(hashlib.md5(token.encode()).hexdigest(), 16) % _VECTOR_DIM] += 1.0
+    return vector.tolist()
+
+
+class StubEmbeddings:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def aembed_query(self, text: str) -> list:
+        self.calls += 1
+        return embed(text)
+
+
+class StubLLM:
+    """LLM stub: `reply` untuk setiap panggilan, pesan terakhir dicatat."""
+
+    def __init__(self, reply: str = "Rekomendasi stub") -> None:
+        self.reply = reply
+        self.calls = 0
+        self.messages = None
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        self.messages = messages
+        return SimpleNamespace(content=self.reply, usage_metadata=None)
+
+    async def astream(self, messages):
+        self.calls += 1
+        self.messages = messages
+        for word in self.reply.split(" "):
+            yield SimpleNamespace(content=word + " ", usage_metadata=None)
+
+
+def _points(restaurants: list) -> list:
+    return [
+        SimpleNamespace(id=i, score=0.9 - i * 0.001, payload=payload, vector=embed(payload["nama_tempat"]))
+        for i, payload in enumerate(restaurants)
+    ]
+
+
+def _matches(point, query_filter) -> bool:
+    """Evaluasi kondisi kategori & budget; kondisi lain (jam buka) dianggap lolos."""
+    for condition in getattr(query_filter, "must", None) or []:
+        key = getattr(condition, "key", None)
+        if key == "kategori_makanan":
+            wanted = condition.match.text.lower()
+            if wanted not in str(point.payload.get("kategori_makanan", "")).lower():
+                return False
+        elif key == "harga_min":
+            price = point.payload.get("harga_min")
+            if price is None or price > condition.range.lte:
+                return False
+    return True
+
+
+class StubQdrant:
+    """Client sync: metadata koleksi dan scroll katalog."""
+
+    def __init__(self, restaurants: list) -> None:
+        self.restaurants = restaurants
+        self.scrolls = 0
+
+    def get_collection(self, name):
+        return SimpleNamespace(
+            points_count=len(self.restaurants), payload_schema={}, config="stub"
+        )
+
+    def scroll(self, **kwargs):
+        self.scrolls += 1
+        return _points(self.restaurants), None
+
+    def close(self):
+        pass
+
+
+class StubAsyncQdrant:
+    """
+    Client async: setiap request batch mengembalikan katalog (urutan tetap)
+    yang lolos filter. `fail` membuat search gagal seperti Qdrant down.
+    """
+
+    def __init__(self, restaurants: list) -> None:
+        self.restaurants = restaurants
+        self.batches = []
+        self.fail = False
+
+    async def query_batch_points(self, collection_name, requests):
+        if self.fail:
+            raise ConnectionError("qdrant down")
+        self.batches.append(requests)
+        return [
+            SimpleNamespace(
+                points=[p for p in _points(self.restaurants) if _matches(p, r.filter)][: r.limit]
+            )
+            for r in requests
+        ]
+
+    async def get_collections(self):
+        return SimpleNamespace(collections=[])
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    """Settings singleton; ubah via `settings.<field> = ...`, dipulihkan setelah test."""
+    current = get_settings()
+    for field in type(current).model_fields:
+        monkeypatch.setattr(current, field, getattr(current, field))
+    return current
+
+
+@pytest.fixture
+def make_service(settings):
+    """RAGService dengan embedding, LLM, dan Qdrant stub di atas `restaurants`."""
+
+    def factory(restaurants: list) -> RAGService:
+        store = QdrantStore("stub", StubQdrant(restaurants), StubAsyncQdrant(restaurants))
+
+        class StubRAGService(RAGService):
+            _init_embeddings = staticmethod(StubEmbeddings)
+            _init_llm = staticmethod(StubLLM)
+            _init_compact_llm = staticmethod(StubLLM)
+            _init_compression_llm = staticmethod(StubLLM)
+
+            @staticmethod
+            def _init_store():
+                store.refresh_metadata()
+                return store
+
+        return StubRAGService()
+
+    return factory
@@ -0,0 +1,61 @@
+import json
+
+from conftest import restaurant
+from src.answer_renderer import Pick, parse_compact_answer, render_answer
+
+CANDIDATES = [restaurant(f"Tempat {i}") for i in range(1, 6)]
+
+
+def answer(*numbers) -> str:
+    return json.dumps({"pilihan": [{"no": n, "alasan": f"alasan {n}"} for n in numbers]})
+
+
+def picked(picks) -> list:
+    return [pick.resto["nama_tempat"] for pick in picks]
+
+
+def test_picks_follow_llm_order_with_reasons():
+    picks = parse_compact_answer(answer(3, 1), CANDIDATES, 2)
+    assert picked(picks) == ["Tempat 3", "Tempat 1"]
+    assert [pick.reason for pick in picks] == ["alasan 3", "alasan 1"]
+
+
+def test_out_of_range_and_duplicate_numbers_are_dropped():
+    picks = parse_compact_answer(answer(9, 2, 2, 0, "x"), CANDIDATES, 2)
+    # Hanya "2" yang sah; sisanya diisi dari urutan kandidat
+    assert picked(picks) == ["Tempat 2", "Tempat 1"]
+    assert picks[1].reason == ""
+
+
+def test_extra_picks_are_cut_to_requested_count():
+    assert picked(parse_compact_answer(answer(5, 4, 3), CANDIDATES, 2)) == ["Tempat 5", "Tempat 4"]
+
+
+def test_invalid_json_falls_back_to_ranking_order():
+    picks = parse_compact_answer("Maaf, berikut rekomendasinya", CANDIDATES, 3)
+    assert picked(picks) == ["Tempat 1", "Tempat 2", "Tempat 3"]
+
+
+def test_bare_list_is_accepted():
+    picks = parse_compact_answer(json.dumps([{"no": 4, "alasan": "enak"}]), CANDIDATES, 1)
+    assert picked(picks) == ["Tempat 4"]
+
+
+def test_render_answer_numbers_picks_with_details():
+    resto = restaurant(
+        "Bakso Pak Kumis",
+        menu_andalan=["bakso urat", "bakso telur", "mie", "es teh"],
+        status_operasional="Buka",
+    )
+    text = render_answer([Pick(resto, "Kuahnya gurih")], "makan siang", False)
+    lines = text.split("\n")
+    assert lines[0].startswith("Waktunya makan siang")
+    assert "**1. Bakso Pak Kumis**" in lines
+    assert "Kuahnya gurih. Menu andalan: bakso urat, bakso telur, mie." in text
+    assert "Harga 15 - 25 K." in text
+    assert "Status: Buka (jam 24 Jam–24 Jam)." in text
+
+
+def test_render_answer_future_greeting():
+    text = render_answer([Pick(CANDIDATES[0], "")], "besok pagi", True)
+    assert text.startswith("Untuk besok pagi,")
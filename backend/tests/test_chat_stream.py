@@ -0,0 +1,49 @@
+import asyncio
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import restaurant
+from src import main
+
+CATALOG = [restaurant(f"Bakso {i}") for i in range(5)]
+
+
+@pytest.fixture
+def client(make_service, monkeypatch):
+    monkeypatch.setattr(main, "rag_service", make_service(CATALOG))
+    # Tanpa lifespan: RAGService asli tidak dibuat
+    return TestClient(main.app)
+
+
+def events(response) -> list:
+    """(id, event, data) untuk setiap frame SSE."""
+    parsed = []
+    for frame in response.text.split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in frame.splitlines() if not line.startswith(":")
+        )
+        if "event" in fields:
+            parsed.append((fields.get("id"), fields["event"], orjson.loads(fields["data"])))
+    return parsed
+
+
+def test_resumed_stream_records_turn_once(client):
+    first = events(client.post("/chat/stream", json={"message": "rekomendasi bakso"}))
+    first_id = first[0][0]
+    conversation_id = first[-1][2]["conversation_id"]
+
+    resumed = events(
+        client.post(
+            "/chat/stream",
+            json={"message": "rekomendasi bakso", "conversation_id": conversation_id},
+            headers={"Last-Event-ID": first_id},
+        )
+    )
+    assert resumed[-1][1] == "done"
+    # Event setelah Last-Event-ID saja, dari stream yang sama
+    assert [frame_id for frame_id, _, _ in resumed] == [frame_id for frame_id, _, _ in first[1:]]
+
+    session = asyncio.run(main.session_store.load(conversation_id, []))
+    assert [m["role"] for m in session.history] == ["user", "assistant"]
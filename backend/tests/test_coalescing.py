@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from src.coalescing import SingleFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "hasil"
+
+    async def run():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.run("k", compute) for _ in range(5)))
+        return flights, results
+
+    flights, results = asyncio.run(run())
+    assert results == ["hasil"] * 5
+    assert calls == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "followers": 4}
+
+
+def test_key_is_released_after_completion():
+    async def run():
+        flights = SingleFlight()
+        first = await flights.run("k", lambda: asyncio.sleep(0, "a"))
+        second = await flights.run("k", lambda: asyncio.sleep(0, "b"))
+        return first, second, flights.leaders
+
+    assert asyncio.run(run()) == ("a", "b", 2)
+
+
+def test_none_key_is_not_coalesced():
+    async def run():
+        flights = SingleFlight()
+        await asyncio.gather(*(flights.run(None, lambda: asyncio.sleep(0)) for _ in range(3)))
+        return flights.stats()
+
+    assert asyncio.run(run())["leaders"] == 0
+
+
+def test_errors_reach_every_waiter():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream")
+
+    async def run():
+        flights = SingleFlight()
+        return await asyncio.gather(
+            *(flights.run("k", fail) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    async def run():
+        flights = SingleFlight()
+        leader = asyncio.create_task(flights.run("k", lambda: asyncio.sleep(0.05, "ok")))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.run("k", lambda: asyncio.sleep(0, "x")))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(run()) == "ok"
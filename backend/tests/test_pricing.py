@@ -0,0 +1,34 @@
+import pytest
+
+from src.pricing import parse_price_range, to_rupiah
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Rp 20.000 - Rp 50.000", (20_000, 50_000)),
+        ("15 - 25 K", (15_000, 25_000)),
+        ("20-50 ribu", (20_000, 50_000)),
+        ("50rb", (50_000, 50_000)),
+        ("1,5 jt", (1_500_000, 1_500_000)),
+        ("< Rp 25.000", (0, 25_000)),
+        ("di bawah 30k", (0, 30_000)),
+        ("> 100K", (100_000, None)),
+        ("mulai 15 ribu", (15_000, None)),
+    ],
+)
+def test_parse_price_range(text, expected):
+    assert parse_price_range(text) == expected
+
+
+@pytest.mark.parametrize("text", [None, "", "Unknown", "gratis", "0"])
+def test_parse_price_range_without_amount(text):
+    assert parse_price_range(text) is None
+
+
+def test_to_rupiah():
+    assert to_rupiah("20.000", None) == 20_000
+    assert to_rupiah("20", None) == 20_000
+    assert to_rupiah("25000", None) == 25_000
+    assert to_rupiah("1,5", "jt") == 1_500_000
+    assert to_rupiah("30", "k") == 30_000
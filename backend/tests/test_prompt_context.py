@@ -0,0 +1,68 @@
+import pytest
+
+from conftest import restaurant
+from src.prompt_context import TokenCounter, build_context, trim_history
+
+
+@pytest.fixture(scope="module")
+def counter():
+    return TokenCounter("gpt-4o-mini")
+
+
+def candidates(count: int, open_count: int) -> list:
+    return [
+        restaurant(
+            f"Tempat {i}",
+            status_operasional="Buka" if i < open_count else "Tutup (buka 17:00)",
+            menu_andalan=["bakso urat", "bakso telur", "mie", "es teh"],
+            fasilitas=["Parkir", "WiFi", "Mushola", "AC", "Toilet", "Outdoor", "Smoking area"],
+            ringkasan="Tempat makan legendaris dengan kuah kaldu sapi yang gurih. " * 20,
+        )
+        for i in range(count)
+    ]
+
+
+def test_context_stays_within_budget_and_keeps_every_header(counter):
+    restaurants = candidates(8, open_count=5)
+    text, tokens = build_context(restaurants, counter, budget=600)
+    assert tokens <= 600
+    assert counter.count(text) <= 600 + len(restaurants)  # pemisah antar entri
+    for i, resto in enumerate(restaurants, 1):
+        assert f"{i}. {resto['nama_tempat']}" in text
+
+
+def test_closed_places_get_no_details(counter):
+    restaurants = candidates(3, open_count=1)
+    text, _ = build_context(restaurants, counter, budget=2000)
+    entries = text.split("\n\n")
+    assert "Menu" in entries[0]
+    assert all("Menu" not in entry and "Deskripsi" not in entry for entry in entries[1:])
+
+
+def test_higher_ranked_places_get_more_detail(counter):
+    restaurants = candidates(4, open_count=4)
+    text, _ = build_context(restaurants, counter, budget=700)
+    entries = text.split("\n\n")
+    assert counter.count(entries[0]) >= counter.count(entries[-1])
+
+
+def test_header_only_when_budget_is_exhausted(counter):
+    restaurants = candidates(3, open_count=3)
+    text, _ = build_context(restaurants, counter, budget=10)
+    assert "Menu" not in text
+    assert text.count("Kategori") == 3
+
+
+def test_trim_history_keeps_latest_messages_in_order(counter):
+    history = [{"role": "user", "content": f"pesan nomor {i}"} for i in range(10)]
+    kept = trim_history(history, counter, budget=30)
+    assert kept and kept == history[-len(kept):]
+    assert len(kept) < len(history)
+
+
+def test_trim_history_truncates_single_long_message(counter):
+    history = [{"role": "assistant", "content": "rekomendasi panjang sekali " * 200}]
+    kept = trim_history(history, counter, budget=50)
+    assert len(kept) == 1
+    assert kept[0]["content"].endswith("…")
+    assert counter.count(kept[0]["content"]) <= 50
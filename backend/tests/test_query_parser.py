@@ -0,0 +1,130 @@
+from datetime import datetime
+
+import pytest
+
+from src.query_parser import QueryParser
+
+# Senin, 10:00 WITA
+NOW = datetime(2026, 10, 19, 10, 0)
+
+
+@pytest.fixture(scope="module")
+def parser():
+    return QueryParser(
+        extra_categories=["Bakso, Mie Ayam", "Seafood"],
+        dishes=["Nasi Goreng Spesial", "Es Teler"],
+        places=["Warung Sotowijaya", "Bakso Pak Kumis"],
+    )
+
+
+def test_count_and_category(parser):
+    parsed = parser.parse("rekomendasi 3 bakso enak", NOW)
+    assert parsed.count == 3
+    assert parsed.category == "Bakso"
+
+    parsed = parser.parse("kasih lima tempat mie ayam", NOW)
+    assert parsed.count == 5
+    assert parsed.category == "Mie Ayam"
+
+
+def test_price_and_clock_are_not_counts(parser):
+    parsed = parser.parse("bakso di bawah 20 ribu", NOW)
+    assert parsed.max_price == 20_000
+    assert parsed.count is None
+
+    parsed = parser.parse("soto jam 7", NOW)
+    assert parsed.count is None
+    assert parsed.future == (datetime(2026, 10, 20, 7, 0), "jam 7 (sarapan)")
+
+
+def test_future_time(parser):
+    target, label = parser.parse("sarapan bubur besok pagi", NOW).future
+    assert (target, label) == (datetime(2026, 10, 20, 8, 0), "sarapan besok")
+
+    target, label = parser.parse("makan apa nanti malam", NOW).future
+    assert (target, label) == (datetime(2026, 10, 19, 19, 0), "malam ini")
+
+
+def test_dish_and_place(parser):
+    assert parser.parse("cari es teler yang seger", NOW).dish == "es teler"
+    # Menu yang juga kategori dikenali sebagai kategori
+    assert parser.parse("cari nasi goreng spesial", NOW).category == "Nasi Goreng"
+    parsed = parser.parse("warung sotowijaya buka jam berapa", NOW)
+    assert parsed.place == "warung sotowijaya"
+    assert parsed.is_standalone
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "rekomendasi mie ayam enak di samarinda",
+        "tempat nongkrong enak buat kerja sampai malam",
+        "seafood yang lebih murah",
+    ],
+)
+def test_standalone_queries(parser, text):
+    parsed = parser.parse(text, NOW)
+    assert parsed.is_standalone
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["harganya berapa", "yang tadi itu di mana", "kalau yang itu gimana"],
+)
+def test_anaphora_needs_history(parser, text):
+    parsed = parser.parse(text, NOW)
+    assert parsed.anaphora
+    assert not parsed.is_standalone
+
+
+def test_short_query_without_subject_is_elliptical(parser):
+    assert not parser.parse("3 aja", NOW).is_standalone
+
+
+
+def test_refinement_cheaper(parser):
+    parsed = parser.parse("yang lebih murah dong", NOW)
+    assert parsed.cheaper
+    assert parsed.is_refinement
+
+
+def test_refinement_more(parser):
+    parsed = parser.parse("tambah 3 lagi", NOW)
+    assert parsed.more
+    assert parsed.count == 3
+    assert parsed.is_refinement
+
+
+def test_refinement_filters(parser):
+    parsed = parser.parse("yang buka sekarang", NOW)
+    assert parsed.open_now and parsed.is_refinement
+
+    parsed = parser.parse("ada wifi sama parkir?", NOW)
+    assert parsed.facilities == ["wifi", "parkir"]
+    assert parsed.is_refinement
+
+    parsed = parser.parse("yang tadi di bawah 20rb", NOW)
+    assert parsed.max_price == 20_000
+    assert parsed.is_refinement
+
+
+def test_lagi_buka_is_open_now_not_more(parser):
+    parsed = parser.parse("yg lagi buka", NOW)
+    assert parsed.open_now
+    assert not parsed.more
+
+
+def test_future_time_is_not_a_refinement(parser):
+    parsed = parser.parse("yang buka besok pagi", NOW)
+    assert parsed.future is not None
+    assert not parsed.is_refinement
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["seafood yang lebih murah", "harganya berapa", "yang tadi itu di mana"],
+)
+def test_new_subject_or_plain_follow_up_is_not_a_refinement(parser, text):
+    # Subjek baru butuh retrieval; pertanyaan lanjutan tanpa batasan baru
+    # tidak menyaring pool kandidat
+    assert not parser.parse(text, NOW).is_refinement
@@ -0,0 +1,336 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from conftest import restaurant
+from src.rag_service import RAGService
+from src.session_store import Session, TurnState
+from src.vector_index import LocalHit
+
+CATALOG = [
+    restaurant("Bakso Pak Kumis", ringkasan="bakso urat kuah bening"),
+    restaurant("Bakso Mercon", ringkasan="bakso pedas level"),
+    restaurant("Warung Sotowijaya", kategori_makanan="Soto", ringkasan="soto banjar"),
+    restaurant("Mie Ayam Jago", kategori_makanan="Mie Ayam", ringkasan="mie ayam pangsit"),
+    restaurant("Depot Sate Mahmud", kategori_makanan="Sate", range_harga="40 - 60 K"),
+]
+
+
+def names(results) -> list:
+    return [r["nama_tempat"] for r in results]
+
+
+def test_fuse_rankings_prefers_documents_in_both_lists():
+    dense = [LocalHit(i, 1.0, {"nama_tempat": name}) for i, name in enumerate("ABC")]
+    lexical = [LocalHit(2, 5.0, {"nama_tempat": "C"}), LocalHit(3, 4.0, {"nama_tempat": "D"})]
+    fused = RAGService._fuse_rankings(dense, lexical, top_k=4)
+    # C: 1/63 + 1/61; A: 1/61; B dan D sama-sama 1/62 (urutan kemunculan)
+    assert names(fused) == ["C", "A", "B", "D"]
+
+
+def test_fuse_rankings_without_lexical_hits_keeps_dense_order():
+    dense = [LocalHit(i, 1.0, {"nama_tempat": name}) for i, name in enumerate("ABC")]
+    assert names(RAGService._fuse_rankings(dense, [], top_k=2)) == ["A", "B"]
+
+
+def test_hybrid_retrieval_fuses_bm25_with_vector_hits(make_service):
+    service = make_service(CATALOG)
+    results = asyncio.run(service._aretrieve("mie ayam pangsit", top_k=5))
+    # Vektor stub mengembalikan urutan katalog (Mie Ayam Jago ke-4); BM25 mengangkatnya
+    assert names(results)[0] == "Mie Ayam Jago"
+    assert service._embeddings.calls == 1
+
+
+def test_exact_place_name_skips_vector_search(make_service):
+    service = make_service(CATALOG)
+    results = asyncio.run(service._aretrieve("warung sotowijaya buka jam berapa", top_k=3))
+    assert names(results)[0] == "Warung Sotowijaya"
+    assert service._embeddings.calls == 0
+    assert service._store.aclient.batches == []
+    assert service._counters["lexical_short_circuit"] == 1
+
+
+def test_exact_place_name_respects_stage_filters(make_service):
+    service = make_service(CATALOG)
+    # Tempat yang disebut tidak lolos filter kategori / budget: retrieval biasa
+    asyncio.run(service._aretrieve("warung sotowijaya", top_k=3, category_filter="Bakso"))
+    asyncio.run(service._aretrieve("depot sate mahmud", top_k=3, max_price=30_000))
+    assert service._counters["lexical_short_circuit"] == 0
+    assert service._embeddings.calls == 2
+
+
+def test_retrieval_stages_relax_category_before_time_and_budget():
+    open_at = datetime(2026, 10, 19, 10, 0)
+    stages = RAGService._retrieval_stages("Bakso", open_at, 30_000)
+    assert [(s.category, s.open_at, s.max_price) for s in stages] == [
+        ("Bakso", open_at, 30_000),
+        (None, open_at, 30_000),
+        (None, None, None),
+    ]
+    assert len(RAGService._retrieval_stages(None, None, None)) == 1
+
+
+def test_staged_filters_use_one_batch_and_keep_strict_hits_first(make_service, settings):
+    settings.lexical_index_enabled = False
+    service = make_service(CATALOG)
+    results = asyncio.run(service._aretrieve("soto", top_k=3, category_filter="Soto"))
+    batches = service._store.aclient.batches
+    assert len(batches) == 1 and len(batches[0]) == 2
+    # Hanya satu Soto: sisanya diisi dari tahap tanpa kategori, tanpa duplikat
+    assert names(results) == ["Warung Sotowijaya", "Bakso Pak Kumis", "Bakso Mercon"]
+    assert service._counters["retrieval_fallback"] == 1
+
+
+def test_staged_budget_filter_kept_when_enough_results(make_service, settings):
+    settings.lexical_index_enabled = False
+    service = make_service(CATALOG)
+    results = asyncio.run(service._aretrieve("makan", top_k=5, max_price=30_000))
+    assert "Depot Sate Mahmud" not in names(results)
+    assert service._counters["retrieval_fallback"] == 0
+
+
+def test_retrieval_cache_hit_skips_embedding_and_qdrant(make_service, settings):
+    settings.lexical_index_enabled = False
+    service = make_service(CATALOG)
+    first = asyncio.run(service._aretrieve("bakso urat", top_k=3))
+    second = asyncio.run(service._aretrieve("  Bakso   URAT ", top_k=3))
+    assert names(first) == names(second)
+    assert service._embeddings.calls == 1
+    assert len(service._store.aclient.batches) == 1
+
+
+def test_retrieval_cache_invalidated_by_collection_version(make_service, settings):
+    settings.lexical_index_enabled = False
+    restaurants = list(CATALOG)
+    service = make_service(restaurants)
+    asyncio.run(service._aretrieve("bakso urat", top_k=3))
+    restaurants.append(restaurant("Bakso Baru"))
+    service._store.refresh_metadata()
+    asyncio.run(service._aretrieve("bakso urat", top_k=3))
+    assert len(service._store.aclient.batches) == 2
+
+
+def test_degraded_lexical_results_are_not_cached(make_service):
+    service = make_service(CATALOG)
+    service._store.aclient.fail = True
+    degraded = asyncio.run(service._aretrieve("bakso pedas", top_k=3))
+    assert names(degraded)[0] == "Bakso Mercon"
+    assert service._counters["retrieval_degraded"] == 1
+
+    # Qdrant pulih: request berikutnya mencoba pencarian vektor lagi
+    service._store.aclient.fail = False
+    asyncio.run(service._aretrieve("bakso pedas", top_k=3))
+    assert len(service._store.aclient.batches) == 1
+
+
+def test_response_cache_key_skips_history_and_future_turns(make_service, settings):
+    settings.response_cache_enabled = True
+    service = make_service(CATALOG)
+    turn = service._plan_turn("rekomendasi bakso")
+    assert service._response_cache_key(turn, []) is not None
+    assert service._response_cache_key(turn, [{"role": "user", "content": "halo"}]) is None
+    assert service._response_cache_key(service._plan_turn("bakso besok jam 7 pagi"), []) is None
+
+
+def test_semantic_response_cache_hit_skips_llm(make_service, settings):
+    settings.response_cache_enabled = True
+    service = make_service(CATALOG)
+    first_text, first_cards, _ = asyncio.run(service.agenerate_turn("rekomendasi bakso", []))
+    text, cards, state = asyncio.run(service.agenerate_turn("Rekomendasi  bakso", []))
+    assert service._answer_llm.calls == 1
+    assert text == first_text
+    assert [c.nama_tempat for c in cards] == [c.nama_tempat for c in first_cards]
+    # Pool kandidat tetap tersimpan di state sesi untuk refinement berikutnya
+    assert state.candidates
+
+
+def test_response_cache_invalidated_by_collection_version(make_service, settings):
+    settings.response_cache_enabled = True
+    restaurants = list(CATALOG)
+    service = make_service(restaurants)
+    asyncio.run(service.agenerate_turn("rekomendasi bakso", []))
+    restaurants.append(restaurant("Bakso Baru"))
+    service._store.refresh_metadata()
+    asyncio.run(service.agenerate_turn("rekomendasi bakso", []))
+    assert service._answer_llm.calls == 2
+
+
+class ClosingLLM:
+    """LLM stream tanpa akhir yang mencatat kapan generator-nya ditutup."""
+
+    def __init__(self) -> None:
+        self.closed = False
+
+    async def astream(self, messages):
+        try:
+            while True:
+                await asyncio.sleep(0.001)
+                yield SimpleNamespace(content="token ", usage_metadata=None)
+        finally:
+            self.closed = True
+
+
+def test_cancelled_stream_closes_llm_stream(make_service):
+    service = make_service(CATALOG)
+    llm = service._answer_llm = ClosingLLM()
+
+    async def run():
+        first_token = asyncio.Event()
+
+        async def consume():
+            async for kind, _ in service.agenerate_response_stream("rekomendasi bakso", []):
+                if kind == "token":
+                    first_token.set()
+
+        task = asyncio.create_task(consume())
+        await first_token.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    assert llm.closed
+    assert service._counters["stream_aborted"] == 1
+
+
+POOL = [
+    restaurant("Sate A", range_harga="40 - 60 K"),
+    restaurant("Sate B", range_harga="30 - 40 K", fasilitas=["WiFi", "Parkir"]),
+    restaurant("Sate C", range_harga="15 - 25 K", jam_buka="Unknown", jam_tutup="Unknown"),
+    restaurant("Sate D", range_harga="10 - 15 K", fasilitas=["Wifi gratis"]),
+    restaurant("Sate E", range_harga="20 - 30 K", fasilitas=["Parkir luas", "WiFi"]),
+    restaurant("Sate F", range_harga="25 - 35 K", jam_buka="Unknown", jam_tutup="Unknown"),
+]
+
+
+def session_after(pool: list, shown: list, query: str = "sate") -> Session:
+    session = Session(conversation_id="c")
+    session.record_turn(query, "jawab", TurnState(query, pool), shown)
+    return session
+
+
+def refine(service, query: str, session: Session):
+    history = [{"role": "user", "content": session.last_query}]
+    turn = service._plan_turn(query)
+    return asyncio.run(service._aresolve_turn(turn, query, history, session))
+
+
+def test_cheaper_refinement_reuses_pool_without_retrieval(make_service):
+    service = make_service(CATALOG)
+    state, refined = refine(service, "yang lebih murah dong", session_after(POOL, ["Sate A", "Sate B"]))
+    # Di bawah median yang sudah tampil (35 K), termurah lebih dulu
+    assert names(refined) == ["Sate D", "Sate C", "Sate E", "Sate F", "Sate B"]
+    assert state.candidates is POOL and state.shown == ("Sate A", "Sate B")
+    assert service._embeddings.calls == 0
+    assert service._store.aclient.batches == []
+    assert service._counters["refinement_local"] == 1
+
+
+def test_more_refinement_skips_already_shown(make_service):
+    service = make_service(CATALOG)
+    _, refined = refine(service, "tambah 3 lagi", session_after(POOL, ["Sate A", "Sate B", "Sate C"]))
+    assert names(refined) == ["Sate D", "Sate E", "Sate F"]
+    assert service._embeddings.calls == 0
+
+
+def test_open_now_and_facility_refinements_filter_pool(make_service):
+    service = make_service(CATALOG)
+    _, open_now = refine(service, "yang buka sekarang", session_after(POOL, ["Sate A"]))
+    assert names(open_now) == ["Sate A", "Sate B", "Sate D", "Sate E"]
+    _, with_wifi = refine(service, "ada wifi?", session_after(POOL, ["Sate A"]))
+    assert names(with_wifi) == ["Sate B", "Sate D", "Sate E"]
+    assert service._embeddings.calls == 0
+
+
+def test_exhausted_more_falls_back_to_retrieval_without_shown(make_service):
+    service = make_service(CATALOG)
+    shown = ["Bakso Pak Kumis", "Bakso Mercon", "Warung Sotowijaya"]
+    session = session_after(CATALOG[:4], shown, query="bakso")
+    state, fresh = refine(service, "tambah 3 lagi", session)
+    assert service._counters["refinement_fallback"] == 1
+    assert service._embeddings.calls >= 1
+    assert fresh and not set(names(fresh)) & set(shown)
+    assert state.shown == tuple(shown)
+
+
+def resolve_follow_up(service, previous: str, query: str, compressed: str):
+    service._compression_llm.reply = compressed
+    turn = service._plan_turn(query)
+    history = [{"role": "user", "content": previous}]
+    return asyncio.run(service._aresolve_and_retrieve(turn, query, history))
+
+
+def test_speculation_skipped_when_context_category_differs(make_service):
+    service = make_service(CATALOG)
+    retrieval_query, _ = resolve_follow_up(
+        service, "rekomendasi soto", "harganya berapa", "harga soto banjar"
+    )
+    assert retrieval_query == "harga soto banjar"
+    # Hanya retrieval untuk query hasil compression
+    assert service._embeddings.calls == 1
+    assert len(service._store.aclient.batches) == 1
+    assert service.get_stats()["query_compression"]["speculation"]["skipped"] == 1
+
+
+def test_speculation_hit_reuses_raw_query_retrieval(make_service):
+    service = make_service(CATALOG)
+    resolve_follow_up(
+        service, "tempat nongkrong buat kerja", "yang tadi itu di mana", "yang tadi itu di mana ya"
+    )
+    assert service._embeddings.calls == 1
+    speculation = service.get_stats()["query_compression"]["speculation"]
+    assert (speculation["hit"], speculation["miss"], speculation["hit_rate"]) == (1, 0, 1.0)
+
+
+def test_speculation_miss_retrieves_compressed_query(make_service):
+    service = make_service(CATALOG)
+    resolve_follow_up(
+        service, "tempat nongkrong buat kerja", "yang tadi itu di mana", "soto banjar kuah bening"
+    )
+    speculation = service.get_stats()["query_compression"]["speculation"]
+    assert (speculation["hit"], speculation["miss"], speculation["hit_rate"]) == (0, 1, 0.0)
+
+
+def test_prompt_stats_report_cache_hit_ratio(make_service):
+    service = make_service(CATALOG)
+    assert service.get_stats()["prompt"]["cache_hit_ratio"] == 0.0
+    service._record_usage(
+        {"input_tokens": 1000, "output_tokens": 10, "input_token_details": {"cache_read": 400}}, 0.5
+    )
+    service._record_usage({"input_tokens": 1000, "output_tokens": 10}, 0.8)
+    prompt = service.get_stats()["prompt"]
+    assert prompt["cache_hit_ratio"] == 0.2
+    assert prompt["prompt_cache_eligible"] is False
+
+
+def test_cheaper_candidate_pool_keeps_price_order_within_status(make_service):
+    service = make_service(CATALOG)
+    turn = service._plan_turn("yang lebih murah dong")
+    # Urutan hasil retrieval (fallback) bukan urutan harga
+    by_name = {r["nama_tempat"]: r for r in POOL}
+    raw = [by_name[name] for name in ("Sate A", "Sate F", "Sate D", "Sate C", "Sate B")]
+    pool = service._candidate_pool(turn, raw)
+    assert names(pool) == ["Sate D", "Sate B", "Sate A", "Sate C", "Sate F"]
+
+    _, refined = refine(service, "yang lebih murah dong", session_after(POOL, ["Sate A", "Sate B"]))
+    assert names(service._candidate_pool(turn, refined)) == [
+        "Sate D", "Sate E", "Sate B", "Sate C", "Sate F"
+    ]
+
+
+def test_refresh_catalog_skips_unchanged_collection(make_service):
+    restaurants = list(CATALOG)
+    service = make_service(restaurants)
+    client = service._store.client
+    indexes = service._indexes
+    service.refresh_catalog()
+    assert client.scrolls == 1
+    assert service._indexes is indexes
+
+    restaurants.append(restaurant("Bakso Baru"))
+    service._store.refresh_metadata()
+    service.refresh_catalog()
+    assert client.scrolls == 2
+    # Parser & index baru dipublikasikan bersama
+    assert service._indexes is not indexes
+    assert len(service._lexical_index) == len(restaurants)
+    assert service._query_parser.parse("bakso baru").place == "bakso baru"
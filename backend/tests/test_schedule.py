@@ -0,0 +1,103 @@
+from datetime import datetime
+
+import pytest
+
+from src.schedule import (
+    MINUTES_PER_DAY,
+    MINUTES_PER_WEEK,
+    WeeklyScheduleIndex,
+    parse_operating_days,
+    weekly_intervals,
+)
+
+# 2026-10-19 adalah Senin
+MONDAY = datetime(2026, 10, 19)
+
+
+def at(day: int, hour: int, minute: int = 0) -> datetime:
+    """Waktu pada hari ke-`day` minggu ini (0 = Senin)."""
+    return MONDAY.replace(day=MONDAY.day + day, hour=hour, minute=minute)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("Setiap Hari", set(range(7))),
+        ("Weekday", {0, 1, 2, 3, 4}),
+        ("Senin-Jumat", {0, 1, 2, 3, 4}),
+        ("Jumat - Selasa", {4, 5, 6, 0, 1}),
+        ("Senin, Rabu, Jumat", {0, 2, 4}),
+        ("Setiap hari kecuali Senin", {1, 2, 3, 4, 5, 6}),
+        (["Saturday", "Sunday"], {5, 6}),
+        ("Unknown", None),
+        ("", None),
+    ],
+)
+def test_parse_operating_days(value, expected):
+    assert parse_operating_days(value) == expected
+
+
+def test_overnight_interval_crosses_midnight():
+    intervals = weekly_intervals("18:00", "02:00", "Senin")
+    assert intervals == [(18 * 60, MINUTES_PER_DAY + 2 * 60)]
+
+
+def test_sunday_overnight_wraps_to_monday():
+    intervals = weekly_intervals("22:00", "03:00", "Minggu")
+    sunday = 6 * MINUTES_PER_DAY
+    assert intervals == [(sunday + 22 * 60, MINUTES_PER_WEEK), (0, 3 * 60)]
+
+
+def test_unknown_hours():
+    assert weekly_intervals("Unknown", "Unknown", "Setiap Hari") is None
+    assert weekly_intervals("24 Jam", None, "Setiap Hari")[0] == (0, MINUTES_PER_DAY)
+
+
+def test_open_mask_overnight_and_wrap():
+    index = WeeklyScheduleIndex()
+    restaurants = [
+        {"jam_buka": "18:00", "jam_tutup": "02:00", "hari_operasional": "Setiap Hari"},
+        {"jam_buka": "22:00", "jam_tutup": "03:00", "hari_operasional": "Minggu"},
+        {"jam_buka": "08:00", "jam_tutup": "16:00", "hari_operasional": "Senin-Jumat"},
+    ]
+    # Senin 01:00: sisa malam Minggu untuk dua tempat pertama
+    assert index.open_mask(restaurants, at(0, 1)).tolist() == [True, True, False]
+    # Senin 04:00: semua sudah tutup
+    assert index.open_mask(restaurants, at(0, 4)).tolist() == [False, False, False]
+    # Minggu 23:00
+    assert index.open_mask(restaurants, at(6, 23)).tolist() == [True, True, False]
+    # Selasa 01:00: tempat Minggu tidak buka Senin malam
+    assert index.open_mask(restaurants, at(1, 1)).tolist() == [True, False, False]
+
+
+def test_statuses_labels():
+    index = WeeklyScheduleIndex()
+    restaurants = [
+        {"jam_buka": "08:00", "jam_tutup": "16:00", "hari_operasional": "Setiap Hari"},
+        {"jam_buka": "10:30", "jam_tutup": "22:00", "hari_operasional": "Setiap Hari"},
+        {"jam_buka": "13:00", "jam_tutup": "22:00", "hari_operasional": "Setiap Hari"},
+        {"jam_buka": "06:00", "jam_tutup": "09:00", "hari_operasional": "Setiap Hari"},
+        {"jam_buka": "08:00", "jam_tutup": "16:00", "hari_operasional": "Sabtu, Minggu"},
+        {"jam_buka": "Unknown", "jam_tutup": "Unknown", "hari_operasional": "Setiap Hari"},
+    ]
+    assert index.statuses(restaurants, at(0, 10)) == [
+        "Buka Sekarang",
+        "Buka dalam 30 menit",
+        "Buka dalam 3 jam",
+        "Tutup",
+        "Tutup (Tidak beroperasi hari ini)",
+        "Jam operasional tidak tersedia",
+    ]
+    assert index.statuses(restaurants[:1], at(0, 10), is_future=True) == ["Akan Buka"]
+
+
+def test_identical_schedules_share_a_row():
+    index = WeeklyScheduleIndex()
+    schedule = {"jam_buka": "08:00", "jam_tutup": "16:00", "hari_operasional": ["Senin"]}
+    rows = index.rows_for([dict(schedule), dict(schedule, nama_tempat="Lain")])
+    assert rows[0] == rows[1]
+    assert len(index) == 1
+    # Baris lama tetap valid setelah jadwal baru dikompilasi
+    index.compile([{"jam_buka": "09:00", "jam_tutup": "17:00", "hari_operasional": "Selasa"}])
+    assert len(index) == 2
+    assert index.open_mask_rows(rows, at(0, 9)).tolist() == [True, True]
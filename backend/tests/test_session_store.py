@@ -0,0 +1,135 @@
+import asyncio
+import sys
+import types
+
+import pytest
+from pydantic import ValidationError
+
+from src.config import Settings
+from src.session_store import (
+    MemorySessionBackend,
+    RedisSessionBackend,
+    Session,
+    SessionStore,
+    TurnState,
+)
+
+
+def make_store(**kwargs) -> SessionStore:
+    options = {"max_history": 4, "max_candidates": 3, **kwargs}
+    backend = options.pop("backend", None) or MemorySessionBackend(maxsize=10, ttl=60)
+    return SessionStore(backend, **options)
+
+
+def test_new_session_gets_id_and_fallback_history():
+    async def run():
+        store = make_store()
+        history = [{"role": "user", "content": str(i)} for i in range(6)]
+        return store, await store.load(None, history)
+
+    store, session = asyncio.run(run())
+    assert len(session.conversation_id) == 32
+    # Riwayat cadangan dipotong ke max_history pesan terakhir
+    assert [m["content"] for m in session.history] == ["2", "3", "4", "5"]
+    assert store.stats()["created"] == 1
+
+
+def test_saved_session_is_loaded_and_trimmed():
+    async def run():
+        store = make_store()
+        session = await store.load(None)
+        state = TurnState("bakso murah", [{"nama_tempat": f"T{i}"} for i in range(5)])
+        for turn in range(3):
+            session.record_turn(f"pesan {turn}", f"jawaban {turn}", state, ["T0"])
+        await store.save(session)
+        return store, await store.load(session.conversation_id, [{"role": "user", "content": "x"}])
+
+    store, loaded = asyncio.run(run())
+    assert [m["content"] for m in loaded.history] == [
+        "pesan 1", "jawaban 1", "pesan 2", "jawaban 2",
+    ]
+    assert loaded.last_query == "bakso murah"
+    assert len(loaded.candidates) == 3
+    assert store.stats()["loaded"] == 1
+
+
+def test_unknown_id_starts_new_session_from_fallback():
+    async def run():
+        store = make_store()
+        fallback = [{"role": "user", "content": "soto"}, {"role": "assistant", "content": "..."}]
+        return store, await store.load("kedaluwarsa", fallback)
+
+    store, session = asyncio.run(run())
+    assert session.conversation_id != "kedaluwarsa"
+    assert session.history[0]["content"] == "soto"
+    assert store.stats()["expired"] == 1
+
+
+def test_record_turn_keeps_shown_from_previous_pool():
+    session = Session(conversation_id="c")
+    pool = [{"nama_tempat": n} for n in "ABCD"]
+    session.record_turn("bakso", "jawab", TurnState("bakso", pool), ["A", "B"])
+    # "tambah lagi": state membawa yang sudah tampil, giliran ini menambah C
+    session.record_turn("lagi", "jawab", TurnState("bakso", pool, tuple(session.shown)), ["C", "A"])
+    assert session.shown == ["A", "B", "C"]
+    # Pencarian baru mengosongkan daftar yang sudah tampil
+    session.record_turn("soto", "jawab", TurnState("soto", pool), ["D"])
+    assert session.shown == ["D"]
+
+
+def test_backend_errors_do_not_fail_requests():
+    class BrokenBackend(MemorySessionBackend):
+        async def get(self, conversation_id):
+            raise ConnectionError("down")
+
+        async def set(self, session):
+            raise ConnectionError("down")
+
+    async def run():
+        store = make_store(backend=BrokenBackend(maxsize=1, ttl=1))
+        session = await store.load("abc", [{"role": "user", "content": "hai"}])
+        await store.save(session)
+        return session
+
+    session = asyncio.run(run())
+    assert session.history == [{"role": "user", "content": "hai"}]
+
+
+def test_redis_backend_round_trip(monkeypatch):
+    class FakeRedis:
+        def __init__(self):
+            self.data, self.expiry = {}, {}
+
+        async def get(self, key):
+            return self.data.get(key)
+
+        async def set(self, key, value, ex=None):
+            self.data[key], self.expiry[key] = value, ex
+
+        async def aclose(self):
+            pass
+
+    fake = FakeRedis()
+    redis_module = types.ModuleType("redis")
+    redis_module.asyncio = types.SimpleNamespace(from_url=lambda url: fake)
+    monkeypatch.setitem(sys.modules, "redis", redis_module)
+    monkeypatch.setitem(sys.modules, "redis.asyncio", redis_module.asyncio)
+
+    async def run():
+        store = make_store(backend=RedisSessionBackend("redis://localhost", ttl=120))
+        session = await store.load(None)
+        session.record_turn("bakso", "jawab", TurnState("bakso", [{"nama_tempat": "A"}]), ["A"])
+        await store.save(session)
+        return session, await store.load(session.conversation_id)
+
+    saved, loaded = asyncio.run(run())
+    assert loaded == saved
+    assert fake.expiry == {f"chat-session:{saved.conversation_id}": 120}
+
+
+def test_redis_backend_requires_package(monkeypatch):
+    monkeypatch.setitem(sys.modules, "redis", None)
+    with pytest.raises(RuntimeError, match="pip install redis"):
+        RedisSessionBackend("redis://localhost", ttl=60)
+    with pytest.raises(ValidationError, match="pip install redis"):
+        Settings(session_backend="redis")
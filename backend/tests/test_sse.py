@@ -0,0 +1,82 @@
+import asyncio
+
+import orjson
+
+from src.sse import KEEPALIVE_FRAME, coalesce_events, encode_event
+
+
+def parse_frame(frame: bytes) -> dict:
+    fields = dict(line.split(": ", 1) for line in frame.decode().strip().split("\n"))
+    fields["data"] = orjson.loads(fields["data"])
+    return fields
+
+
+async def events(items, delay: float = 0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+def collect(source, **kwargs) -> list:
+    async def run():
+        return [frame async for frame in coalesce_events(source, **kwargs)]
+
+    return asyncio.run(run())
+
+
+def tokens(count: int):
+    return [("token", {"content": f"t{i} "}, f"s:{i + 1}") for i in range(count)]
+
+
+def test_encode_event():
+    assert encode_event("done", {}) == b"event: done\ndata: {}\n\n"
+    assert encode_event("token", {"content": "hai"}, "abc:3") == (
+        b'id: abc:3\nevent: token\ndata: {"content":"hai"}\n\n'
+    )
+
+
+def test_zero_window_sends_one_frame_per_token():
+    frames = collect(events(tokens(5)), window=0, max_bytes=0)
+    assert [parse_frame(f)["data"]["content"] for f in frames] == [f"t{i} " for i in range(5)]
+
+
+def test_tokens_are_merged_after_the_first():
+    frames = collect(
+        events([*tokens(20), ("done", {}, "s:21")], delay=0.001), window=1.0, max_bytes=10_000
+    )
+    parsed = [parse_frame(f) for f in frames]
+    # Token pertama langsung dikirim, sisanya digabung sampai event lain datang
+    assert [p["event"] for p in parsed] == ["token", "token", "done"]
+    assert parsed[0]["data"]["content"] == "t0 "
+    assert parsed[1]["data"]["content"] == "".join(f"t{i} " for i in range(1, 20))
+    # Frame gabungan memakai id token terakhir di dalamnya
+    assert parsed[1]["id"] == "s:20"
+    assert parsed[2]["id"] == "s:21"
+
+
+def test_max_bytes_flushes_early():
+    frames = collect(events(tokens(9)), window=10.0, max_bytes=6)
+    contents = [parse_frame(f)["data"]["content"] for f in frames]
+    assert contents == ["t0 ", "t1 t2 ", "t3 t4 ", "t5 t6 ", "t7 t8 "]
+
+
+def test_window_flushes_pending_tokens():
+    async def source():
+        for item in tokens(2):
+            yield item
+        await asyncio.sleep(0.1)
+        yield ("done", {}, "s:3")
+
+    frames = collect(source(), window=0.02, max_bytes=10_000)
+    assert [parse_frame(f)["data"].get("content") for f in frames] == ["t0 ", "t1 ", None]
+
+
+def test_keepalive_while_idle():
+    async def source():
+        await asyncio.sleep(0.12)
+        yield ("done", {}, None)
+
+    frames = collect(source(), keepalive_interval=0.05)
+    assert frames[:2] == [KEEPALIVE_FRAME, KEEPALIVE_FRAME]
+    assert frames[-1] == encode_event("done", {})
@@ -0,0 +1,208 @@
+import asyncio
+
+from src.streaming import BroadcastRegistry
+
+
+async def produce(count: int, delay: float = 0.0, started: list | None = None):
+    if started is not None:
+        started.append(True)
+    for i in range(count):
+        if delay:
+            await asyncio.sleep(delay)
+        yield ("token", f"t{i}")
+    yield ("done", "")
+
+
+async def drain(broadcast, after: int = 0, limit: int | None = None) -> list:
+    received = []
+    async for seq, event in broadcast.subscribe():
+        if seq <= after:
+            continue
+        received.append((seq, event))
+        if limit is not None and len(received) >= limit:
+            break
+    return received
+
+
+def test_late_subscriber_gets_full_replay():
+    async def run():
+        registry = BroadcastRegistry()
+        broadcast = registry.attach(None, lambda: produce(3))
+        await broadcast.task
+        return await drain(broadcast)
+
+    assert asyncio.run(run()) == [
+        (1, ("token", "t0")),
+        (2, ("token", "t1")),
+        (3, ("token", "t2")),
+        (4, ("done", "")),
+    ]
+
+
+def test_same_key_follows_in_flight_stream():
+    started = []
+
+    async def run():
+        registry = BroadcastRegistry()
+        leader = registry.attach("k", lambda: produce(3, 0.01, started))
+        follower = registry.attach("k", lambda: produce(3, 0.01, started))
+        received = await asyncio.gather(drain(leader), drain(follower))
+        return leader is follower, received, registry.stats()
+
+    same, (first, second), stats = asyncio.run(run())
+    assert same and first == second
+    assert len(started) == 1
+    assert (stats["leaders"], stats["followers"], stats["in_flight"]) == (1, 1, 0)
+
+
+def test_resume_from_last_event_id():
+    async def run():
+        registry = BroadcastRegistry(resume_grace=1.0)
+        broadcast = registry.attach(None, lambda: produce(5, 0.005))
+        # Client terputus setelah dua event
+        first = await drain(broadcast, limit=2)
+        last_id = broadcast.event_id(first[-1][0])
+
+        resumed, after = registry.resume(last_id)
+        rest = await drain(resumed, after=after)
+        return broadcast, resumed, first, rest, registry.resumed
+
+    broadcast, resumed, first, rest, resumed_count = asyncio.run(run())
+    assert resumed is broadcast
+    assert [seq for seq, _ in first + rest] == [1, 2, 3, 4, 5, 6]
+    assert rest[-1][1] == ("done", "")
+    assert resumed_count == 1
+
+
+def test_resume_rejects_unknown_or_expired_ids():
+    async def run():
+        registry = BroadcastRegistry(replay_ttl=0.01)
+        broadcast = registry.attach(None, lambda: produce(1))
+        await broadcast.task
+        results = [
+            registry.resume("tidak-ada:1"),
+            registry.resume(f"{broadcast.stream_id}:abc"),
+        ]
+        await asyncio.sleep(0.02)
+        results.append(registry.resume(broadcast.event_id(1)))
+        return results, registry.stats()["replay_streams"]
+
+    results, replay_streams = asyncio.run(run())
+    assert results == [(None, 0)] * 3
+    assert replay_streams == 0
+
+
+def test_replay_size_evicts_oldest_stream():
+    async def run():
+        registry = BroadcastRegistry(replay_size=1)
+        first = registry.attach(None, lambda: produce(0))
+        second = registry.attach(None, lambda: produce(0))
+        await asyncio.gather(first.task, second.task)
+        return registry.resume(first.event_id(1)), registry.resume(second.event_id(1))
+
+    (evicted, _), (kept, seq) = asyncio.run(run())
+    assert evicted is None
+    assert kept is not None and seq == 1
+
+
+def test_producer_cancelled_after_grace_without_subscribers():
+    async def run():
+        registry = BroadcastRegistry(resume_grace=0.05)
+        broadcast = registry.attach("k", lambda: produce(100, 0.01))
+        await drain(broadcast, limit=1)
+        # Masih dalam masa tenggang: produser tetap jalan
+        await asyncio.sleep(0.02)
+        alive_during_grace = not broadcast.task.done()
+        await asyncio.sleep(0.1)
+        return broadcast, alive_during_grace, registry
+
+    broadcast, alive_during_grace, registry = asyncio.run(run())
+    assert alive_during_grace
+    assert broadcast.abandoned and broadcast.done
+    # Pembatalan dicatat lalu diteruskan ke task produser
+    assert broadcast.task.cancelled()
+    assert registry.aborted == 1
+    assert registry.resume(broadcast.event_id(1)) == (None, 0)
+
+
+def test_reconnect_within_grace_keeps_producer():
+    async def run():
+        registry = BroadcastRegistry(resume_grace=0.05)
+        broadcast = registry.attach(None, lambda: produce(10, 0.01))
+        first = await drain(broadcast, limit=1)
+        await asyncio.sleep(0.02)
+        resumed, after = registry.resume(broadcast.event_id(first[-1][0]))
+        rest = await drain(resumed, after=after)
+        return broadcast, rest
+
+    broadcast, rest = asyncio.run(run())
+    assert not broadcast.abandoned
+    assert rest[-1][1] == ("done", "")
+
+
+def test_no_grace_cancels_immediately():
+    async def run():
+        registry = BroadcastRegistry()
+        broadcast = registry.attach(None, lambda: produce(100, 0.01))
+        await drain(broadcast, limit=1)
+        await asyncio.sleep(0)
+        return broadcast
+
+    broadcast = asyncio.run(run())
+    assert broadcast.abandoned
+
+
+def test_cancelled_producer_generator_is_closed():
+    closed = []
+
+    async def endless():
+        try:
+            while True:
+                await asyncio.sleep(0.001)
+                yield ("token", "t")
+        finally:
+            closed.append(True)
+
+    async def run():
+        registry = BroadcastRegistry()
+        broadcast = registry.attach(None, endless)
+        await drain(broadcast, limit=1)
+        await asyncio.gather(broadcast.task, return_exceptions=True)
+        return broadcast
+
+    broadcast = asyncio.run(run())
+    assert broadcast.task.cancelled()
+    assert closed == [True]
+
+
+def test_expired_replay_entries_purged_on_attach():
+    async def run():
+        registry = BroadcastRegistry(replay_ttl=0.01)
+        first = registry.attach(None, lambda: produce(0))
+        await first.task
+        await asyncio.sleep(0.02)
+        second = registry.attach(None, lambda: produce(0))
+        await second.task
+        return registry.stats()["replay_streams"]
+
+    assert asyncio.run(run()) == 1
+
+
+def test_event_buffer_is_capped():
+    async def run():
+        registry = BroadcastRegistry(max_events=3)
+        broadcast = registry.attach("k", lambda: produce(10, 0.002))
+        live = asyncio.create_task(drain(broadcast))
+        while not broadcast.truncated:
+            await asyncio.sleep(0.001)
+        # Replay tidak lagi lengkap: request sama memulai stream sendiri
+        other = registry.attach("k", lambda: produce(0))
+        received = await live
+        late = await drain(broadcast)
+        return broadcast, other, received, late, registry.resume(broadcast.event_id(5))
+
+    broadcast, other, received, late, resumed = asyncio.run(run())
+    assert other is not broadcast
+    assert [seq for seq, _ in received] == list(range(1, 12))
+    assert [seq for seq, _ in late] == [9, 10, 11]
+    assert resumed == (None, 0)
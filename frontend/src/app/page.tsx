@@ -13,6 +13,9 @@ import {
 } from "@/lib/api";
 import { motion, AnimatePresence } from "framer-motion";
 
+// Jumlah pesan terakhir yang dikirim saat sudah punya conversation_id
+const SESSION_FALLBACK_MESSAGES = 6;
+
 const SUGGESTIONS = [
   "🍜 Makanan murah di Samarinda",
   "🍣 Japanese Food terbaik",
@@ -26,6 +29,8 @@ export default function Home() {
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  // Sesi server — riwayat tidak perlu dikirim ulang setiap giliran
+  const [conversationId, setConversationId] = useState<string | null>(null);
   const scrollRef = useRef<HTMLDivElement>(null);
   const inputRef = useRef<HTMLTextAreaElement>(null);
 
@@ -66,7 +71,11 @@ export default function Home() {
     setMessages((prev) => [...prev, aiMsg]);
 
     try {
-      const history: ConversationMessage[] = messages.map((m) => ({
+      // Riwayat diambil dari sesi server; beberapa pesan terakhir tetap dikirim
+      // sebagai cadangan jika sesi hilang (kedaluwarsa, restart, worker lain)
+      const history: ConversationMessage[] = (
+        conversationId ? messages.slice(-SESSION_FALLBACK_MESSAGES) : messages
+      ).map((m) => ({
         role: m.role,
         content: m.content,
       }));
@@ -76,6 +85,7 @@ export default function Home() {
         await streamChatMessage(
           msg,
           history,
+          conversationId,
           // onToken — append token ke message
           (token: string) => {
             setMessages((prev) =>
@@ -94,20 +104,30 @@ export default function Home() {
             );
           },
           // onDone
-          () => {
+          (newConversationId: string | null) => {
+            if (newConversationId) setConversationId(newConversationId);
             setLoading(false);
           },
           // onError
           (errorMsg: string) => {
             setError(errorMsg);
             setLoading(false);
+          },
+          // onReset — stream dimulai ulang setelah reconnect, buang jawaban parsial
+          () => {
+            setMessages((prev) =>
+              prev.map((m) =>
+                m.id === aiMsgId ? { ...m, content: "", restaurants: undefined } : m
+              )
+            );
           }
         );
       } catch (streamError) {
         console.warn('Streaming failed, falling back to non-streaming:', streamError);
         
         // Fallback to non-streaming
-        const response = await sendChatMessage(msg, history);
+        const response = await sendChatMessage(msg, history, conversationId);
+        if (response.conversation_id) setConversationId(response.conversation_id);
         
         setMessages((prev) =>
           prev.map((m) =>
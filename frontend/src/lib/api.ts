@@ -106,7 +106,8 @@ export async function fetchCategories(): Promise<CategoriesResponse> {
 
 export async function sendChatMessage(
   message: string,
-  conversationHistory: ConversationMessage[]
+  conversationHistory: ConversationMessage[],
+  conversationId: string | null = null
 ): Promise<ChatResponse> {
   const response = await fetch(`${API_URL}/chat`, {
     method: 'POST',
@@ -116,6 +117,7 @@ export async function sendChatMessage(
     body: JSON.stringify({
       message,
       conversation_history: conversationHistory,
+      conversation_id: conversationId,
     }),
   });
   
@@ -127,93 +129,156 @@ export async function sendChatMessage(
 }
 
 
+// Resume stream yang terputus via Last-Event-ID
+const MAX_STREAM_RESUMES = 3;
+const STREAM_RESUME_DELAY_MS = 500;
+
 /**
  * Kirim pesan chat via SSE streaming.
  * Token akan diterima satu per satu melalui callback.
+ *
+ * Jika koneksi putus di tengah stream, request yang sama dikirim ulang
+ * dengan header `Last-Event-ID` sehingga server hanya mengirim event yang
+ * terlewat. Jika server memulai stream baru (stream lama kedaluwarsa),
+ * `onReset` dipanggil agar jawaban parsial dibuang sebelum token baru.
+ *
+ * Dengan `conversationId`, riwayat diambil dari sesi server;
+ * `conversationHistory` cukup beberapa pesan terakhir sebagai cadangan jika
+ * sesi sudah hilang. `onDone` menerima id sesi terbaru (bisa berganti).
  */
 export async function streamChatMessage(
   message: string,
   conversationHistory: ConversationMessage[],
+  conversationId: string | null,
   onToken: (token: string) => void,
   onRestaurants: (restaurants: RestaurantCard[]) => void,
-  onDone: () => void,
+  onDone: (conversationId: string | null) => void,
   onError: (error: string) => void,
+  onReset?: () => void,
 ): Promise<void> {
-  const response = await fetch(`${API_URL}/chat/stream`, {
-    method: 'POST',
-    headers: {
+  // `<stream_id>:<seq>` dari event terakhir yang diterima
+  let lastEventId: string | null = null;
+  let finished = false;
+
+  const streamIdOf = (eventId: string) => eventId.slice(0, eventId.lastIndexOf(':'));
+
+  const dispatch = (event: string, dataStr: string) => {
+    let data;
+    try {
+      data = JSON.parse(dataStr);
+    } catch {
+      console.warn('Invalid SSE data:', dataStr);
+      return;
+    }
+
+    switch (event) {
+      case 'token':
+        onToken(data.content);
+        break;
+      case 'restaurants':
+        // Bisa dikirim lebih dari sekali (kartu dulu, lalu urutan final)
+        onRestaurants(data.restaurants);
+        break;
+      case 'done':
+        finished = true;
+        onDone(data.conversation_id ?? null);
+        break;
+      case 'error':
+        finished = true;
+        onError(data.message);
+        break;
+    }
+  };
+
+  const readStream = async (lastSeenId: string | null) => {
+    const headers: Record<string, string> = {
       'Content-Type': 'application/json',
       'Accept': 'text/event-stream',
-    },
-    body: JSON.stringify({
-      message,
-      conversation_history: conversationHistory,
-    }),
-  });
+    };
+    if (lastSeenId) {
+      headers['Last-Event-ID'] = lastSeenId;
+    }
 
-  if (!response.ok) {
-    throw new Error(`HTTP error ${response.status}`);
-  }
+    const response = await fetch(`${API_URL}/chat/stream`, {
+      method: 'POST',
+      headers,
+      body: JSON.stringify({
+        message,
+        conversation_history: conversationHistory,
+        conversation_id: conversationId,
+      }),
+    });
 
-  const reader = response.body?.getReader();
-  if (!reader) {
-    throw new Error('ReadableStream not supported');
-  }
+    if (!response.ok) {
+      throw new Error(`HTTP error ${response.status}`);
+    }
+
+    const reader = response.body?.getReader();
+    if (!reader) {
+      throw new Error('ReadableStream not supported');
+    }
+
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+
+      buffer += decoder.decode(value, { stream: true });
+
+      // Event SSE dipisah baris kosong; potongan terakhir bisa belum lengkap
+      const blocks = buffer.split('\n\n');
+      buffer = blocks.pop() ?? '';
 
-  const decoder = new TextDecoder();
-  let buffer = '';
-
-  while (true) {
-    const { done, value } = await reader.read();
-    if (done) break;
-
-    buffer += decoder.decode(value, { stream: true });
-
-    // Parse SSE events from buffer
-    const lines = buffer.split('\n');
-    buffer = '';
-
-    let currentEvent = '';
-
-    for (let i = 0; i < lines.length; i++) {
-      const line = lines[i];
-
-      if (line.startsWith('event: ')) {
-        currentEvent = line.slice(7).trim();
-      } else if (line.startsWith('data: ')) {
-        const dataStr = line.slice(6);
-        try {
-          const data = JSON.parse(dataStr);
-
-          switch (currentEvent) {
-            case 'token':
-              onToken(data.content);
-              break;
-            case 'restaurants':
-              console.log('Received restaurants:', data.restaurants?.length || 0);
-              onRestaurants(data.restaurants);
-              break;
-            case 'done':
-              onDone();
-              break;
-            case 'error':
-              onError(data.message);
-              break;
+      for (const block of blocks) {
+        let event = 'message';
+        let id: string | null = null;
+        const dataLines: string[] = [];
+
+        for (const line of block.split('\n')) {
+          // Baris komentar (keep-alive) diawali ':'
+          if (!line || line.startsWith(':')) continue;
+
+          const colon = line.indexOf(':');
+          const field = colon === -1 ? line : line.slice(0, colon);
+          let fieldValue = colon === -1 ? '' : line.slice(colon + 1);
+          if (fieldValue.startsWith(' ')) fieldValue = fieldValue.slice(1);
+
+          if (field === 'event') {
+            event = fieldValue;
+          } else if (field === 'data') {
+            dataLines.push(fieldValue);
+          } else if (field === 'id') {
+            id = fieldValue;
           }
-        } catch (e) {
-          // Incomplete JSON, put back in buffer
-          buffer = lines.slice(i).join('\n');
-          break;
+          // Field lain (mis. `retry`) diabaikan
+        }
+
+        if (id !== null) {
+          // Server tidak bisa melanjutkan stream lama → jawaban dimulai ulang
+          if (lastEventId && streamIdOf(id) !== streamIdOf(lastEventId)) {
+            onReset?.();
+          }
+          lastEventId = id;
+        }
+        if (dataLines.length > 0) {
+          dispatch(event, dataLines.join('\n'));
         }
-        currentEvent = '';
-      } else if (line === '') {
-        // Empty line (event separator), reset
-        currentEvent = '';
-      } else {
-        // Incomplete line, put back in buffer
-        buffer = lines.slice(i).join('\n');
-        break;
       }
     }
+  };
+
+  for (let attempt = 0; ; attempt++) {
+    try {
+      await readStream(lastEventId);
+      if (finished) return;
+      throw new Error('Stream terputus sebelum selesai');
+    } catch (err) {
+      // Belum ada event yang diterima → biarkan caller fallback ke /chat
+      if (finished || !lastEventId || attempt >= MAX_STREAM_RESUMES) throw err;
+      console.warn('Stream interrupted, resuming from', lastEventId, err);
+      await new Promise((resolve) => setTimeout(resolve, STREAM_RESUME_DELAY_MS * (attempt + 1)));
+    }
   }
 }